@@ -0,0 +1,205 @@
+import io
+import os
+import re
+import html
+import time
+import sqlite3
+import zipfile
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Iterable, Optional
+
+# Plain-text formats decoded directly
+TEXT_EXTENSIONS = {'.txt', '.csv', '.md', '.log', '.json', '.xml'}
+HTML_EXTENSIONS = {'.htm', '.html'}
+
+# Office Open XML parts holding the visible text, by extension
+OFFICE_PARTS = {
+    '.docx': re.compile(r'word/(document|header\d*|footer\d*)\.xml$'),
+    '.xlsx': re.compile(r'xl/sharedStrings\.xml$'),
+    '.pptx': re.compile(r'ppt/slides/slide\d+\.xml$')
+}
+
+# Closing tags that end a line of text in Office XML and HTML
+BLOCK_END = re.compile(r'</(?:w:p|a:p|si|p|div|tr|li|h\d)>|<br\s*/?>', re.IGNORECASE)
+TAG = re.compile(r'<[^>]+>')
+
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_MAX_CHARS = 100000
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _markup_text(markup: str) -> str:
+    text = TAG.sub('', BLOCK_END.sub('\n', markup))
+    return "\n".join(line.strip() for line in html.unescape(text).splitlines() if line.strip())
+
+
+def _office_text(data: bytes, parts) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = sorted((name for name in archive.namelist() if parts.search(name)),
+                       key=lambda name: [int(n) if n.isdigit() else n for n in re.split(r'(\d+)', name)])
+        return "\n".join(_markup_text(archive.read(name).decode('utf-8', errors='ignore')) for name in names)
+
+
+def _pdf_text(data: bytes) -> str:
+    """Text of a PDF via pypdf, or pdfminer.six; empty when neither is installed"""
+    try:
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages)
+    except ImportError:
+        pass
+    try:
+        from pdfminer.high_level import extract_text
+        return extract_text(io.BytesIO(data))
+    except ImportError:
+        return ""
+
+
+def extract_text(filename: str, data: bytes, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """Best-effort text of one attachment; unsupported or broken files give ''"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    try:
+        if extension in TEXT_EXTENSIONS:
+            text = data.decode('utf-8', errors='ignore')
+        elif extension in HTML_EXTENSIONS:
+            text = _markup_text(data.decode('utf-8', errors='ignore'))
+        elif extension in OFFICE_PARTS:
+            text = _office_text(data, OFFICE_PARTS[extension])
+        elif extension == '.pdf':
+            text = _pdf_text(data)
+        else:
+            text = ""
+    except Exception:
+        text = ""
+    return text[:max_chars]
+
+
+def _extract_task(task) -> str:
+    filename, data, max_chars = task
+    return extract_text(filename, data, max_chars)
+
+
+class AttachmentCache:
+    """Extracted text by attachment content hash, in SQLite or in memory"""
+
+    def __init__(self, path: str = None):
+        self.memory = {}
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS attachment_text (hash TEXT PRIMARY KEY, text TEXT, created REAL)"
+            )
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        hashes = list(hashes)
+        with self.lock:
+            if self.conn is None:
+                return {h: self.memory[h] for h in hashes if h in self.memory}
+            found = {}
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, text FROM attachment_text WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update(rows.fetchall())
+            return found
+
+    def put_many(self, texts: Dict[str, str]):
+        with self.lock:
+            if self.conn is None:
+                self.memory.update(texts)
+                return
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO attachment_text (hash, text, created) VALUES (?, ?, ?)",
+                    [(h, text, now) for h, text in texts.items()]
+                )
+
+
+class AttachmentPipeline:
+    """Extracts attachment text on a process pool behind a content-hash cache.
+
+    Attachments are dicts with a 'filename' and either their bytes in
+    'data' or a saved file in 'path'. Identical content is extracted once,
+    whether it repeats within a batch or was seen in an earlier run; only
+    cache misses are sent to the workers, and a single miss is extracted
+    inline rather than paying for the pool.
+    """
+
+    def __init__(self, cache_path: str = None, max_workers: int = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_chars: int = DEFAULT_MAX_CHARS):
+        self.cache = AttachmentCache(cache_path)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _read(self, attachment: Dict[str, Any]) -> Optional[bytes]:
+        data = attachment.get('data')
+        if data is None and attachment.get('path'):
+            try:
+                if os.path.getsize(attachment['path']) > self.max_bytes:
+                    return None
+                with open(attachment['path'], 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+        if data is None or len(data) > self.max_bytes:
+            return None
+        return data
+
+    def extract_many(self, attachments: Iterable[Dict[str, Any]]) -> List[str]:
+        """Text of each attachment, in order"""
+        attachments = list(attachments)
+        keys = []
+        pending = {}
+        for attachment in attachments:
+            data = self._read(attachment)
+            key = content_hash(data) if data is not None else None
+            keys.append(key)
+            if key is not None and key not in pending:
+                pending[key] = (attachment.get('filename') or "", data, self.max_chars)
+
+        texts = self.cache.get_many(pending)
+        misses = {key: task for key, task in pending.items() if key not in texts}
+        if misses:
+            if len(misses) == 1 or self.max_workers == 1:
+                extracted = [_extract_task(task) for task in misses.values()]
+            else:
+                extracted = list(self.pool.map(_extract_task, misses.values()))
+            new = dict(zip(misses, extracted))
+            self.cache.put_many(new)
+            texts.update(new)
+
+        return [texts.get(key, "") if key else "" for key in keys]
+
+    def message_texts(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """Attachment names and text per message, extracting a whole batch at once"""
+        attachments = [(i, attachment) for i, message in enumerate(messages)
+                       for attachment in message.get('attachments') or []]
+        texts = self.extract_many(attachment for _, attachment in attachments)
+
+        combined = [[] for _ in messages]
+        for (i, attachment), text in zip(attachments, texts):
+            combined[i].append(f"{attachment.get('filename') or ''}\n{text}".strip())
+        return ["\n\n".join(parts) for parts in combined]
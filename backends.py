@@ -0,0 +1,106 @@
+import importlib.util
+from typing import Dict, Any, List, Callable, Optional
+from mailbox_source import MailboxSource, OutlookSource, EmlDirectorySource, MboxSource, PstSource, InMemorySource
+from folder_walker import MailboxProvider, OutlookStoreProvider
+
+# Outlook OlDefaultFolders.olFolderInbox
+OL_FOLDER_INBOX = 6
+
+# Backend factories by name, see register_backend
+BACKENDS: Dict[str, Callable[..., 'Backend']] = {}
+
+# Module each backend needs beyond the standard library
+REQUIREMENTS = {}
+
+
+class Backend:
+    """An opened mailbox: a source for its messages and, for stores with
+    many folders, optionally a provider to walk them all.
+
+    ``live`` sources can be searched directly without building the index
+    first. close() releases whatever the backend holds, such as the COM
+    apartment.
+    """
+
+    def __init__(self, name: str, source: MailboxSource, provider: MailboxProvider = None,
+                 live: bool = False, on_close: Callable[[], None] = None):
+        self.name = name
+        self.source = source
+        self.provider = provider
+        self.live = live
+        self._on_close = on_close
+
+    def close(self):
+        if self._on_close:
+            self._on_close()
+            self._on_close = None
+
+
+def register_backend(name: str, requires: str = None):
+    """Decorator registering a backend factory; `requires` names the module it imports when opened"""
+    def decorator(factory):
+        BACKENDS[name] = factory
+        if requires:
+            REQUIREMENTS[name] = requires
+        return factory
+    return decorator
+
+
+def available_backends() -> List[str]:
+    """Registered backends whose dependencies are installed (checked without importing them)"""
+    return [name for name in BACKENDS
+            if name not in REQUIREMENTS or importlib.util.find_spec(REQUIREMENTS[name]) is not None]
+
+
+def open_backend(name: str = 'outlook', **options) -> Backend:
+    """Open a backend by name; options go to its factory, which ignores those it does not use"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown mailbox backend '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+@register_backend('outlook', requires='win32com')
+def open_outlook(attachments: bool = False, all_folders: bool = False, **options) -> Backend:
+    """The Inbox of the Outlook profile over COM (Windows only)"""
+    import pythoncom
+    import win32com.client
+    pythoncom.CoInitialize()
+    try:
+        namespace = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+        inbox = namespace.GetDefaultFolder(OL_FOLDER_INBOX)
+    except Exception:
+        pythoncom.CoUninitialize()
+        raise
+    backend = Backend(
+        'outlook',
+        OutlookSource(inbox, namespace, attachments=attachments),
+        OutlookStoreProvider(namespace, attachments=attachments) if all_folders else None,
+        live=True,
+        on_close=pythoncom.CoUninitialize
+    )
+    backend.namespace = namespace
+    backend.inbox = inbox
+    return backend
+
+
+@register_backend('eml')
+def open_eml(path: str, attachments: bool = False, **options) -> Backend:
+    """A directory tree of exported .eml files; subdirectories become folders"""
+    return Backend('eml', EmlDirectorySource(path, attachments=attachments))
+
+
+@register_backend('mbox')
+def open_mbox(path: str, attachments: bool = False, **options) -> Backend:
+    return Backend('mbox', MboxSource(path, attachments=attachments))
+
+
+@register_backend('pst', requires='pypff')
+def open_pst(path: str, attachments: bool = False, **options) -> Backend:
+    """An exported .pst/.ost file, read with libpff on any platform"""
+    return Backend('pst', PstSource(path, attachments=attachments))
+
+
+@register_backend('memory')
+def open_memory(messages: Optional[List[Dict[str, Any]]] = None, **options) -> Backend:
+    """Messages held in memory, for fixtures and tests"""
+    return Backend('memory', InMemorySource(messages))
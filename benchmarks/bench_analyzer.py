@@ -0,0 +1,107 @@
+"""Wall time of map-reduce result analysis against a local stub of the Messages API.
+
+The stub sleeps for a simulated latency and answers a share of requests
+with 429s, so concurrency, rate limiting and retries are exercised offline.
+
+Run from the repository root:
+    python benchmarks/bench_analyzer.py --hits 5 500 --latency 2.0 --error-rate 0.1
+"""
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_analyzer import ResultAnalyzer, CHARS_PER_TOKEN
+
+
+class StubRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("429 rate limited (stub)")
+        self.response = SimpleNamespace(headers={'retry-after': str(retry_after)})
+
+
+class StubMessages:
+    def __init__(self, latency: float, error_rate: float, retry_after: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, model, max_tokens, messages, **options):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * self.random.uniform(0.8, 1.2))
+            if self.random.random() < self.error_rate:
+                raise StubRateLimitError(self.retry_after)
+            prompt = messages[0]['content']
+            text = f"Notes on {prompt.count('Subject:')} emails"
+            return SimpleNamespace(
+                content=[SimpleNamespace(text=text)],
+                usage=SimpleNamespace(input_tokens=len(prompt) // CHARS_PER_TOKEN, output_tokens=min(max_tokens, 200))
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def make_results(count: int):
+    return [{
+        'subject': f"RE: Payment certificate {i} for STRED-NKHL package",
+        'received': f"2024-01-{i % 28 + 1:02d} 09:00:00",
+        'sender': f"engineer{i % 17}@example.com",
+        'body': "Please find attached the interim payment certificate for works completed. " * 20
+    } for i in range(count)]
+
+
+def bench(hits: int, args) -> dict:
+    messages = StubMessages(args.latency, args.error_rate, args.retry_after, seed=hits)
+    analyzer = ResultAnalyzer(client=SimpleNamespace(messages=messages), backoff=args.retry_after,
+                              max_concurrency=args.concurrency, requests_per_second=args.rps)
+    start = time.perf_counter()
+    summary = analyzer.analyze(make_results(hits), "payment certificates for the north package")
+    return {
+        'hits': hits,
+        'seconds': round(time.perf_counter() - start, 2),
+        'requests': messages.calls,
+        'max_in_flight': messages.max_in_flight,
+        'answered': summary is not None,
+        **analyzer.stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hits', type=int, nargs='+', default=[5, 500], help="result counts to analyze")
+    parser.add_argument('--latency', type=float, default=2.0, help="seconds per stub request")
+    parser.add_argument('--error-rate', type=float, default=0.1, help="share of stub requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=0.5, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rps', type=float, default=8.0, help="request starts per second")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [bench(hits, args) for hits in args.hits]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'hits':>6}{'seconds':>9}{'requests':>10}{'retries':>9}{'in flight':>11}{'tokens':>9}{'skipped':>9}")
+    for r in results:
+        print(f"{r['hits']:>6}{r['seconds']:>9}{r['requests']:>10}{r['retries']:>9}{r['max_in_flight']:>11}"
+              f"{r['tokens']:>9,}{r['skipped']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Memory and throughput of the dedup backends.
+
+Run from the repository root:
+    python benchmarks/bench_dedup.py --keys 1000000
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import MODES, make_deduper
+
+
+def make_keys(count: int):
+    """Fresh keys shaped like parser doc ids: "{File_Name}_{Document_ID}" """
+    return (f"STRED-NKHL-GBS-SHA-{i % 997:03d}PWB-{i}PD-2023.pdf_{i * 7919 % 10 ** 9:09d}" for i in range(count))
+
+
+def bench(mode: str, count: int, repeats: int, workdir: str):
+    """Insert count unique keys, then re-add the first repeats of them.
+
+    Throughput is timed on pre-generated keys without tracing. Memory is
+    measured in a second, traced run that generates keys while inserting,
+    as the parser does, so it includes any key strings a backend keeps.
+    """
+    def create(run):
+        if mode == 'bloom':
+            return make_deduper(mode, capacity=count, error_rate=0.001)
+        if mode == 'disk':
+            return make_deduper(mode, path=os.path.join(workdir, f'dedup_{run}.db'))
+        return make_deduper(mode)
+
+    keys = list(make_keys(count))
+    deduper = create('timed')
+    start = time.perf_counter()
+    added = sum(map(deduper.add, keys))
+    insert_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys[:repeats]:
+        deduper.add(key)
+    repeat_seconds = time.perf_counter() - start
+    deduper.close()
+    del keys
+
+    tracemalloc.start()
+    deduper = create('traced')
+    for key in make_keys(count):
+        deduper.add(key)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    deduper.close()
+
+    result = {
+        'mode': mode,
+        'keys': count,
+        'unique_reported': added,
+        'inserts_per_sec': round(count / insert_seconds),
+        'lookups_per_sec': round(repeats / repeat_seconds) if repeats else None,
+        'retained_mb': round(retained / 2 ** 20, 1),
+        'peak_mb': round(peak / 2 ** 20, 1),
+        'bytes_per_key': round(retained / count, 1)
+    }
+    if mode == 'disk':
+        result['disk_mb'] = round(os.path.getsize(os.path.join(workdir, 'dedup_traced.db')) / 2 ** 20, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=200000, help="unique keys to insert")
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [bench(mode, args.keys, args.keys // 10, workdir) for mode in args.modes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8}{'inserts/s':>12}{'lookups/s':>12}{'kept MB':>10}{'peak MB':>10}{'B/key':>8}{'unique':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['inserts_per_sec']:>12,}{r['lookups_per_sec']:>12,}{r['retained_mb']:>10}"
+              f"{r['peak_mb']:>10}{r['bytes_per_key']:>8}{r['unique_reported']:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Import time of the entry-point modules, and a guard against heavy imports.
+
+Each module is imported in a fresh interpreter. The run fails (exit code 1)
+when a module pulls in one of the HEAVY dependencies at import time or takes
+longer than --max-ms, so lazy imports stay lazy.
+
+Run from the repository root:
+    python benchmarks/bench_imports.py --max-ms 300
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that may only be imported when their backend or feature is used
+HEAVY = ['win32com', 'pythoncom', 'pandas', 'anthropic', 'numpy', 'pyarrow', 'pypff', 'dotenv']
+
+MODULES = ['outlook_deeplook', 'daemon', 'search', 'parser', 'backends', 'mail_index', 'ranking',
+           'query_analyzer', 'document_store', 'vector_index', 'result_analyzer', 'instrumentation']
+
+# Modules whose whole purpose is an optional dependency
+ALLOWED = {'vector_index': {'numpy'}}
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'ms': round(elapsed * 1000, 1), 'heavy': heavy}}))
+"""
+
+
+def measure(module: str, repeats: int) -> dict:
+    """Best of `repeats` cold imports, each in a new interpreter"""
+    best = None
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                                   cwd=ROOT, capture_output=True, text=True)
+        if completed.returncode:
+            error = (completed.stderr.strip().splitlines() or ["import failed"])[-1]
+            return {'module': module, 'ms': None, 'heavy': [], 'error': error}
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    return {'module': module, **best, 'error': None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, default=None, help="fail when an import takes longer")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeats) for module in args.modules]
+    failures = []
+    for r in results:
+        unexpected = set(r['heavy']) - ALLOWED.get(r['module'], set())
+        if r['error']:
+            failures.append(f"{r['module']}: {r['error']}")
+        elif unexpected:
+            failures.append(f"{r['module']} imports {', '.join(sorted(unexpected))}")
+        elif args.max_ms is not None and r['ms'] > args.max_ms:
+            failures.append(f"{r['module']} took {r['ms']} ms")
+
+    if args.json:
+        print(json.dumps({'results': results, 'failures': failures}, indent=2))
+    else:
+        print(f"{'module':<20}{'ms':>8}  heavy")
+        for r in results:
+            print(f"{r['module']:<20}{r['ms'] if r['ms'] is not None else '-':>8}  "
+                  f"{', '.join(r['heavy']) or r['error'] or '-'}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Offline end-to-end benchmarks on synthetic data.
+
+Times classification, registry parsing, mail indexing and query latency
+at a chosen scale, each stage in its own interpreter so peak RSS is per
+stage, and writes the results as JSON tagged with the current commit.
+
+Run from the repository root:
+    python benchmarks/run_benchmarks.py --scale 10k
+    python benchmarks/run_benchmarks.py --scale 100k --compare benchmarks/results/<older>.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Dict, Any, List, Iterator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticData, SCALES, write_registry
+
+STAGES = ['classify', 'parse', 'index', 'query']
+
+# Metrics --compare reports, with whether higher is better
+COMPARED = {'seconds': False, 'per_sec': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False,
+            'peak_rss_mb': False}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where it cannot be read"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+    return {'p50_ms': at(0.5), 'p90_ms': at(0.9), 'p95_ms': at(0.95), 'p99_ms': at(0.99),
+            'mean_ms': round(sum(ordered) / len(ordered), 2), 'max_ms': round(ordered[-1], 2)}
+
+
+def synthetic_source(data: SyntheticData, count: int):
+    """A mailbox source streaming generated messages, so large scales never sit in memory"""
+    from mailbox_source import MailboxSource
+
+    class SyntheticSource(MailboxSource):
+        name = "synthetic"
+
+        def iter_messages(self, since: str = None, subject_filter=None) -> Iterator[Dict[str, Any]]:
+            for message in data.iter_messages(count):
+                if since and message['modified'] <= since:
+                    continue
+                if subject_filter and not subject_filter(message['subject']):
+                    continue
+                yield message
+
+    return SyntheticSource()
+
+
+def open_searcher(workdir: str, data: SyntheticData, count: int):
+    from outlook_deeplook import OutlookDeepLook
+    return OutlookDeepLook(source=synthetic_source(data, count), index_path=os.path.join(workdir, "mail_index.db"),
+                           attachments=False)
+
+
+def stage_classify(args, workdir: str) -> Dict[str, Any]:
+    from classifier import get_classifier
+    from references import get_extractor
+    subjects = [message['subject'] for message in SyntheticData(args.seed).iter_messages(args.messages)]
+    classifier, extractor = get_classifier(), get_extractor()
+
+    start = time.perf_counter()
+    projects = sum(1 for subject in subjects if classifier.classify(subject)['project_code'])
+    references = sum(1 for subject in subjects if extractor.first(subject))
+    seconds = time.perf_counter() - start
+    return {'items': len(subjects), 'seconds': round(seconds, 3), 'per_sec': round(len(subjects) / seconds),
+            'with_project': projects, 'with_reference': references}
+
+
+def stage_parse(args, workdir: str) -> Dict[str, Any]:
+    from parser import DocumentParser
+    input_file = write_registry(os.path.join(workdir, "registry.txt"), args.registry, args.seed)
+    # DocumentParser writes to output/ and parser_log.txt under the working directory
+    os.chdir(workdir)
+    parser = DocumentParser(dedup=args.dedup)
+
+    start = time.perf_counter()
+    ok = parser.process_file(input_file, streaming=args.parse_mode == 'streaming',
+                             parallel=args.parse_mode == 'parallel')
+    seconds = time.perf_counter() - start
+    with open(os.path.join(workdir, "output", "MERGED.csv"), encoding='utf-8') as f:
+        rows = sum(1 for _ in f) - 1
+    return {'lines': args.registry, 'rows': rows, 'ok': bool(ok), 'mode': args.parse_mode,
+            'seconds': round(seconds, 3), 'per_sec': round(args.registry / seconds)}
+
+
+def stage_index(args, workdir: str) -> Dict[str, Any]:
+    data = SyntheticData(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher = open_searcher(workdir, data, args.messages)
+        start = time.perf_counter()
+        searcher.index.build(searcher.source)
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        searcher.graph.sync_from_index(searcher.index)
+        graph_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        if searcher.vectors is not None:
+            searcher.vectors.sync_from_index(searcher.index)
+        vector_seconds = time.perf_counter() - start
+        count = searcher.index.count()
+        searcher.close()
+    seconds = index_seconds + graph_seconds + vector_seconds
+    return {'messages': count, 'seconds': round(seconds, 3), 'per_sec': round(count / seconds),
+            'index_seconds': round(index_seconds, 3), 'graph_seconds': round(graph_seconds, 3),
+            'vector_seconds': round(vector_seconds, 3) if searcher.vectors is not None else None,
+            'db_mb': round(os.path.getsize(os.path.join(workdir, "mail_index.db")) / 2 ** 20, 1)}
+
+
+def stage_query(args, workdir: str) -> Dict[str, Any]:
+    data = SyntheticData(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher = open_searcher(workdir, data, args.messages)
+        if not searcher.index.count():
+            searcher.build_index()
+        queries = data.queries(args.queries)
+
+        # The first query pays for lazy setup (retriever, vectors, caches)
+        start = time.perf_counter()
+        searcher.process_query(queries[0], max_results=args.max_results)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        latencies, hits = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            hits += len(searcher.process_query(query, max_results=args.max_results))
+            latencies.append((time.perf_counter() - start) * 1000)
+        searcher.close()
+    return {'queries': len(queries), 'messages': args.messages, 'first_ms': round(first_ms, 2),
+            'mean_hits': round(hits / len(queries), 1), **percentiles(latencies),
+            'per_sec': round(len(queries) / (sum(latencies) / 1000))}
+
+
+def run_stage_here(args):
+    """Entry point of a stage worker: run one stage and print its JSON"""
+    stage = globals()[f"stage_{args.stage_worker}"]
+    result = stage(args, args.workdir)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_stage(stage: str, args, workdir: str) -> Dict[str, Any]:
+    """Run a stage in a fresh interpreter, with HOME pointed at the work directory
+    so OutlookDeepLook's base directory stays out of the real profile"""
+    command = [sys.executable, os.path.abspath(__file__), '--stage-worker', stage, '--workdir', workdir,
+               '--seed', str(args.seed), '--messages', str(args.messages), '--registry', str(args.registry),
+               '--queries', str(args.queries), '--max-results', str(args.max_results),
+               '--parse-mode', args.parse_mode, '--dedup', args.dedup]
+    env = dict(os.environ, HOME=workdir, USERPROFILE=workdir)
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode:
+        error = (completed.stderr.strip().splitlines() or ["stage failed"])[-1]
+        return {'error': error, 'wall_seconds': round(wall, 3)}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['wall_seconds'] = round(wall, 3)
+    return result
+
+
+def git_commit() -> Dict[str, Any]:
+    def git(*command):
+        completed = subprocess.run(['git', *command], cwd=ROOT, capture_output=True, text=True)
+        return completed.stdout.strip() if completed.returncode == 0 else None
+    return {'commit': git('rev-parse', '--short', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--', '*.py'))}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print the change of each COMPARED metric against an earlier results file"""
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    if (baseline.get('messages'), baseline.get('registry')) != (results['messages'], results['registry']):
+        print(f"  note: sizes differ ({baseline.get('messages')} messages, {baseline.get('registry')} registry lines)")
+    for stage, metrics in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage, {})
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if higher_is_better else change < 0
+            flag = "" if abs(change) < 5 else ("  better" if better else "  WORSE")
+            print(f"  {stage:<9}{metric:<13}{old:>12}{new:>12}{change:>+9.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k', help="messages and registry lines")
+    parser.add_argument('--messages', type=int, help="override the number of messages")
+    parser.add_argument('--registry', type=int, help="override the number of registry lines")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--max-results', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--parse-mode', choices=['memory', 'streaming', 'parallel'], default='streaming')
+    parser.add_argument('--dedup', default='set', help="DocumentParser dedup backend")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<commit>-<scale>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    parser.add_argument('--keep', action='store_true', help="keep the work directory")
+    parser.add_argument('--stage-worker', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.messages = args.messages or SCALES[args.scale]
+    args.registry = args.registry or SCALES[args.scale]
+
+    if args.stage_worker:
+        run_stage_here(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="deeplook-bench-")
+    results = {
+        **git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': args.scale,
+        'seed': args.seed,
+        'messages': args.messages,
+        'registry': args.registry,
+        'stages': {}
+    }
+    try:
+        for stage in args.stages:
+            print(f"Running {stage}...", flush=True)
+            results['stages'][stage] = run_stage(stage, args, workdir)
+    finally:
+        if args.keep:
+            print(f"Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"{results['commit'] or 'nogit'}-{args.scale}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'stage':<10}{'seconds':>9}{'per sec':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak MB':>9}")
+    for stage, r in results['stages'].items():
+        if r.get('error'):
+            print(f"{stage:<10}  error: {r['error']}")
+            continue
+        cells = [r.get('seconds', ''), f"{r['per_sec']:,}" if r.get('per_sec') else '', r.get('p50_ms', ''),
+                 r.get('p95_ms', ''), r.get('p99_ms', ''), r.get('peak_rss_mb') or '']
+        print(f"{stage:<10}" + "".join(f"{str(cell):>{width}}" for cell, width in zip(cells, [9, 11, 9, 9, 9, 9])))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Seeded synthetic mailboxes, registries and queries for benchmarks.
+
+Everything is derived from config.py, so subjects mix real PROJECT_MAPPING
+aliases, DOCUMENT_TYPES prefixes and reference numbers in the shapes of
+REFERENCE_PATTERNS, in roughly the proportions seen in project mail. The
+same seed always produces the same data.
+
+    python benchmarks/synthetic.py registry output/input.txt --count 100000
+    python benchmarks/synthetic.py mbox export/mail.mbox --count 10000
+"""
+import os
+import sys
+import random
+import argparse
+import mailbox
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROJECT_MAPPING, DOCUMENT_TYPES, DEPARTMENT_MAPPING
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+START = datetime(2019, 1, 1)
+DAYS = 6 * 365
+
+TOPICS = [
+    "payment certificate", "variation order", "site handover", "snagging list", "design review",
+    "extension of time", "retention release", "final account", "NOC approval", "tender evaluation",
+    "fit-out works", "MEP coordination", "defects liability", "bank guarantee", "insurance renewal",
+    "lease agreement", "service charge", "authority inspection", "structural drawings", "progress report"
+]
+
+WORDS = (
+    "please find attached the revised schedule for your review and approval we refer to the above "
+    "subject and confirm that the contractor has completed the works on site as per the agreed programme "
+    "kindly arrange the payment within the contractual period the consultant has raised comments on the "
+    "submitted drawings which need to be addressed before the next meeting the amount is subject to "
+    "retention and deduction of advance payment further to our discussion we attach the minutes of meeting "
+    "for your records and action the authority has requested additional documents regarding the permit"
+).split()
+
+SENDERS = ["projects", "contracts", "finance", "legal", "procurement", "facilities", "design", "site"]
+DOMAINS = ["example.com", "contractor.example", "consultant.example", "authority.example"]
+REPLY_PREFIXES = ["", "", "", "RE: ", "RE: ", "FW: ", "RE: RE: "]
+
+
+def _code(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(length))
+
+
+class SyntheticData:
+    """Deterministic generator of mail, registry lines and queries from config.py"""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.aliases = [(code, alias) for code, project in PROJECT_MAPPING.items() for alias in project['aliases']]
+        self.prefixes = [prefix for doc_type in DOCUMENT_TYPES.values() for prefix in doc_type['prefixes']]
+        self.departments = list(DEPARTMENT_MAPPING) or ["ABS"]
+
+    def reference(self, rng: random.Random) -> str:
+        """A reference number in one of the REFERENCE_PATTERNS shapes"""
+        year = rng.randint(2013, 2024)
+        number = rng.randint(1, 400)
+        department = rng.choice(self.departments)
+        shape = rng.random()
+        if shape < 0.3:
+            return f"{number}PD-{year}"
+        if shape < 0.5:
+            return f"{_code(rng, 3)}-{number}PD-{year}"
+        if shape < 0.7:
+            return f"STRED-{_code(rng, 4)}-{department}-{_code(rng, 3)}-{number}PD-{year}"
+        if shape < 0.85:
+            return f"LOA-{_code(rng, 3)}-{_code(rng, 5)}-{department}-{number:02d}PD-{year}"
+        if shape < 0.95:
+            return f"LTR-{department}-{number:03d}-{year}"
+        return f"ST/{_code(rng, 2)}/{number:04d}-{year}"
+
+    def subject(self, rng: random.Random) -> str:
+        parts = []
+        if rng.random() < 0.6:
+            parts.append(rng.choice(self.prefixes))
+        if rng.random() < 0.75:
+            parts.append(rng.choice(self.aliases)[1])
+        parts.append(rng.choice(TOPICS))
+        if rng.random() < 0.5:
+            parts.append(self.reference(rng))
+        rng.shuffle(parts)
+        return " - ".join(parts)
+
+    def body(self, rng: random.Random, subject: str) -> str:
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + ".")
+        if rng.random() < 0.3:
+            sentences.insert(rng.randrange(len(sentences)), f"Our ref. {self.reference(rng)}.")
+        if rng.random() < 0.4:
+            sentences.append(f"Regarding: {subject}")
+        return " ".join(sentences)
+
+    def iter_messages(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Mailbox message dicts; about a third are replies in an earlier thread"""
+        rng = random.Random(self.seed)
+        threads = []
+        for i in range(count):
+            received = START + timedelta(seconds=int(DAYS * 86400 * i / max(count, 1)) + rng.randint(0, 3600))
+            if threads and rng.random() < 0.35:
+                conversation_id, base = rng.choice(threads)
+                subject = rng.choice(["RE: ", "RE: ", "FW: "]) + base
+            else:
+                base = self.subject(rng)
+                conversation_id = f"<thread-{i}@{self.seed}.synthetic>"
+                subject = rng.choice(REPLY_PREFIXES) + base
+                threads.append((conversation_id, base))
+                if len(threads) > 2000:
+                    threads.pop(0)
+            stamp = received.strftime("%Y-%m-%d %H:%M:%S")
+            yield {
+                'entry_id': f"<msg-{i}@{self.seed}.synthetic>",
+                'subject': subject,
+                'sender': f"{rng.choice(SENDERS)}@{rng.choice(DOMAINS)}",
+                'received': stamp,
+                'modified': stamp,
+                'body': self.body(rng, base),
+                'folder': rng.choice(["Inbox", "Inbox", "Inbox", "Sent Items", "Archive"]),
+                'conversation_id': conversation_id
+            }
+
+    def iter_registry_lines(self, count: int) -> Iterator[str]:
+        """Tab-separated registry lines in the layout DocumentParser reads, header first.
+
+        About 2% of lines repeat an earlier file name and ID, so dedup has work to do.
+        """
+        rng = random.Random(self.seed + 1)
+        yield "File Name\tDocument ID\tDate\tDescription"
+        recent = []
+        for i in range(count):
+            if recent and rng.random() < 0.02:
+                yield rng.choice(recent)
+                continue
+            reference = self.reference(rng)
+            prefix = rng.choice(self.prefixes)
+            code, alias = rng.choice(self.aliases) if rng.random() < 0.85 else ("", "")
+            file_name = f"{prefix}-{alias.split()[0] if alias else 'MISC'}-{reference}.pdf".replace("/", "-")
+            date = (START + timedelta(days=rng.randrange(DAYS))).strftime("%d/%m/%Y")
+            description = f"{rng.choice(TOPICS)} {alias}  {reference}".strip()
+            line = f"{file_name}\t{i:08d}\t{date}\t{description}"
+            recent.append(line)
+            if len(recent) > 1000:
+                recent.pop(0)
+            yield line
+
+    def queries(self, count: int) -> List[str]:
+        """Natural-language queries shaped like the CLI examples"""
+        rng = random.Random(self.seed + 2)
+        queries = []
+        for _ in range(count):
+            alias = rng.choice(self.aliases)[1]
+            topic = rng.choice(TOPICS)
+            doc_type = rng.choice(list(DOCUMENT_TYPES))
+            shape = rng.random()
+            if shape < 0.3:
+                queries.append(f"Find emails about {topic} from {alias}")
+            elif shape < 0.5:
+                plural = doc_type.lower() if doc_type.endswith("s") else f"{doc_type.lower()}s"
+                queries.append(f"Show me all {plural} related to {rng.choice(list(PROJECT_MAPPING))}")
+            elif shape < 0.7:
+                queries.append(f"What are the recent emails about {topic}?")
+            elif shape < 0.85:
+                queries.append(f"{topic} {alias} {rng.choice(WORDS)}")
+            else:
+                queries.append(f"Documents for reference {self.reference(rng)}")
+        return queries
+
+
+def write_registry(path: str, count: int, seed: int = 0) -> str:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for line in SyntheticData(seed).iter_registry_lines(count):
+            f.write(line + "\n")
+    return path
+
+
+def write_mbox(path: str, count: int, seed: int = 0) -> str:
+    """Export a synthetic mailbox as mbox, for the mbox backend"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    box = mailbox.mbox(path, create=True)
+    try:
+        for message in SyntheticData(seed).iter_messages(count):
+            msg = EmailMessage()
+            msg['Message-ID'] = message['entry_id']
+            msg['References'] = message['conversation_id']
+            msg['Subject'] = message['subject']
+            msg['From'] = message['sender']
+            msg['Date'] = format_datetime(datetime.strptime(message['received'], "%Y-%m-%d %H:%M:%S"))
+            msg.set_content(message['body'])
+            box.add(msg)
+    finally:
+        box.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('kind', choices=['registry', 'mbox'])
+    parser.add_argument('path')
+    parser.add_argument('--count', type=int, default=SCALES['10k'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    (write_registry if args.kind == 'registry' else write_mbox)(args.path, args.count, args.seed)
+    print(f"Wrote {args.count:,} {args.kind} entries to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
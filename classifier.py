@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Optional
+from config import PROJECT_MAPPING, DEPARTMENT_MAPPING, DOCUMENT_TYPES
+
+
+def _build_trie_pattern(terms: List[str]) -> str:
+    """Build a regex alternation factored as a prefix trie.
+
+    Longer continuations are tried before the shorter term ends, so at any
+    position the regex returns the longest term starting there.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        is_end = '' in node
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if is_end else body
+
+    return build(trie)
+
+
+def _ends_word(term: str, end: int) -> bool:
+    """Check whether term[:end] ends on a word boundary within term"""
+    return end == len(term) or not (term[end].isalnum() or term[end] == '_')
+
+
+class TermMatcher:
+    """Single-pass matcher for an ordered list of (term, value) pairs.
+
+    The first occurrence of a term in the list defines its rank; when several
+    terms occur in a text the one with the lowest rank wins, which mirrors the
+    nested "for code ... for alias ..." loops this replaces. With whole_words
+    a term only matches between word boundaries.
+    """
+
+    def __init__(self, entries: List[Tuple[str, Any]], whole_words: bool = False):
+        self.ranks = {}
+        self.values = []
+        for term, value in entries:
+            term = term.upper()
+            if term and term not in self.ranks:
+                self.ranks[term] = len(self.values)
+                self.values.append(value)
+
+        # Every term matching at a given position is a prefix of the longest
+        # one, so resolve the best rank among those prefixes up front
+        self.best_rank = {}
+        for term in self.ranks:
+            self.best_rank[term] = min(
+                rank for other, rank in self.ranks.items()
+                if term.startswith(other) and (not whole_words or _ends_word(term, len(other)))
+            )
+
+        self.pattern = None
+        if self.ranks:
+            pattern = _build_trie_pattern(list(self.ranks))
+            if whole_words:
+                pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+            self.pattern = re.compile(pattern)
+
+    def _ranks(self, text: str):
+        """Yield the best rank of the terms starting at each matching position"""
+        if self.pattern is None:
+            return
+        search = self.pattern.search
+        pos = 0
+        match = search(text, pos)
+        while match is not None:
+            yield self.best_rank[match.group()]
+            pos = match.start() + 1
+            match = search(text, pos)
+
+    def first(self, text: str) -> Optional[Any]:
+        """Return the value of the highest-precedence term found in an upper-cased text"""
+        best = None
+        for rank in self._ranks(text):
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    break
+        return self.values[best] if best is not None else None
+
+    def find_all(self, text: str) -> List[Any]:
+        """Return every distinct value found in an upper-cased text, in precedence order"""
+        return [self.values[rank] for rank in sorted(set(self._ranks(text)))]
+
+
+class TextClassifier:
+    """Project, department and document-type classifier compiled from config.py"""
+
+    def __init__(self, project_mapping: Dict = None, department_mapping: Dict = None,
+                 document_types: Dict = None, whole_words: bool = False):
+        self.project_mapping = project_mapping if project_mapping is not None else PROJECT_MAPPING
+        self.dept_mapping = department_mapping if department_mapping is not None else DEPARTMENT_MAPPING
+        self.doc_types = document_types if document_types is not None else DOCUMENT_TYPES
+
+        self.projects = TermMatcher(self._code_entries(self.project_mapping), whole_words)
+        self.departments = TermMatcher(self._code_entries(self.dept_mapping), whole_words)
+        self.documents = TermMatcher([
+            (prefix, doc_type)
+            for doc_type, patterns in self.doc_types.items()
+            for prefix in patterns['prefixes']
+        ], whole_words)
+
+        # Per-project matchers for "does this text mention project X" checks
+        self._project_matchers = {
+            code: TermMatcher([(alias, code) for alias in project['aliases']], whole_words)
+            for code, project in self.project_mapping.items()
+        }
+
+    @staticmethod
+    def _code_entries(mapping: Dict) -> List[Tuple[str, str]]:
+        """Exact codes first, then aliases in config order"""
+        entries = [(code, code) for code in mapping]
+        for code, entry in mapping.items():
+            entries.extend((alias, code) for alias in entry['aliases'])
+        return entries
+
+    def identify_project(self, text: str) -> Optional[str]:
+        """Return the project code for a text, or None"""
+        return self.projects.first(text.upper()) if text else None
+
+    def identify_department(self, text: str) -> Optional[str]:
+        """Return the department code for a text, or None"""
+        return self.departments.first(text.upper()) if text else None
+
+    def identify_document_type(self, text: str) -> Optional[str]:
+        """Return the document type for a text, or None"""
+        return self.documents.first(text.upper()) if text else None
+
+    def matches_project(self, text: str, project_code: str) -> bool:
+        """Check whether any alias of a project appears in a text"""
+        matcher = self._project_matchers.get(project_code)
+        if matcher is None or not text:
+            return False
+        return matcher.first(text.upper()) is not None
+
+    def classify(self, text: str) -> Dict[str, Optional[str]]:
+        """Classify a text in one upper-case pass per matcher"""
+        upper = text.upper() if text else ''
+        return {
+            'project_code': self.projects.first(upper),
+            'department': self.departments.first(upper),
+            'document_type': self.documents.first(upper)
+        }
+
+
+@lru_cache(maxsize=1)
+def get_classifier() -> TextClassifier:
+    """Shared classifier built once from config.py"""
+    return TextClassifier()
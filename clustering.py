@@ -0,0 +1,175 @@
+import re
+import operator
+from typing import Dict, Any, List, Iterable, Iterator, Optional
+
+# Reply/forward markers Outlook and other clients put in front of subjects
+SUBJECT_PREFIX = re.compile(r'^\s*(?:(?:re|fw|fwd|aw|wg|sv|vs|tr)\s*(?:\[\d+\])?\s*:|\[ext(?:ernal)?\])\s*',
+                            re.IGNORECASE)
+
+def normalize_subject(subject: str) -> str:
+    """Subject without RE:/FW:-style prefixes, whitespace-collapsed and lower-cased"""
+    subject = subject or ""
+    while True:
+        stripped = SUBJECT_PREFIX.sub('', subject, count=1)
+        if stripped == subject:
+            break
+        subject = stripped
+    return " ".join(subject.lower().split())
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Distinct word n-grams of a text, as tuples"""
+    words = re.findall(r'\w+', (text or "").lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return set(zip(*(words[i:] for i in range(size))))
+
+
+def minhash(features: Iterable, bins: int = 32) -> Optional[tuple]:
+    """One-permutation MinHash sketch of a feature set, or None when it is empty.
+
+    Feature hashes are split into `bins` bins by their low bits and the
+    smallest hash of each bin is kept; an empty bin borrows the value of
+    the next non-empty one. Two sketches agree on a bin with probability
+    close to the Jaccard similarity of their sets, for one hash per feature
+    instead of one per permutation. Uses the built-in hash, so sketches are
+    only comparable within a process.
+    """
+    hashes = sorted(map(hash, features), reverse=True)
+    if not hashes:
+        return None
+    mask = bins - 1
+    smallest = {h & mask: h for h in hashes}  # Later, smaller hashes overwrite larger ones
+    sketch = [smallest.get(b) for b in range(bins)]
+    if len(smallest) < bins:
+        # Walk right to left so each empty bin takes the next filled value,
+        # wrapping around to the first filled bin
+        carry = sketch[min(smallest)]
+        for b in range(bins - 1, -1, -1):
+            if sketch[b] is None:
+                sketch[b] = carry
+            else:
+                carry = sketch[b]
+    return tuple(sketch)
+
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Jaccard estimate from two MinHash sketches"""
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+class ResultClusterer:
+    """Incremental clustering of search results into threads and near-duplicates.
+
+    A result joins an existing cluster when it shares a ConversationID with
+    it, when it has no ConversationID and shares a normalized subject (so
+    generic subjects never merge distinct threads), or when the estimated
+    Jaccard similarity of its body shingles to a member's reaches threshold. Near-duplicate
+    candidates come from LSH banding: the MinHash sketch is cut into bands
+    of `rows` bins and only results with an identical band are compared.
+    Each bucket keeps at most bucket_size members, so clustering n results
+    is O(n) regardless of how they group.
+
+    The first result of a cluster is its representative; it carries
+    'cluster_size' and the entry IDs of the rest in 'duplicates'.
+    """
+
+    def __init__(self, threshold: float = 0.7, bins: int = 32, rows: int = 4, bucket_size: int = 32):
+        if bins & (bins - 1) or bins % rows:
+            raise ValueError("bins must be a power of two and a multiple of rows")
+        self.threshold = threshold
+        self.bins = bins
+        self.rows = rows
+        self.buckets = {}
+        self.bucket_size = bucket_size
+        self.parent = []
+        self.sketches = []
+        self.representatives = {}
+        self.conversations = {}
+        self.subjects = {}
+
+    def _find(self, index: int) -> int:
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def _candidates(self, index: int, result: Dict[str, Any], sketch: Optional[tuple]) -> set:
+        roots = set()
+        conversation_id = result.get('conversation_id')
+        if conversation_id:
+            if conversation_id in self.conversations:
+                roots.add(self._find(self.conversations[conversation_id]))
+            else:
+                self.conversations[conversation_id] = index
+
+        # Subjects only stand in for a missing ConversationID
+        subject = normalize_subject(result.get('subject'))
+        if subject:
+            if subject not in self.subjects:
+                self.subjects[subject] = index
+            elif not conversation_id:
+                roots.add(self._find(self.subjects[subject]))
+
+        if sketch is not None:
+            for start in range(0, self.bins, self.rows):
+                bucket = self.buckets.setdefault((start, sketch[start:start + self.rows]), [])
+                for other in bucket:
+                    root = self._find(other)
+                    if root in roots:
+                        break
+                    if similarity(sketch, self.sketches[other]) >= self.threshold:
+                        roots.add(root)
+                        break
+                if len(bucket) < self.bucket_size:
+                    bucket.append(index)
+        return roots
+
+    def add(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a result and return the representative of its cluster"""
+        index = len(self.parent)
+        sketch = minhash(shingles(result.get('body')), self.bins)
+        self.parent.append(index)
+        self.sketches.append(sketch)
+
+        roots = self._candidates(index, result, sketch)
+        if not roots:
+            result['cluster_size'] = 1
+            result['duplicates'] = []
+            self.representatives[index] = result
+            return result
+
+        # The earliest cluster absorbs the new result and any other cluster it links
+        root = min(roots)
+        representative = self.representatives[root]
+        self.parent[index] = root
+        representative['cluster_size'] += 1
+        representative['duplicates'].append(result.get('entry_id'))
+        for other in roots - {root}:
+            merged = self.representatives.pop(other)
+            self.parent[other] = root
+            representative['cluster_size'] += merged['cluster_size']
+            representative['duplicates'].extend([merged.get('entry_id')] + merged['duplicates'])
+        return representative
+
+    def iter_collapsed(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Lazily yield each result that starts a new cluster.
+
+        Counts on yielded representatives keep growing as later members
+        arrive; a cluster merged into an earlier one after it was yielded
+        is folded into that one's count.
+        """
+        for result in results:
+            if self.add(result) is result:
+                yield result
+
+    def clusters(self) -> List[Dict[str, Any]]:
+        """Current representatives, in order of first appearance"""
+        return [self.representatives[index] for index in sorted(self.representatives)]
+
+    def collapse(self, results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One representative per cluster of results, in order of first appearance"""
+        for _ in self.iter_collapsed(results):
+            pass
+        return self.clusters()
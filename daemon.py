@@ -0,0 +1,497 @@
+"""Long-running DeepLook service and its thin command-line client.
+
+Start the service once; it connects to Outlook, opens the mail index,
+vector index, reference graph and document store, and answers queries as
+JSON over HTTP on localhost:
+
+    python daemon.py serve [--all-folders] [--attachments] [--build-index] [--sync-interval 300]
+    python daemon.py serve --backend pst --path archive.pst --build-index
+    python daemon.py serve --metrics     # collect stage timings for GET /metrics
+
+Then ask questions without paying the start-up cost again:
+
+    python daemon.py ask "recent emails about payment"
+    python daemon.py ask "recent emails about payment" --profile cprofile
+    python daemon.py             # interactive prompt
+
+Endpoints:
+    GET  /health      status, queue depth and index size
+    GET  /metrics     stage timings and counters as Prometheus text (?format=json for JSON)
+    POST /query       {"query", "max_results", "analyze", "timeout"} -> clustered email hits
+    POST /documents   {"query", "timeout"} -> registry document analysis
+
+/query and /documents also take "metrics": true and "profile": "cprofile"
+or "pyinstrument" to return that request's stage breakdown.
+    POST /sync        re-sync the mail index
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.request import Request, urlopen
+from urllib.error import URLError, HTTPError
+from typing import Dict, Any, List, Callable, Optional
+import instrumentation
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 60.0
+MAX_PENDING = 32
+MAX_RESULTS = 20
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Worker:
+    """Runs jobs one at a time on a dedicated thread that owns its resources.
+
+    Outlook's COM objects and SQLite connections must stay on the thread
+    that created them, so setup() runs on the worker thread and every job
+    receives its result. At most max_pending jobs wait; submit() raises
+    QueueFull beyond that. A job that has not started by its deadline is
+    dropped; a running job gets the deadline to stop early. status(), if
+    given, also runs on the worker thread, after setup and after every job,
+    and its result is kept in self.status for other threads to read.
+    """
+
+    def __init__(self, name: str, setup: Callable[[], Any], teardown: Callable[[Any], None] = None,
+                 max_pending: int = MAX_PENDING, status: Callable[[Any], Dict[str, Any]] = None):
+        self.name = name
+        self.setup = setup
+        self.teardown = teardown
+        self.report = status
+        self.status = {}
+        self.jobs = queue.Queue(max_pending)
+        self.state = None
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.state = self.setup()
+        except Exception as e:
+            print(f"✗ {self.name} failed to start: {str(e)}")
+            self.error = e
+        self._refresh()
+        self.ready.set()
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            future, func, deadline = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if self.error is not None:
+                future.set_exception(self.error)
+                continue
+            try:
+                future.set_result(func(self.state, deadline))
+            except Exception as e:
+                future.set_exception(e)
+            self._refresh()
+
+        if self.teardown and self.state is not None:
+            self.teardown(self.state)
+
+    def _refresh(self):
+        if self.report is None or self.state is None:
+            return
+        try:
+            self.status = self.report(self.state)
+        except Exception as e:
+            print(f"✗ {self.name} status failed: {str(e)}")
+
+    def pending(self) -> int:
+        return self.jobs.qsize()
+
+    def submit(self, func: Callable[[Any, float], Any], timeout: float) -> Future:
+        future = Future()
+        try:
+            self.jobs.put_nowait((future, func, time.monotonic() + timeout))
+        except queue.Full:
+            raise QueueFull(f"{self.name} has {self.jobs.maxsize} requests waiting")
+        return future
+
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+
+def open_mail(api_key: str = None, all_folders: bool = False, build_index: bool = False,
+              backend: str = 'outlook', path: str = None, attachments: bool = False):
+    from outlook_deeplook import OutlookDeepLook
+    searcher = OutlookDeepLook(use_claude=bool(api_key), claude_api_key=api_key, all_folders=all_folders,
+                               backend=backend, backend_options={'path': path} if path else None,
+                               attachments=attachments)
+    if searcher.index.count():
+        searcher.sync_index()
+    elif build_index:
+        searcher.build_index()
+    return searcher
+
+
+def run_query(searcher, request: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+    """Clustered hits for one query; stops collecting at the deadline"""
+    from clustering import ResultClusterer
+    query = request['query']
+    clusterer = ResultClusterer()
+    partial = False
+    with instrumentation.stage('query'):
+        for _ in clusterer.iter_collapsed(searcher.iter_query(query, request.get('max_results') or MAX_RESULTS)):
+            if time.monotonic() > deadline:
+                partial = True
+                break
+        results = clusterer.clusters()
+
+        analysis = None
+        if request.get('analyze') and searcher.use_claude and results and not partial:
+            with instrumentation.stage('analysis'):
+                analysis = searcher.result_analyzer.analyze(results, query)
+    return {
+        'query': query,
+        'results': results,
+        'count': len(results),
+        'similar': sum(result['cluster_size'] for result in results) - len(results),
+        'analysis': analysis,
+        'partial': partial
+    }
+
+
+def measured(job: Callable[[Any, float], Dict[str, Any]], request: Dict[str, Any]) -> Callable[[Any, float], Any]:
+    """Wrap a job to capture its stages when the request asks for metrics or a profile"""
+    if not (request.get('metrics') or request.get('profile')):
+        return job
+
+    def run(state, deadline):
+        # Captures are per thread, so this has to run on the worker
+        with instrumentation.capture(request.get('profile')) as metrics:
+            payload = job(state, deadline)
+        payload['metrics'] = metrics.to_dict()
+        return payload
+    return run
+
+
+class DeepLookDaemon:
+    """HTTP front end over a mail worker and a document worker.
+
+    Handler threads only parse requests and wait on the worker's future,
+    so slow queries of one kind never hold up the other, and a request
+    that exceeds its timeout gets a 504 while the worker moves on.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, api_key: str = None,
+                 all_folders: bool = False, build_index: bool = False, backend: str = 'outlook',
+                 path: str = None, csv_file: str = "output/MERGED.csv",
+                 timeout: float = DEFAULT_TIMEOUT, max_pending: int = MAX_PENDING, sync_interval: float = 0,
+                 attachments: bool = False):
+        self.timeout = timeout
+        self.started = time.time()
+        self.mail = Worker(
+            "mail", lambda: open_mail(api_key, all_folders, build_index, backend, path, attachments),
+            lambda searcher: searcher.close(), max_pending,
+            status=lambda searcher: {'indexed': searcher.index.count()}
+        )
+        self.documents = Worker("documents", lambda: self._open_documents(csv_file), max_pending=max_pending,
+                                status=lambda searcher: {'documents': len(searcher.documents)})
+        self.server = ThreadingHTTPServer((host, port), DaemonHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.sync_interval = sync_interval
+        self._stopping = threading.Event()
+
+    @staticmethod
+    def _open_documents(csv_file: str):
+        if not os.path.exists(csv_file):
+            return None
+        from search import DocumentSearcher
+        return DocumentSearcher(csv_file)
+
+    def health(self) -> Dict[str, Any]:
+        """Answered from the workers' cached status, without touching their resources"""
+        return {
+            'status': 'ok' if self.mail.ready.is_set() and self.mail.error is None else
+                      'starting' if not self.mail.ready.is_set() else 'error',
+            'uptime': round(time.time() - self.started, 1),
+            'indexed': self.mail.status.get('indexed', 0),
+            'documents': self.documents.status.get('documents', 0),
+            'pending': {'mail': self.mail.pending(), 'documents': self.documents.pending()},
+            'metrics': instrumentation.enabled()
+        }
+
+    def request_timeout(self, request: Dict[str, Any]) -> float:
+        try:
+            return min(float(request.get('timeout') or self.timeout), self.timeout)
+        except (TypeError, ValueError):
+            return self.timeout
+
+    def query(self, request: Dict[str, Any]) -> Future:
+        return self.mail.submit(measured(lambda searcher, deadline: run_query(searcher, request, deadline), request),
+                                self.request_timeout(request))
+
+    def search_documents(self, request: Dict[str, Any]) -> Future:
+        def search(searcher, deadline):
+            if searcher is None:
+                raise RuntimeError("No document registry loaded")
+            return {'query': request['query'], 'answer': searcher.search_with_claude(request['query'])}
+        return self.documents.submit(measured(search, request), self.request_timeout(request))
+
+    def sync(self, request: Dict[str, Any] = None) -> Future:
+        return self.mail.submit(lambda searcher, deadline: searcher.sync_index(), self.timeout)
+
+    def _sync_loop(self):
+        while not self._stopping.wait(self.sync_interval):
+            try:
+                self.sync().result()
+            except Exception as e:
+                print(f"Sync error: {str(e)}")
+
+    def serve_forever(self):
+        host, port = self.server.server_address[:2]
+        print(f"✓ Serving on http://{host}:{port}")
+        if self.sync_interval:
+            threading.Thread(target=self._sync_loop, name="sync", daemon=True).start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self._stopping.set()
+        self.server.server_close()
+        self.mail.stop()
+        self.documents.stop()
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    server_version = "DeepLook/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status: int, text: str):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.server.service.health())
+        elif self.path == "/metrics":
+            self._send_text(200, instrumentation.export('prometheus'))
+        elif self.path == "/metrics?format=json":
+            self._send(200, instrumentation.TOTALS.to_dict())
+        else:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        routes = {'/query': service.query, '/documents': service.search_documents, '/sync': service.sync}
+        if self.path not in routes:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != '/sync' and not str(request.get('query') or "").strip():
+                raise ValueError("'query' is required")
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        started = time.monotonic()
+        try:
+            future = routes[self.path](request)
+        except QueueFull as e:
+            self._send(503, {'error': str(e)})
+            return
+        # Running jobs stop collecting hits at the deadline; allow them a moment to return
+        timeout = service.request_timeout(request) + 1.0
+        try:
+            payload = future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._send(504, {'error': f"Timed out after {timeout - 1.0:g}s"})
+            return
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+            return
+        if not isinstance(payload, dict):
+            payload = {'result': payload}
+        payload['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        self._send(200, payload)
+
+
+class DaemonClient:
+    """Thin JSON client for a running DeepLookDaemon"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT):
+        self.url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _call(self, method: str, path: str, payload: Dict[str, Any] = None, timeout: float = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = Request(self.url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=timeout or self.timeout + 5) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error')
+            except ValueError:
+                message = None
+            raise RuntimeError(message or str(e))
+
+    def available(self) -> bool:
+        try:
+            return self._call("GET", "/health", timeout=0.5).get('status') in ('ok', 'starting')
+        except (URLError, OSError, RuntimeError, ValueError):
+            return False
+
+    def health(self) -> Dict[str, Any]:
+        return self._call("GET", "/health")
+
+    def query(self, query: str, max_results: int = None, analyze: bool = False, metrics: bool = False,
+              profile: str = None) -> Dict[str, Any]:
+        return self._call("POST", "/query", {'query': query, 'max_results': max_results, 'analyze': analyze,
+                                             'timeout': self.timeout, 'metrics': metrics, 'profile': profile})
+
+    def documents(self, query: str, metrics: bool = False, profile: str = None) -> Dict[str, Any]:
+        return self._call("POST", "/documents", {'query': query, 'timeout': self.timeout, 'metrics': metrics,
+                                                 'profile': profile})
+
+    def metrics(self) -> Dict[str, Any]:
+        """Process-wide stage totals of the service (empty unless it runs with --metrics)"""
+        return self._call("GET", "/metrics?format=json")
+
+    def sync(self) -> Dict[str, Any]:
+        return self._call("POST", "/sync", {})
+
+
+def print_metrics(response: Dict[str, Any]):
+    if response.get('metrics'):
+        print(f"\n{instrumentation.format_report(response['metrics'])}")
+
+
+def print_response(response: Dict[str, Any]):
+    results = response['results']
+    if not results:
+        print("\nNo matching results found.")
+        print_metrics(response)
+        return
+    print("\nRelevant items:")
+    for idx, result in enumerate(results, 1):
+        print(f"\n{idx}. Subject: {result['subject']}")
+        print(f"   Date: {result['received']}")
+        if result.get('document_type'):
+            print(f"   Type: {result['document_type']}")
+    similar = response.get('similar')
+    print(f"\nFound {len(results)} relevant items" + (f" (+{similar} similar)" if similar else "")
+          + (" (timed out, partial)" if response.get('partial') else "")
+          + f" in {response.get('elapsed_ms', 0):g} ms")
+    if response.get('analysis'):
+        print(f"\n{response['analysis']}")
+    print_metrics(response)
+
+
+def repl(client: DaemonClient, analyze: bool = False, metrics: bool = False, profile: str = None):
+    """Interactive prompt answered by the daemon"""
+    print("\nOutlook DeepLook Bot (connected to daemon)")
+    while True:
+        question = input("\nAsk a question (or 'quit' to exit): ").strip()
+        if question.lower() == 'quit':
+            break
+        if not question:
+            continue
+        try:
+            print_response(client.query(question, MAX_RESULTS, analyze, metrics, profile))
+        except (RuntimeError, URLError, OSError) as e:
+            print(f"Error: {str(e)}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="DeepLook daemon and client")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="seconds per request")
+    commands = parser.add_subparsers(dest='command')
+
+    serve = commands.add_parser('serve', help="run the service")
+    serve.add_argument('--backend', default='outlook', help="mailbox backend: outlook, eml, mbox, pst")
+    serve.add_argument('--path', help="export to read for the eml, mbox and pst backends")
+    serve.add_argument('--all-folders', action='store_true', help="index every folder in every store")
+    serve.add_argument('--attachments', action='store_true', help="index and classify attachment text")
+    serve.add_argument('--build-index', action='store_true', help="build the mail index if it is empty")
+    serve.add_argument('--csv', default="output/MERGED.csv", help="document registry to serve")
+    serve.add_argument('--sync-interval', type=float, default=0, help="seconds between index syncs (0: never)")
+    serve.add_argument('--max-pending', type=int, default=MAX_PENDING, help="queued requests per worker")
+    serve.add_argument('--metrics', action='store_true', help="collect stage timings and counters for /metrics")
+
+    ask = commands.add_parser('ask', help="send one query to a running service")
+    ask.add_argument('query')
+    ask.add_argument('--max-results', type=int, default=MAX_RESULTS)
+    ask.add_argument('--analyze', action='store_true', help="add a Claude analysis of the hits")
+    ask.add_argument('--documents', action='store_true', help="search the document registry instead")
+    ask.add_argument('--json', action='store_true', help="print the raw JSON response")
+    ask.add_argument('--metrics', action='store_true', help="print the query's stage timings and counters")
+    ask.add_argument('--profile', choices=instrumentation.PROFILERS, help="profile the query on the service")
+
+    commands.add_parser('sync', help="re-sync the mail index of a running service")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if args.metrics:
+            instrumentation.enable()
+        DeepLookDaemon(
+            args.host, args.port, api_key=os.getenv('CLAUDE_API_KEY'), all_folders=args.all_folders,
+            build_index=args.build_index, backend=args.backend, path=args.path, csv_file=args.csv, timeout=args.timeout,
+            max_pending=args.max_pending, sync_interval=args.sync_interval, attachments=args.attachments
+        ).serve_forever()
+        return
+
+    client = DaemonClient(args.host, args.port, args.timeout)
+    if not client.available():
+        print(f"✗ No DeepLook daemon at {client.url}; start one with: python daemon.py serve")
+        sys.exit(1)
+    try:
+        if args.command == 'sync':
+            print(json.dumps(client.sync()))
+        elif args.command == 'ask':
+            response = client.documents(args.query, args.metrics, args.profile) if args.documents else \
+                client.query(args.query, args.max_results, args.analyze, args.metrics, args.profile)
+            if args.json:
+                print(json.dumps(response, indent=2, default=str))
+            elif args.documents:
+                print(response['answer'])
+                print_metrics(response)
+            else:
+                print_response(response)
+        else:
+            repl(client)
+    except RuntimeError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Tuple
+from config import PROJECT_MAPPING, DOCUMENT_TYPES
+
+# DASL property names used in Restrict/GetTable filters
+SUBJECT = "urn:schemas:httpmail:subject"
+BODY = "urn:schemas:httpmail:textdescription"
+RECEIVED = "urn:schemas:httpmail:datereceived"
+
+
+def quote(value: str) -> str:
+    """Quote a DASL string literal, doubling embedded single quotes"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def escape_like(text: str) -> str:
+    """Bracket LIKE wildcards so they match literally"""
+    return "".join(f"[{c}]" if c in "%_[" else c for c in str(text))
+
+
+def like(prop: str, text: str) -> str:
+    """Case-insensitive substring condition on a DASL property"""
+    return f'"{prop}" LIKE {quote("%" + escape_like(text) + "%")}'
+
+
+def any_of(conditions: List[str]) -> str:
+    """OR a list of conditions together as one parenthesized group"""
+    if len(conditions) == 1:
+        return conditions[0]
+    return "(" + " OR ".join(conditions) + ")"
+
+
+def format_date(value) -> str:
+    """Format a datetime or 'YYYY-MM-DD[ HH:MM:SS]' string for a DASL filter.
+
+    Naive values are local time; DASL compares date-times in UTC.
+    """
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value.astimezone(timezone.utc).strftime("%m/%d/%Y %I:%M %p")
+
+
+def compile_conditions(search_params: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+    """Compile search params into DASL conditions plus residual params.
+
+    The conditions are ANDed by the caller. Keywords and the date range are
+    fully expressed server-side. Project code and document type are pushed
+    down as a superset (any alias or prefix in the subject) and stay in the
+    residual params, because the classifier's precedence rules cannot be
+    written as a filter.
+    """
+    conditions = []
+    residual = {}
+
+    keywords = [kw for kw in search_params.get('keywords') or [] if kw]
+    if keywords:
+        conditions.append(any_of([
+            cond for kw in keywords for cond in (like(SUBJECT, kw), like(BODY, kw))
+        ]))
+
+    project_code = search_params.get('project_code')
+    if project_code:
+        terms = [project_code]
+        if project_code in PROJECT_MAPPING:
+            terms += PROJECT_MAPPING[project_code]['aliases']
+        conditions.append(any_of([like(SUBJECT, term) for term in terms]))
+        residual['project_code'] = project_code
+
+    doc_type = search_params.get('doc_type')
+    if doc_type:
+        if doc_type in DOCUMENT_TYPES:
+            conditions.append(any_of([like(SUBJECT, prefix) for prefix in DOCUMENT_TYPES[doc_type]['prefixes']]))
+        residual['doc_type'] = doc_type
+
+    if search_params.get('date_from'):
+        conditions.append(f'"{RECEIVED}" >= {quote(format_date(search_params["date_from"]))}')
+    if search_params.get('date_to'):
+        date_to = search_params['date_to']
+        if not isinstance(date_to, datetime) and len(str(date_to)) <= 10:
+            # A bare date means "up to the end of that day"
+            date_to = datetime.fromisoformat(str(date_to)) + timedelta(days=1)
+            conditions.append(f'"{RECEIVED}" < {quote(format_date(date_to))}')
+        else:
+            conditions.append(f'"{RECEIVED}" <= {quote(format_date(date_to))}')
+
+    return conditions, residual
+
+
+def compile_filter(search_params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Compile search params into an '@SQL=' Restrict filter plus residual params"""
+    conditions, residual = compile_conditions(search_params)
+    if not conditions:
+        return "", residual
+    return "@SQL=" + " AND ".join(conditions), residual
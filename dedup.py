@@ -0,0 +1,231 @@
+import os
+import math
+import sqlite3
+import hashlib
+from array import array
+from typing import Iterable, Iterator, List
+
+# Backend names accepted by make_deduper
+MODES = ['set', 'exact', 'bloom', 'disk']
+
+# make_deduper mode keeping the disk store's keys from earlier runs
+PERSIST_MODE = 'disk:persist'
+
+MASK64 = (1 << 64) - 1
+
+
+def hash64(key: str) -> int:
+    """Stable 64-bit hash of a key; never 0, which marks empty table slots"""
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class SetDeduper:
+    """Plain Python set of keys; fastest, but stores every key string"""
+
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key: str) -> bool:
+        """Record a key and return True if it was not seen before"""
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class HashDeduper:
+    """Open-addressing table of 64-bit key hashes in an array('Q').
+
+    Each key costs one 8-byte slot, at most max_load full, instead of a
+    string plus a set entry. Two keys are only confused when their 64-bit
+    hashes collide, about once in 10^19 pairs.
+    """
+
+    def __init__(self, capacity: int = 1024, max_load: float = 0.7):
+        self.max_load = max_load
+        size = 1 << max(4, math.ceil(math.log2(capacity / max_load)))
+        self.slots = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # The table lives for one process, so the built-in string hash is enough
+        return (hash(key) & MASK64) or 1
+
+    def _probe(self, value: int) -> int:
+        """Index of value's slot, or of the empty slot where it belongs"""
+        slots, mask = self.slots, self.mask
+        index = value & mask
+        slot = slots[index]
+        while slot and slot != value:
+            index = (index + 1) & mask
+            slot = slots[index]
+        return index
+
+    def _grow(self):
+        old = self.slots
+        self.slots = array('Q', bytes(16 * len(old)))
+        self.mask = len(self.slots) - 1
+        for value in old:
+            if value:
+                self.slots[self._probe(value)] = value
+
+    def add(self, key: str) -> bool:
+        """Record a key and return True if it was not seen before"""
+        value = self._hash(key)
+        index = self._probe(value)
+        if self.slots[index]:
+            return False
+        self.slots[index] = value
+        self.count += 1
+        if self.count > self.max_load * len(self.slots):
+            self._grow()
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self.slots[self._probe(self._hash(key))])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BloomDeduper:
+    """Bloom filter sized for a capacity and false-positive rate.
+
+    Memory is fixed up front at about 1.2 bytes per expected key for a 1%
+    error rate. A false positive makes a new key look already seen, so up
+    to error_rate of unique keys may be dropped; keys are never stored.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest(), 'little')
+        h1, h2 = digest & MASK64, (digest >> 64) | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> bool:
+        """Record a key and return True if it was (probably) not seen before"""
+        new = False
+        array = self.array
+        for position in self._positions(key):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not array[byte] & bit:
+                array[byte] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DiskDeduper:
+    """SQLite table of 64-bit key hashes, for key sets larger than memory.
+
+    Memory use is SQLite's page cache only. Inserts are committed every
+    batch_size new keys and on flush() or close(). By default the table is
+    emptied when the deduper is opened, so like the in-memory backends it
+    only remembers keys of its own run: a re-run that rewrites its outputs
+    must not skip rows an earlier run already wrote. With persist=True
+    (mode 'disk:persist') keys carry over between runs, for runs whose
+    output is only the rows not seen before, such as appending new input.
+    """
+
+    def __init__(self, path: str = "output/dedup.db", batch_size: int = 10000, persist: bool = False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (hash INTEGER PRIMARY KEY)")
+        if not persist:
+            with self.conn:
+                self.conn.execute("DELETE FROM seen")
+        self.batch_size = batch_size
+        self.pending = 0
+
+    @staticmethod
+    def _signed(key: str) -> int:
+        # SQLite integers are signed 64-bit
+        value = hash64(key)
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    def add(self, key: str) -> bool:
+        """Record a key and return True if it was not seen before"""
+        cursor = self.conn.execute("INSERT OR IGNORE INTO seen (hash) VALUES (?)", (self._signed(key),))
+        if not cursor.rowcount:
+            return False
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM seen WHERE hash = ?", (self._signed(key),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def flush(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def make_deduper(mode: str = 'set', **options):
+    """Create a dedup backend by name; options go to its constructor.
+
+    'disk:persist' is the disk backend keeping keys from earlier runs.
+    """
+    backends = {'set': SetDeduper, 'exact': HashDeduper, 'bloom': BloomDeduper, 'disk': DiskDeduper}
+    if mode == PERSIST_MODE:
+        return DiskDeduper(persist=True, **options)
+    if mode not in backends:
+        raise ValueError(f"Unknown dedup mode '{mode}', expected one of {', '.join(MODES + [PERSIST_MODE])}")
+    return backends[mode](**options)
+
+
+def unique(items: Iterable, key, deduper=None) -> Iterator:
+    """Lazily yield items whose key was not seen before"""
+    deduper = deduper if deduper is not None else make_deduper()
+    for item in items:
+        if deduper.add(key(item)):
+            yield item
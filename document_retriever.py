@@ -0,0 +1,158 @@
+import os
+import re
+import io
+import csv
+import json
+import math
+import heapq
+import sqlite3
+from collections import defaultdict, Counter
+from collections.abc import Sequence
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+from classifier import TextClassifier
+
+# Fields searched, with their weight in the score
+FIELD_WEIGHTS = {
+    'File_Name': 2.0,
+    'Document_ID': 2.0,
+    'Project_Code': 1.5,
+    'Project_Name': 1.0
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS postings (token TEXT NOT NULL, row INTEGER NOT NULL, weight REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS terms (token TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+"""
+
+# Rough characters-per-token ratio used to budget prompt context
+CHARS_PER_TOKEN = 4
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r'[a-z0-9]+', str(text).lower())
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def postings_path(csv_file: str) -> str:
+    """Postings database written next to a registry CSV and its Arrow store"""
+    return os.path.splitext(csv_file)[0] + ".postings.db"
+
+
+class DocumentRetriever:
+    """TF-IDF inverted index over document registry rows.
+
+    Postings map each token to (row, weighted term frequency / row norm)
+    pairs in an indexed SQLite table, so a query only touches the rows
+    sharing at least one token with it, no matter how large the registry
+    is. With a path the postings persist next to the registry and are only
+    rebuilt when `version` (or the field weights) change; the rows
+    themselves stay in their memory-mapped store and are read by position.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]], field_weights: Dict[str, float] = None,
+                 path: str = None, version: str = "", batch_size: int = 10000):
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        # Sequences such as a DocumentStore are kept as-is and read by position
+        self.rows = rows if isinstance(rows, Sequence) else list(rows)
+        # Project aliases in the query add the project code as a query term
+        self.classifier = TextClassifier(whole_words=True)
+
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        version = json.dumps([version, len(self.rows), self.field_weights])
+        if self._get_meta('version') != version:
+            self._build(batch_size)
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+        self.total = len(self.rows)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _iter_fields(self) -> Iterator[Dict[str, Any]]:
+        # A DocumentStore reads only the weighted columns, batch by batch
+        if hasattr(self.rows, 'iter_rows'):
+            return self.rows.iter_rows([field for field in self.field_weights if field in self.rows.columns])
+        return iter(self.rows)
+
+    def _build(self, batch_size: int):
+        """Stream the rows into the postings table, batch_size rows per insert"""
+        with self.conn:
+            self.conn.execute("DROP INDEX IF EXISTS idx_postings_token")
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM terms")
+            batch = []
+            for row_id, row in enumerate(self._iter_fields()):
+                counts = Counter()
+                for field, weight in self.field_weights.items():
+                    value = row.get(field)
+                    if value is None or value != value:  # skip missing and NaN
+                        continue
+                    for token in tokenize(value):
+                        counts[token] += weight
+                norm = math.sqrt(sum(tf * tf for tf in counts.values())) or 1.0
+                batch.extend((token, row_id, tf / norm) for token, tf in counts.items())
+                if row_id % batch_size == batch_size - 1:
+                    self.conn.executemany("INSERT INTO postings (token, row, weight) VALUES (?, ?, ?)", batch)
+                    batch = []
+            self.conn.executemany("INSERT INTO postings (token, row, weight) VALUES (?, ?, ?)", batch)
+            # Indexing once after the bulk insert is faster than maintaining it row by row
+            self.conn.execute("CREATE INDEX idx_postings_token ON postings(token)")
+            self.conn.execute("INSERT INTO terms (token, df) SELECT token, COUNT(*) FROM postings GROUP BY token")
+
+    def _idf(self, token: str) -> Optional[float]:
+        row = self.conn.execute("SELECT df FROM terms WHERE token = ?", (token,)).fetchone()
+        return math.log(1 + self.total / row[0]) if row else None
+
+    def _query_terms(self, query: str) -> Counter:
+        terms = Counter(tokenize(query))
+        project_code = self.classifier.identify_project(query)
+        if project_code:
+            terms.update(tokenize(project_code))
+        return terms
+
+    def search(self, query: str, k: int = 50) -> List[Tuple[float, Dict[str, Any]]]:
+        """Return up to k (score, row) pairs, best first"""
+        scores = defaultdict(float)
+        for token, query_tf in self._query_terms(query).items():
+            idf = self._idf(token)
+            if idf is None:
+                continue
+            for row_id, weight in self.conn.execute("SELECT row, weight FROM postings WHERE token = ?", (token,)):
+                scores[row_id] += query_tf * weight * idf * idf
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.rows[row_id]) for row_id, score in top]
+
+    def close(self):
+        self.conn.close()
+
+    def build_context(self, query: str, columns: List[str], token_budget: int = 3000,
+                      max_rows: int = 200) -> Tuple[str, int]:
+        """Format the best rows as CSV lines until the token budget is spent.
+
+        Returns the context text and the number of rows it holds.
+        """
+        def to_line(values):
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="").writerow(values)
+            return buffer.getvalue()
+
+        header = to_line(columns)
+        lines = [header]
+        used = estimate_tokens(header)
+        for _, row in self.search(query, k=max_rows):
+            line = to_line(["" if row.get(col) is None else row.get(col) for col in columns])
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines), len(lines) - 1
@@ -0,0 +1,149 @@
+import os
+import csv
+import importlib.util
+from collections.abc import Sequence
+from typing import Dict, Any, List, Iterator
+from config import PROJECT_MAPPING
+
+# pyarrow is optional (the CSV path keeps working without it) and slow to
+# import, so it is only loaded when a store is written or opened
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+pa = pa_csv = pc = None
+
+
+def _load_arrow():
+    global pa, pa_csv, pc
+    if pa is None:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.compute
+        pa, pa_csv, pc = pyarrow, pyarrow.csv, pyarrow.compute
+
+# Low-cardinality columns stored dictionary-encoded
+CATEGORICAL = {
+    'Project_Code': list(PROJECT_MAPPING) + ['UNCAT'],
+    'Project_Name': list(dict.fromkeys(project['name'] for project in PROJECT_MAPPING.values())) + ['Uncategorized']
+}
+
+
+def store_path(csv_file: str) -> str:
+    """Arrow store written next to a registry CSV"""
+    return os.path.splitext(csv_file)[0] + ".arrow"
+
+
+def _encode(column, dictionary: List[str]):
+    """Dictionary-encode a string column against a growing dictionary.
+
+    Values missing from the dictionary are appended to it, so every batch
+    shares one dictionary and later batches only add a delta.
+    """
+    known = set(dictionary)
+    dictionary.extend(value for value in pc.unique(column).to_pylist() if value not in known)
+    indices = pc.index_in(column, value_set=pa.array(dictionary, pa.string())).cast(pa.int32())
+    return pa.DictionaryArray.from_arrays(indices, pa.array(dictionary, pa.string()))
+
+
+def write_store(csv_file: str, output_file: str = None, block_size: int = 1 << 20) -> int:
+    """Convert a registry CSV to an uncompressed Arrow IPC file.
+
+    The CSV is read in blocks of block_size bytes, so memory stays bounded
+    regardless of registry size. Every column is kept as text, as in the
+    CSV, except the CATEGORICAL ones. The file is written under a temporary
+    name and moved into place, so readers never map a partial store.
+    Returns the number of rows written.
+    """
+    _load_arrow()
+    output_file = output_file or store_path(csv_file)
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+        columns = next(csv.reader(f), [])
+
+    # An empty CSV becomes an empty store
+    reader = pa_csv.open_csv(
+        csv_file,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in columns})
+    ) if columns else []
+    dictionaries = {name: list(values) for name, values in CATEGORICAL.items() if name in columns}
+    schema = pa.schema([
+        pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in dictionaries else pa.string())
+        for name in columns
+    ])
+
+    rows = 0
+    tmp_file = output_file + ".tmp"
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pa.OSFile(tmp_file, 'wb') as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in reader:
+            arrays = [
+                _encode(batch.column(name), dictionaries[name]) if name in dictionaries else batch.column(name)
+                for name in columns
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            rows += batch.num_rows
+    os.replace(tmp_file, output_file)
+    return rows
+
+
+class DocumentStore(Sequence):
+    """Read-only registry rows memory-mapped from an Arrow IPC file.
+
+    Opening only maps the file and reads its footer; column buffers are
+    paged in by the OS when a row or batch is actually read, so startup
+    time and resident memory barely depend on registry size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        _load_arrow()
+        self.source = pa.memory_map(path, 'r')
+        self.table = pa.ipc.open_file(self.source).read_all()
+        self.columns = self.table.column_names
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {name: self.table.column(name)[index].as_py() for name in self.columns}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_rows()
+
+    def iter_rows(self, columns: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """Rows batch by batch, optionally with only some columns paged in"""
+        table = self.table.select(columns) if columns is not None else self.table
+        for batch in table.to_batches():
+            yield from batch.to_pylist()
+
+    def close(self):
+        self.table = None
+        self.source.close()
+
+
+class CsvDocuments(list):
+    """Registry rows read from CSV, used when pyarrow is not installed"""
+
+    def __init__(self, csv_file: str):
+        with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            super().__init__(reader)
+            self.columns = list(reader.fieldnames or [])
+
+
+def open_documents(csv_file: str = "output/MERGED.csv"):
+    """Open the registry behind a CSV, preferring its memory-mapped Arrow store.
+
+    A missing or out-of-date store is rebuilt from the CSV once, so later
+    starts skip CSV parsing entirely. Without pyarrow the CSV is read.
+    """
+    if not HAS_ARROW:
+        return CsvDocuments(csv_file)
+
+    path = store_path(csv_file)
+    if not os.path.exists(path) or (
+            os.path.exists(csv_file) and os.path.getmtime(path) < os.path.getmtime(csv_file)):
+        write_store(csv_file, path)
+    return DocumentStore(path)
@@ -0,0 +1,168 @@
+import heapq
+import queue
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterable, Callable, Optional
+from mailbox_source import MailboxSource, OutlookSource, InMemorySource
+
+# Outlook OlItemType.olMailItem
+OL_MAIL_ITEM = 0
+
+
+class MailboxProvider:
+    """Enumerates the folders of one or more stores and opens them per thread.
+
+    list_folders runs on the calling thread. thread_init and thread_close
+    run once on each worker thread, around every open_source it makes for
+    the folders it scans, so COM providers can keep one apartment and MAPI
+    namespace per thread.
+    """
+
+    def list_folders(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def thread_init(self):
+        pass
+
+    def thread_close(self):
+        pass
+
+    def open_source(self, folder: Dict[str, Any]) -> MailboxSource:
+        raise NotImplementedError
+
+
+class OutlookStoreProvider(MailboxProvider):
+    """Every mail folder of every store in the Outlook profile.
+
+    Covers the default mailbox (Inbox, Sent Items, subfolders), archive
+    PSTs and shared mailboxes that are mounted as stores.
+    """
+
+    def __init__(self, namespace, attachments: bool = False):
+        self.namespace = namespace
+        self.attachments = attachments
+        self._local = threading.local()
+
+    def list_folders(self) -> List[Dict[str, Any]]:
+        folders = []
+        for store in self.namespace.Stores:
+            try:
+                self._collect(store.GetRootFolder(), store.StoreID, folders)
+            except Exception as e:
+                print(f"Warning: Skipping store {getattr(store, 'DisplayName', '?')}: {str(e)}")
+        return folders
+
+    def _collect(self, folder, store_id: str, folders: List[Dict[str, Any]]):
+        if folder.DefaultItemType == OL_MAIL_ITEM:
+            folders.append({
+                'store_id': store_id,
+                'entry_id': folder.EntryID,
+                'path': folder.FolderPath
+            })
+        for child in folder.Folders:
+            self._collect(child, store_id, folders)
+
+    def thread_init(self):
+        # COM objects cannot cross apartments, so every worker thread
+        # initializes its own and dispatches its own MAPI namespace
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        self._local.namespace = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+    def thread_close(self):
+        import pythoncom
+        self._local.namespace = None
+        pythoncom.CoUninitialize()
+
+    def open_source(self, folder: Dict[str, Any]) -> MailboxSource:
+        namespace = self._local.namespace
+        return OutlookSource(namespace.GetFolderFromID(folder['entry_id'], folder['store_id']), namespace,
+                             attachments=self.attachments)
+
+
+class InMemoryProvider(MailboxProvider):
+    """Folders backed by lists of message dicts, for fixtures and tests"""
+
+    def __init__(self, folders: Dict[str, List[Dict[str, Any]]]):
+        self.folders = folders
+
+    def list_folders(self) -> List[Dict[str, Any]]:
+        return [{'path': path} for path in self.folders]
+
+    def open_source(self, folder: Dict[str, Any]) -> MailboxSource:
+        source = InMemorySource([dict(message, folder=folder['path']) for message in self.folders[folder['path']]])
+        source.name = f"memory:{folder['path']}"
+        return source
+
+
+class FolderWalker:
+    """Scans all folders of a provider concurrently.
+
+    Each folder is scanned on a pool thread by ``scan(source)``; the
+    per-folder results are sorted newest first and merged by ReceivedTime.
+    """
+
+    def __init__(self, provider: MailboxProvider, max_workers: int = 8):
+        self.provider = provider
+        self.max_workers = max_workers
+
+    def _work(self, folders: queue.Queue, scan: Callable[[MailboxSource], Any], results: List[tuple]):
+        """One pool thread: set up the provider once, then scan folders until none are left"""
+        if folders.empty():
+            return
+        try:
+            self.provider.thread_init()
+        except Exception as e:
+            print(f"Warning: Could not open the mailbox on {threading.current_thread().name}: {str(e)}")
+            return
+        try:
+            while True:
+                try:
+                    folder = folders.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results.append((folder, scan(self.provider.open_source(folder))))
+                except Exception as e:
+                    print(f"Warning: Error scanning {folder.get('path')}: {str(e)}")
+        finally:
+            self.provider.thread_close()
+
+    def map_folders(self, scan: Callable[[MailboxSource], Any],
+                    folders: Optional[List[Dict[str, Any]]] = None) -> List[tuple]:
+        """Run scan on every folder concurrently, returning (folder, result) pairs.
+
+        Each pool thread pulls folders from a shared queue, so the
+        provider's thread_init and thread_close run once per thread rather
+        than once per folder.
+        """
+        folders = self.provider.list_folders() if folders is None else folders
+        pending = queue.Queue()
+        for folder in folders:
+            pending.put(folder)
+        results = []
+        workers = min(self.max_workers, len(folders))
+        with ThreadPoolExecutor(max_workers=workers or 1, thread_name_prefix="folders") as pool:
+            for future in [pool.submit(self._work, pending, scan, results) for _ in range(workers)]:
+                future.result()
+        return results
+
+    def search(self, scan: Callable[[MailboxSource], Iterable[Dict[str, Any]]],
+               limit: int = None) -> List[Dict[str, Any]]:
+        """Run a per-folder search and merge the hits newest first.
+
+        With a limit, each folder's scan stops after that many hits, which
+        are its newest because folder tables are read by ReceivedTime
+        descending, and only the newest `limit` of the merged hits are kept.
+        """
+        def sorted_scan(source):
+            hits = scan(source)
+            if limit:
+                hits = islice(hits, limit)
+            return sorted(hits, key=lambda r: r.get('received') or "", reverse=True)
+
+        per_folder = [hits for _, hits in self.map_folders(sorted_scan)]
+        merged = heapq.merge(*per_folder, key=lambda r: r.get('received') or "", reverse=True)
+        return list(islice(merged, limit) if limit else merged)
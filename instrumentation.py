@@ -0,0 +1,313 @@
+"""Per-stage timers and counters for the search pipeline.
+
+Collection is off by default, and then every hook is one global check:
+stage() hands back a shared no-op context manager and count() returns at
+once. enable() (or DEEPLOOK_METRICS=1) collects process-wide TOTALS, which
+export() renders as JSON or Prometheus text. capture() collects one query
+on the current thread, optionally under cProfile or pyinstrument:
+
+    with instrumentation.capture(profile='cprofile') as metrics:
+        searcher.process_query("recent emails about payment")
+    print(metrics.report())
+"""
+import io
+import os
+import json
+import time
+import functools
+import threading
+import contextlib
+from typing import Dict, Any, List, Iterable, Iterator, Optional
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+# Profile lines kept per capture
+PROFILE_LINES = 30
+
+
+class Metrics:
+    """Stage timings (calls, total and slowest seconds) and named counters"""
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.profile: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [1, seconds, seconds]
+            else:
+                stage[0] += 1
+                stage[1] += seconds
+                if seconds > stage[2]:
+                    stage[2] = seconds
+
+    def add(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.profile = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'stages': {name: {'calls': int(calls), 'seconds': round(total, 6), 'max_seconds': round(slowest, 6)}
+                           for name, (calls, total, slowest) in self.stages.items()},
+                'counters': dict(self.counters)
+            }
+        if self.profile:
+            data['profile'] = self.profile
+        return data
+
+    def to_json(self, indent: int = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "deeplook") -> str:
+        """Prometheus text exposition format; stages are labels, counters are metrics"""
+        data = self.to_dict()
+        lines = []
+        for metric, field, kind, description in [
+            ("stage_seconds_total", 'seconds', "counter", "Time spent in each pipeline stage"),
+            ("stage_calls_total", 'calls', "counter", "Times each pipeline stage ran"),
+            ("stage_max_seconds", 'max_seconds', "gauge", "Slowest single run of each pipeline stage")
+        ]:
+            lines.append(f"# HELP {prefix}_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, stage in sorted(data['stages'].items()):
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {stage[field]}')
+        for name, value in sorted(data['counters'].items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> str:
+        return format_report(self.to_dict())
+
+
+def format_report(data: Dict[str, Any]) -> str:
+    """Stages slowest first, then counters, from Metrics.to_dict() output.
+
+    Stages nest (a query contains its search, the source contains body
+    fetches), so their times do not add up to the total.
+    """
+    lines = [f"{'stage':<22}{'calls':>8}{'total ms':>11}{'max ms':>10}"]
+    for name, stage in sorted(data['stages'].items(), key=lambda item: -item[1]['seconds']):
+        lines.append(f"{name:<22}{stage['calls']:>8}{stage['seconds'] * 1000:>11.1f}"
+                     f"{stage['max_seconds'] * 1000:>10.1f}")
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"{name:<22}{value:>8g}")
+    if data.get('profile'):
+        lines.append("")
+        lines.append(data['profile'])
+    return "\n".join(lines)
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
+
+
+# Process-wide totals, collected while enabled
+TOTALS = Metrics()
+
+_enabled = False
+# Non-zero while TOTALS or any capture collects; the only check hooks make when off
+_active = 0
+_active_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(on: bool = True):
+    """Start (or stop) collecting process-wide TOTALS"""
+    global _enabled, _active
+    with _active_lock:
+        if on != _enabled:
+            _active += 1 if on else -1
+            _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _targets() -> List[Metrics]:
+    captures = getattr(_local, 'captures', None) or []
+    return [TOTALS, *captures] if _enabled else captures
+
+
+def count(name: str, value: float = 1):
+    """Add to a counter"""
+    if not _active:
+        return
+    for metrics in _targets():
+        metrics.add(name, value)
+
+
+def count_usage(response):
+    """Count one API call and the tokens in its response's usage"""
+    if not _active:
+        return
+    count('api_requests')
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        count('api_input_tokens', getattr(usage, 'input_tokens', 0) or 0)
+        count('api_output_tokens', getattr(usage, 'output_tokens', 0) or 0)
+
+
+def record(name: str, seconds: float):
+    """Add one timed run of a stage"""
+    for metrics in _targets():
+        metrics.add_time(name, seconds)
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """Context manager timing a block as one run of a stage"""
+    if not _active:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as a stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_iter(name: str, items: Iterable) -> Iterator:
+    """Time every item pulled from a lazy stage, such as a mailbox source.
+
+    Only the time spent producing items counts, not the consumer's time
+    between them. The iterable is returned unchanged when collection is off.
+    """
+    if not _active:
+        return iter(items)
+    return _timed_iter(name, iter(items))
+
+
+def _timed_iter(name: str, items: Iterator) -> Iterator:
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            record(name, time.perf_counter() - start)
+            return
+        record(name, time.perf_counter() - start)
+        yield item
+
+
+def _start_profiler(kind: str):
+    if kind == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if kind == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    raise ValueError(f"Unknown profiler '{kind}', expected one of {', '.join(PROFILERS)}")
+
+
+def _stop_profiler(kind: str, profiler) -> str:
+    if kind == 'cprofile':
+        import pstats
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return out.getvalue().strip()
+    profiler.stop()
+    return profiler.output_text(unicode=False, color=False).strip()
+
+
+@contextlib.contextmanager
+def capture(profile: str = None) -> Iterator[Metrics]:
+    """Collect the stages and counters of everything run inside the block on
+    this thread, whether or not TOTALS are enabled. `profile` names one of
+    PROFILERS to run as well; its report lands in Metrics.profile."""
+    global _active
+    metrics = Metrics()
+    captures = _local.__dict__.setdefault('captures', [])
+    captures.append(metrics)
+    with _active_lock:
+        _active += 1
+
+    profiler = None
+    if profile:
+        try:
+            profiler = _start_profiler(profile)
+        except ImportError as e:
+            metrics.profile = f"{profile} is not installed: {str(e)}"
+        except ValueError as e:
+            # Unknown name, or another profiler is already running (cProfile allows one at a time)
+            metrics.profile = str(e)
+
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_time('total', time.perf_counter() - start)
+        if profiler is not None:
+            metrics.profile = _stop_profiler(profile, profiler)
+        captures.remove(metrics)
+        with _active_lock:
+            _active -= 1
+
+
+def export(format: str = 'json') -> str:
+    """Process-wide TOTALS as 'json' or 'prometheus' text"""
+    if format == 'prometheus':
+        return TOTALS.to_prometheus()
+    if format == 'json':
+        return TOTALS.to_json(indent=2)
+    raise ValueError(f"Unknown metrics format '{format}', expected json or prometheus")
+
+
+if os.getenv('DEEPLOOK_METRICS'):
+    enable()
@@ -0,0 +1,418 @@
+import os
+import re
+import queue
+import sqlite3
+import threading
+from typing import Dict, Any, List, Iterable, Iterator, Optional
+from classifier import get_classifier
+from references import get_extractor
+from mailbox_source import MailboxSource
+from attachments import AttachmentPipeline
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    entry_id TEXT UNIQUE NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    received TEXT,
+    modified TEXT,
+    body TEXT,
+    project_code TEXT,
+    document_type TEXT,
+    reference_number TEXT,
+    folder TEXT,
+    source TEXT,
+    conversation_id TEXT,
+    attachments TEXT,
+    seq INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_received ON messages(received);
+CREATE INDEX IF NOT EXISTS idx_messages_project ON messages(project_code);
+CREATE INDEX IF NOT EXISTS idx_messages_source ON messages(source);
+CREATE INDEX IF NOT EXISTS idx_messages_seq ON messages(seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, body, attachments, content='messages', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, subject, body, attachments)
+    VALUES (new.rowid, new.subject, new.body, new.attachments);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, subject, body, attachments)
+    VALUES ('delete', old.rowid, old.subject, old.body, old.attachments);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, subject, body, attachments)
+    VALUES ('delete', old.rowid, old.subject, old.body, old.attachments);
+    INSERT INTO messages_fts(rowid, subject, body, attachments)
+    VALUES (new.rowid, new.subject, new.body, new.attachments);
+END;
+"""
+
+
+def fts_query(keywords: List[str]) -> str:
+    """Build an FTS5 MATCH expression that accepts any of the keywords.
+
+    Each keyword becomes a quoted prefix query, which is the closest FTS5
+    equivalent of the old substring test.
+    """
+    terms = []
+    for keyword in keywords or []:
+        for token in re.findall(r'\w+', keyword.lower()):
+            terms.append(f'"{token}"*')
+    return " OR ".join(terms)
+
+
+class MailIndex:
+    """On-disk SQLite FTS5 index of mailbox messages keyed by EntryID"""
+
+    def __init__(self, db_path: str, attachments: AttachmentPipeline = None):
+        self.db_path = db_path
+        self.attachments = attachments
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        rebuild_fts = self._migrate()
+        self.conn.executescript(SCHEMA)
+        if rebuild_fts:
+            with self.conn:
+                self.conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+    def _migrate(self) -> bool:
+        """Add columns introduced after an index file was first created.
+
+        Returns True when the full-text table was dropped to gain a column
+        and must be rebuilt once SCHEMA has recreated it.
+        """
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(messages)")}
+        if not columns:
+            return False
+        with self.conn:
+            for column in ('modified', 'source', 'reference_number', 'conversation_id', 'attachments'):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE messages ADD COLUMN {column} TEXT")
+            if 'seq' not in columns:
+                # Existing rows count as written once, in rowid order
+                self.conn.execute("ALTER TABLE messages ADD COLUMN seq INTEGER")
+                self.conn.execute("UPDATE messages SET seq = rowid")
+                self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) SELECT 'seq', COALESCE(MAX(rowid), 0) FROM messages"
+                )
+
+            fts_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(messages_fts)")}
+            if 'attachments' in fts_columns:
+                return False
+            for trigger in ('messages_ai', 'messages_ad', 'messages_au'):
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self.conn.execute("DROP TABLE IF EXISTS messages_fts")
+        return True
+
+    def close(self):
+        self.conn.close()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def add_messages(self, messages: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                     source_key: str = "") -> int:
+        """Classify and upsert messages, committing in batches"""
+        added = 0
+        batch = []
+        for message in messages:
+            batch.append(message)
+            if len(batch) >= batch_size:
+                added += self._write_batch(self._rows(batch, source_key))
+                batch = []
+
+        if batch:
+            added += self._write_batch(self._rows(batch, source_key))
+        return added
+
+    def _rows(self, messages: List[Dict[str, Any]], source_key: str) -> List[tuple]:
+        """Index rows for a batch; attachment text of the whole batch is extracted at once"""
+        classifier = get_classifier()
+        extractor = get_extractor()
+        if self.attachments:
+            attachment_texts = self.attachments.message_texts(messages)
+        else:
+            attachment_texts = [""] * len(messages)
+
+        rows = []
+        for message, attachment_text in zip(messages, attachment_texts):
+            subject = message.get('subject') or ""
+            body = message.get('body') or ""
+            file_names = " ".join(a.get('filename') or "" for a in message.get('attachments') or [])
+            rows.append((
+                message['entry_id'],
+                subject,
+                message.get('sender') or "",
+                message.get('received') or "",
+                message.get('modified') or message.get('received') or "",
+                body,
+                # The subject decides; attachments only fill in what it lacks
+                classifier.identify_project(subject) or classifier.identify_project(attachment_text),
+                classifier.identify_document_type(subject) or classifier.identify_document_type(file_names),
+                extractor.first(f"{subject}\n{body}\n{attachment_text}"),
+                message.get('folder') or "",
+                source_key,
+                message.get('conversation_id') or "",
+                attachment_text
+            ))
+        return rows
+
+    def _write_batch(self, batch: List[tuple]) -> int:
+        """Upsert rows, stamping each with the next write sequence number.
+
+        Unlike the source-supplied modification times, seq only goes up, so
+        the reference graph and vector index pick up every written row,
+        whichever source or folder it came from and however old it is.
+        """
+        with self.conn:
+            start = int(self.get_meta("seq") or 0)
+            self.conn.executemany("""
+                INSERT INTO messages (entry_id, subject, sender, received, modified, body,
+                                      project_code, document_type, reference_number, folder, source,
+                                      conversation_id, attachments, seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(entry_id) DO UPDATE SET
+                    subject=excluded.subject, sender=excluded.sender,
+                    received=excluded.received, modified=excluded.modified,
+                    body=excluded.body, project_code=excluded.project_code,
+                    document_type=excluded.document_type,
+                    reference_number=excluded.reference_number, folder=excluded.folder,
+                    source=excluded.source, conversation_id=excluded.conversation_id,
+                    attachments=excluded.attachments, seq=excluded.seq
+            """, [row + (start + offset,) for offset, row in enumerate(batch, 1)])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seq', ?)",
+                              (str(start + len(batch)),))
+        return len(batch)
+
+    def build(self, source: MailboxSource) -> int:
+        """Index every message from a mailbox source"""
+        print(f"Indexing messages from {source.name} source...")
+        added = self._ingest(source, since=None)
+        print(f"✓ Indexed {added} messages")
+        return added
+
+    def sync(self, source: MailboxSource, sweep: bool = False) -> Dict[str, int]:
+        """Ingest only messages modified since the source's last watermark.
+
+        Items are upserted by EntryID, so edits and moves into the source
+        overwrite their old row. Deletions and moves out are detected by an
+        EntryID sweep, which only runs when the source item count no longer
+        matches the number of indexed rows for that source, or when
+        ``sweep`` forces it.
+        """
+        watermark = self.get_meta(f"watermark:{source.key}")
+        if watermark is None:
+            return {'added': self.build(source), 'deleted': 0}
+
+        added = self._ingest(source, since=watermark)
+
+        deleted = 0
+        indexed = self.indexed_count(source.key)
+        if sweep or source.count() != indexed:
+            deleted = self.remove_missing(source)
+
+        print(f"✓ Synced {source.name} source: {added} updated, {deleted} removed")
+        return {'added': added, 'deleted': deleted}
+
+    def _ingest(self, source: MailboxSource, since: Optional[str]) -> int:
+        """Upsert messages from a source and advance its watermark"""
+        return self._ingest_messages(source.key, source.iter_messages(since=since), since)
+
+    def _ingest_messages(self, source_key: str, messages: Iterable[Dict[str, Any]],
+                         since: Optional[str]) -> int:
+        state = {'watermark': since or ""}
+
+        def track(messages):
+            for message in messages:
+                modified = message.get('modified') or message.get('received') or ""
+                if modified > state['watermark']:
+                    state['watermark'] = modified
+                yield message
+
+        added = self.add_messages(track(messages), source_key=source_key)
+        self.set_meta(f"watermark:{source_key}", state['watermark'])
+        return added
+
+    def indexed_count(self, source_key: str) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE source = ?", (source_key,)
+        ).fetchone()[0]
+
+    def remove_missing(self, source: MailboxSource) -> int:
+        """Delete indexed rows of a source whose EntryID is no longer present"""
+        return self._remove_missing_ids(source.key, set(source.iter_entry_ids()))
+
+    def _remove_missing_ids(self, source_key: str, present: set) -> int:
+        stale = [
+            (row[0],) for row in self.conn.execute(
+                "SELECT entry_id FROM messages WHERE source = ?", (source_key,))
+            if row[0] not in present
+        ]
+        with self.conn:
+            self.conn.executemany("DELETE FROM messages WHERE entry_id = ?", stale)
+        return len(stale)
+
+    def sync_folders(self, walker, batch_size: int = 500, max_batches: int = 16) -> Dict[str, int]:
+        """Sync every folder of a FolderWalker's provider concurrently.
+
+        Folders are read on the walker's threads, which hand messages to the
+        single writer on the calling thread in batches of batch_size through
+        a queue of at most max_batches, so memory stays bounded however large
+        the mailbox. EntryID sweeps run as a second parallel pass, only for
+        folders whose item count drifted from the index.
+        """
+        watermarks = {
+            row[0][len("watermark:"):]: row[1] for row in self.conn.execute(
+                "SELECT key, value FROM meta WHERE key LIKE 'watermark:%'")
+        }
+        batches = queue.Queue(max_batches)
+        done = object()
+
+        def scan(source):
+            since = watermarks.get(source.key)
+            batch = []
+            for message in source.iter_messages(since=since):
+                batch.append(message)
+                if len(batch) >= batch_size:
+                    batches.put((source.key, batch))
+                    batch = []
+            batches.put((source.key, batch))
+            batches.put((source.key, done))
+            return source.key, since, source.count()
+
+        scanned = []
+
+        def walk():
+            try:
+                scanned.extend(walker.map_folders(scan))
+            finally:
+                batches.put(None)
+
+        reader = threading.Thread(target=walk, name="sync-folders", daemon=True)
+        reader.start()
+        added = 0
+        progress = {}
+        while True:
+            item = batches.get()
+            if item is None:
+                break
+            key, batch = item
+            watermark = progress.setdefault(key, watermarks.get(key) or "")
+            if batch is done:
+                # Only a folder read to the end advances its watermark
+                self.set_meta(f"watermark:{key}", progress.pop(key))
+                continue
+            for message in batch:
+                watermark = max(watermark, message.get('modified') or message.get('received') or "")
+            progress[key] = watermark
+            added += self.add_messages(batch, source_key=key)
+        reader.join()
+
+        drifted = [(folder, key) for folder, (key, since, count) in scanned
+                   if since is not None and count != self.indexed_count(key)]
+
+        deleted = 0
+        if drifted:
+            present = walker.map_folders(
+                lambda source: (source.key, set(source.iter_entry_ids())),
+                folders=[folder for folder, _ in drifted]
+            )
+            for _, (key, ids) in present:
+                deleted += self._remove_missing_ids(key, ids)
+
+        print(f"✓ Synced all folders: {added} updated, {deleted} removed")
+        return {'added': added, 'deleted': deleted}
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM messages WHERE entry_id = ?", (entry_id,)).fetchone()
+        return self.row_to_result(row) if row else None
+
+    def search(self, search_params: Dict[str, Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Answer a search from the index, newest first"""
+        return list(self.iter_search(search_params, limit))
+
+    def get_many(self, entry_ids: List[str], search_params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Messages by EntryID, in the given order, keeping those matching the non-keyword filters"""
+        if not entry_ids:
+            return []
+        conditions, args = self._filter_conditions(search_params or {})
+        conditions.append(f"m.entry_id IN ({','.join('?' * len(entry_ids))})")
+        args.extend(entry_ids)
+        rows = self.conn.execute("SELECT * FROM messages m WHERE " + " AND ".join(conditions), args)
+        found = {row['entry_id']: row for row in rows}
+        return [self.row_to_result(found[entry_id]) for entry_id in entry_ids if entry_id in found]
+
+    @staticmethod
+    def _filter_conditions(search_params: Dict[str, Any]) -> tuple:
+        """SQL conditions and arguments for project code, document type and dates"""
+        conditions = []
+        args = []
+        if search_params.get('project_code'):
+            conditions.append("m.project_code = ?")
+            args.append(search_params['project_code'])
+        if search_params.get('doc_type'):
+            conditions.append("m.document_type = ?")
+            args.append(search_params['doc_type'])
+        if search_params.get('date_from'):
+            conditions.append("m.received >= ?")
+            args.append(str(search_params['date_from']))
+        if search_params.get('date_to'):
+            # Compare on the prefix so a bare date covers the whole day
+            conditions.append("substr(m.received, 1, ?) <= ?")
+            args.extend([len(str(search_params['date_to'])), str(search_params['date_to'])])
+        return conditions, args
+
+    def iter_search(self, search_params: Dict[str, Any], limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily yield index hits, newest first, straight from the cursor"""
+        conditions, args = self._filter_conditions(search_params)
+        match = fts_query(search_params.get('keywords'))
+        if match:
+            conditions.insert(0, "m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+            args.insert(0, match)
+
+        sql = "SELECT * FROM messages m"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY m.received DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+
+        for row in self.conn.execute(sql, args):
+            yield self.row_to_result(row)
+
+    @staticmethod
+    def row_to_result(row: sqlite3.Row) -> Dict[str, Any]:
+        """Shape an index row like OutlookDeepLook._process_email output"""
+        return {
+            'entry_id': row['entry_id'],
+            'subject': row['subject'],
+            'sender': row['sender'],
+            'received': row['received'],
+            'body': (row['body'] or "")[:500],
+            'project_code': row['project_code'],
+            'document_type': row['document_type'],
+            'reference_number': row['reference_number'],
+            'folder': row['folder'],
+            'conversation_id': row['conversation_id'] or ""
+        }
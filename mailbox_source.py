@@ -0,0 +1,377 @@
+import os
+import email
+import email.parser
+import mailbox
+from email import policy
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Iterator, Optional, Callable
+from table_reader import TableReader, BodyLoader
+import instrumentation
+
+
+def format_received(value) -> str:
+    """Normalize a received time to a sortable 'YYYY-MM-DD HH:MM:SS' string"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)[:19]
+
+
+# DASL condition on PR_MESSAGE_CLASS selecting mail items only
+MAIL_ITEMS_CONDITION = "\"http://schemas.microsoft.com/mapi/proptag/0x001A001F\" LIKE 'IPM.Note%'"
+
+
+def parse_received(value: str) -> Optional[datetime]:
+    """Inverse of format_received"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+class MailboxSource:
+    """Base class for anything that can yield mailbox messages.
+
+    Messages are plain dicts with the keys entry_id, subject, sender,
+    received, modified, body and folder, so the index never touches COM
+    objects. ``since`` is a format_received watermark; sources return at
+    least every message modified after it and may return a few older ones.
+    ``subject_filter`` drops messages by subject before their body is read.
+    Sources with ``supports_dasl`` also accept DASL ``conditions`` (see
+    dasl.compile_conditions) that are evaluated by the store.
+    """
+
+    name = "mailbox"
+    supports_dasl = False
+
+    @property
+    def key(self) -> str:
+        """Stable identifier used to keep sync watermarks per source"""
+        return self.name
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def iter_entry_ids(self) -> Iterator[str]:
+        """Yield the EntryID of every message currently in the source"""
+        for message in self.iter_messages():
+            yield message['entry_id']
+
+    def count(self) -> int:
+        """Number of messages currently in the source"""
+        return sum(1 for _ in self.iter_entry_ids())
+
+
+class OutlookSource(MailboxSource):
+    """Messages from an Outlook MAPI folder (defaults to the Inbox).
+
+    Metadata is streamed in chunks through Folder.GetTable; full MailItems
+    are only loaded, via the namespace, for bodies that are actually needed.
+    """
+
+    name = "outlook"
+    supports_dasl = True
+
+    def __init__(self, folder, namespace=None, chunk_size: int = 500, attachments: bool = False,
+                 max_attachment_bytes: int = 25 * 1024 * 1024):
+        self.folder = folder
+        self.reader = TableReader(folder, chunk_size=chunk_size)
+        self.loader = BodyLoader(namespace or folder, getattr(folder, 'StoreID', None))
+        # Saving attachments means a round trip per file, so it is opt-in
+        self.attachments = attachments
+        self.max_attachment_bytes = max_attachment_bytes
+
+    @property
+    def key(self) -> str:
+        return f"outlook:{getattr(self.folder, 'FolderPath', '')}"
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None,
+                      conditions: List[str] = None) -> Iterator[Dict[str, Any]]:
+        conditions = [MAIL_ITEMS_CONDITION] + list(conditions or [])
+        if since and parse_received(since):
+            # Filters only compare to the minute, so step back one minute
+            # and let the EntryID upsert absorb the overlap. The watermark is
+            # local time, but DASL compares date-times in UTC
+            watermark = (parse_received(since) - timedelta(minutes=1)).astimezone(timezone.utc)
+            conditions.append(f"\"DAV:getlastmodified\" > '{watermark.strftime('%m/%d/%Y %I:%M %p')}'")
+        filter_string = "@SQL=" + " AND ".join(conditions)
+        folder_path = getattr(self.folder, 'FolderPath', '')
+
+        for row in self.reader.iter_rows(filter_string):
+            instrumentation.count('items_scanned')
+            # Meeting requests, reports etc. are not mail items
+            if not str(row.get('MessageClass') or 'IPM.Note').startswith('IPM.Note'):
+                continue
+            subject = row.get('Subject') or ""
+            if subject_filter and not subject_filter(subject):
+                continue
+            message = {
+                'entry_id': row['EntryID'],
+                'subject': subject,
+                'sender': row.get('SenderEmailAddress') or "",
+                'received': format_received(row.get('ReceivedTime')),
+                'modified': format_received(row.get('LastModificationTime')),
+                'body': self.loader.get_body(row['EntryID']),
+                'folder': folder_path,
+                'conversation_id': row.get('ConversationID') or ""
+            }
+            if self.attachments:
+                message['attachments'] = self.loader.get_attachments(row['EntryID'], self.max_attachment_bytes)
+            yield message
+
+    def iter_entry_ids(self) -> Iterator[str]:
+        return self.reader.iter_entry_ids(f"@SQL={MAIL_ITEMS_CONDITION}")
+
+    def count(self) -> int:
+        return self.reader.count(f"@SQL={MAIL_ITEMS_CONDITION}")
+
+
+def _message_to_dict(msg, entry_id: str, folder: str, modified: str = None,
+                     max_attachment_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Convert an email.message.EmailMessage into a mailbox message dict.
+
+    Attachment payloads are decoded only when max_attachment_bytes is
+    given; larger ones are skipped.
+    """
+    try:
+        received = format_received(parsedate_to_datetime(msg['Date'])) if msg['Date'] else ""
+    except (TypeError, ValueError):
+        received = ""
+
+    body = ""
+    try:
+        part = msg.get_body(preferencelist=('plain', 'html'))
+        if part is not None:
+            body = part.get_content()
+    except Exception:
+        body = ""
+
+    attachments = []
+    if max_attachment_bytes is not None:
+        for part in msg.iter_attachments():
+            try:
+                data = part.get_payload(decode=True) or b""
+                if len(data) <= max_attachment_bytes:
+                    attachments.append({'filename': part.get_filename() or "", 'data': data})
+            except Exception:
+                continue
+
+    # A thread is keyed by its root message: the first References entry,
+    # else the message replied to, else the message itself
+    references = str(msg['References'] or "").split()
+    conversation_id = references[0] if references else str(msg['In-Reply-To'] or msg['Message-ID'] or "").strip()
+
+    return {
+        'entry_id': str(msg['Message-ID'] or entry_id).strip(),
+        'subject': str(msg['Subject'] or ""),
+        'sender': str(msg['From'] or ""),
+        'received': received,
+        'modified': modified or received,
+        'body': body,
+        'folder': folder,
+        'conversation_id': conversation_id,
+        'attachments': attachments
+    }
+
+
+class EmlDirectorySource(MailboxSource):
+    """Messages from a directory tree of exported .eml files"""
+
+    name = "eml"
+
+    def __init__(self, path: str, attachments: bool = False, max_attachment_bytes: int = 25 * 1024 * 1024):
+        self.path = path
+        # Decoding every payload is wasted work unless attachments are indexed
+        self.attachments = attachments
+        self.max_attachment_bytes = max_attachment_bytes
+
+    @property
+    def key(self) -> str:
+        return f"eml:{os.path.abspath(self.path)}"
+
+    def _iter_files(self) -> Iterator[tuple]:
+        for root, _, files in os.walk(self.path):
+            folder = os.path.relpath(root, self.path)
+            folder = "" if folder == "." else folder
+            for file_name in sorted(files):
+                if file_name.lower().endswith('.eml'):
+                    yield os.path.join(root, file_name), folder
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None) -> Iterator[Dict[str, Any]]:
+        for file_path, folder in self._iter_files():
+            # File mtime plays the role of LastModificationTime
+            modified = format_received(datetime.fromtimestamp(os.path.getmtime(file_path)))
+            if since and modified <= since:
+                continue
+            instrumentation.count('items_scanned')
+            try:
+                with open(file_path, 'rb') as f:
+                    msg = email.message_from_binary_file(f, policy=policy.default)
+                if subject_filter and not subject_filter(str(msg['Subject'] or "")):
+                    continue
+                yield _message_to_dict(msg, os.path.relpath(file_path, self.path), folder, modified,
+                                       self.max_attachment_bytes if self.attachments else None)
+            except Exception as e:
+                print(f"Warning: Error reading {file_path}: {str(e)}")
+
+    def iter_entry_ids(self) -> Iterator[str]:
+        # Message-ID lives in the headers, so skip parsing the bodies
+        parser = email.parser.BytesHeaderParser(policy=policy.default)
+        for file_path, _ in self._iter_files():
+            try:
+                with open(file_path, 'rb') as f:
+                    headers = parser.parse(f)
+                yield str(headers['Message-ID'] or os.path.relpath(file_path, self.path)).strip()
+            except Exception as e:
+                print(f"Warning: Error reading {file_path}: {str(e)}")
+
+    def count(self) -> int:
+        return sum(1 for _ in self._iter_files())
+
+
+class MboxSource(MailboxSource):
+    """Messages from an mbox file"""
+
+    name = "mbox"
+
+    def __init__(self, path: str, attachments: bool = False, max_attachment_bytes: int = 25 * 1024 * 1024):
+        self.path = path
+        # Decoding every payload is wasted work unless attachments are indexed
+        self.attachments = attachments
+        self.max_attachment_bytes = max_attachment_bytes
+
+    @property
+    def key(self) -> str:
+        return f"mbox:{os.path.abspath(self.path)}"
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None) -> Iterator[Dict[str, Any]]:
+        # mbox has no per-message modification time, so the whole file is
+        # re-read whenever it changed after the watermark
+        modified = format_received(datetime.fromtimestamp(os.path.getmtime(self.path)))
+        if since and modified <= since:
+            return
+        box = mailbox.mbox(self.path, factory=lambda f: email.message_from_binary_file(f, policy=policy.default),
+                           create=False)
+        folder = os.path.splitext(os.path.basename(self.path))[0]
+        try:
+            for key, msg in box.iteritems():
+                instrumentation.count('items_scanned')
+                if subject_filter and not subject_filter(str(msg['Subject'] or "")):
+                    continue
+                yield _message_to_dict(msg, f"{self.path}:{key}", folder, modified,
+                                       self.max_attachment_bytes if self.attachments else None)
+        finally:
+            box.close()
+
+
+class PstSource(MailboxSource):
+    """Messages from an Outlook .pst/.ost file, read with libpff (pypff).
+
+    Needs no Outlook or Windows, so exported archives can be indexed on
+    any worker; pypff is only imported when the file is first read.
+    """
+
+    name = "pst"
+
+    def __init__(self, path: str, attachments: bool = False, max_attachment_bytes: int = 25 * 1024 * 1024):
+        self.path = path
+        self.attachments = attachments
+        self.max_attachment_bytes = max_attachment_bytes
+
+    @property
+    def key(self) -> str:
+        return f"pst:{os.path.abspath(self.path)}"
+
+    def _iter_folders(self, folder, path: str = "") -> Iterator[tuple]:
+        yield path, folder
+        for i in range(folder.number_of_sub_folders):
+            child = folder.get_sub_folder(i)
+            yield from self._iter_folders(child, f"{path}/{child.name or ''}" if path else child.name or "")
+
+    def _iter_items(self) -> Iterator[tuple]:
+        try:
+            import pypff
+        except ImportError:
+            raise ImportError("Reading PST files needs libpff-python: pip install libpff-python")
+        pst = pypff.file()
+        pst.open(self.path)
+        try:
+            for path, folder in self._iter_folders(pst.get_root_folder()):
+                for i in range(folder.number_of_sub_messages):
+                    yield path, folder.get_sub_message(i)
+        finally:
+            pst.close()
+
+    def _attachments(self, item) -> List[Dict[str, Any]]:
+        attachments = []
+        for i in range(getattr(item, 'number_of_attachments', 0)):
+            try:
+                attachment = item.get_attachment(i)
+                size = attachment.get_size()
+                if size > self.max_attachment_bytes:
+                    continue
+                attachments.append({'filename': getattr(attachment, 'name', None) or f"attachment{i}",
+                                    'data': attachment.read_buffer(size)})
+            except Exception:
+                continue
+        return attachments
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None) -> Iterator[Dict[str, Any]]:
+        for folder, item in self._iter_items():
+            instrumentation.count('items_scanned')
+            try:
+                received = format_received(item.delivery_time or item.client_submit_time)
+                modified = format_received(getattr(item, 'modification_time', None)) or received
+                if since and modified <= since:
+                    continue
+                subject = item.subject or ""
+                if subject_filter and not subject_filter(subject):
+                    continue
+
+                body = item.plain_text_body or item.html_body or b""
+                if isinstance(body, bytes):
+                    body = body.decode('utf-8', errors='ignore')
+                headers = email.parser.HeaderParser(policy=policy.default).parsestr(item.transport_headers or "")
+                message = _message_to_dict(headers, f"{self.path}:{item.identifier}", folder, modified)
+                message.update({
+                    'entry_id': f"{self.path}:{item.identifier}",
+                    'subject': subject,
+                    'sender': message['sender'] or item.sender_name or "",
+                    'received': received,
+                    'body': body,
+                    'attachments': self._attachments(item) if self.attachments else []
+                })
+                yield message
+            except Exception as e:
+                print(f"Warning: Error reading message in {folder}: {str(e)}")
+
+    def iter_entry_ids(self) -> Iterator[str]:
+        for _, item in self._iter_items():
+            yield f"{self.path}:{item.identifier}"
+
+
+class InMemorySource(MailboxSource):
+    """Messages held in a list of dicts, for fixtures and tests"""
+
+    name = "memory"
+
+    def __init__(self, messages: Optional[list] = None):
+        self.messages = list(messages or [])
+
+    def iter_messages(self, since: str = None,
+                      subject_filter: Callable[[str], bool] = None) -> Iterator[Dict[str, Any]]:
+        for message in self.messages:
+            instrumentation.count('items_scanned')
+            modified = message.get('modified') or message.get('received') or ""
+            if since and modified <= since:
+                continue
+            if subject_filter and not subject_filter(message.get('subject') or ""):
+                continue
+            yield dict(message, modified=modified)
@@ -0,0 +1,135 @@
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+from config import PROJECT_MAPPING, DOCUMENT_TYPES, REFERENCE_PATTERNS, DEPARTMENT_MAPPING
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    docs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def config_fingerprint(columns: List[str]) -> str:
+    """Hash of everything parse results depend on besides the input line"""
+    config = [PROJECT_MAPPING, DOCUMENT_TYPES, REFERENCE_PATTERNS, DEPARTMENT_MAPPING, columns]
+    return hashlib.blake2b(json.dumps(config, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def iter_chunks(lines: Iterable[str], chunk_lines: int = 32) -> Iterator[Tuple[str, List[str]]]:
+    """Split lines into content-defined chunks and yield (hash, lines) pairs.
+
+    A chunk ends after any line whose CRC is divisible by chunk_lines, so
+    boundaries depend only on nearby content: inserting or deleting a line
+    changes the hash of its own chunk and leaves the others untouched.
+    Chunks hold chunk_lines lines on average.
+    """
+    chunk = []
+    digest = hashlib.blake2b(digest_size=16)
+    for line in lines:
+        data = line.encode('utf-8')
+        chunk.append(line)
+        digest.update(data + b'\n')
+        if zlib.crc32(data) % chunk_lines == 0:
+            yield digest.hexdigest(), chunk
+            chunk = []
+            digest = hashlib.blake2b(digest_size=16)
+    if chunk:
+        yield digest.hexdigest(), chunk
+
+
+class PartitionHasher:
+    """Running content hash and row count of one output partition"""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.rows = 0
+
+    def update(self, doc: Dict[str, Any]):
+        self.digest.update("\x1f".join(str(doc.get(col, '')) for col in self.columns).encode('utf-8') + b'\n')
+        self.rows += 1
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+class ParseManifest:
+    """SQLite record of a previous parse run.
+
+    Parsed rows are cached per chunk hash (before deduplication, which
+    depends on everything before the chunk), and each output partition is
+    stored with a hash of its rows. A different config fingerprint clears
+    the cache, since every line might then parse differently.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        if self.get_meta("fingerprint") != fingerprint:
+            with self.conn:
+                self.conn.execute("DELETE FROM chunks")
+                self.conn.execute("DELETE FROM partitions")
+            self.set_meta("fingerprint", fingerprint)
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def has_chunk(self, digest: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def put_chunk(self, digest: str, docs: List[Dict[str, Any]]):
+        self.conn.execute("INSERT OR REPLACE INTO chunks (hash, docs) VALUES (?, ?)", (digest, json.dumps(docs)))
+
+    def iter_docs(self, digests: List[str]) -> Iterator[Dict[str, Any]]:
+        """Yield the cached rows of the given chunks, in order"""
+        for digest in digests:
+            row = self.conn.execute("SELECT docs FROM chunks WHERE hash = ?", (digest,)).fetchone()
+            yield from json.loads(row[0])
+
+    def prune_chunks(self, digests: List[str]):
+        """Drop cached chunks that are no longer part of the input"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS live (hash TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM live")
+        self.conn.executemany("INSERT OR IGNORE INTO live (hash) VALUES (?)", ((d,) for d in digests))
+        self.conn.execute("DELETE FROM chunks WHERE hash NOT IN (SELECT hash FROM live)")
+
+    def partitions(self) -> Dict[str, str]:
+        """Partition hashes from the previous run, in output order"""
+        rows = self.conn.execute("SELECT name, hash FROM partitions ORDER BY position")
+        return dict(rows.fetchall())
+
+    def save_partitions(self, hashers: Dict[str, PartitionHasher]):
+        self.conn.execute("DELETE FROM partitions")
+        self.conn.executemany(
+            "INSERT INTO partitions (name, position, hash, rows) VALUES (?, ?, ?, ?)",
+            [(name, position, hasher.hexdigest(), hasher.rows)
+             for position, (name, hasher) in enumerate(hashers.items())]
+        )
+
+    def commit(self):
+        self.conn.commit()
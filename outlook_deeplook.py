@@ -1,156 +1,358 @@
-import win32com.client
-import pythoncom
 import os
+import argparse
+import contextlib
 from datetime import datetime
-from typing import Dict, Any, List
-import pandas as pd
-import anthropic
+from typing import Dict, Any, List, Iterator, Optional
+from classifier import get_classifier
+from mailbox_source import MailboxSource
+from mail_index import MailIndex
+from dasl import compile_conditions
+from folder_walker import FolderWalker, MailboxProvider
+from backends import open_backend
+from pipeline import search_pipeline, enrich, take
+from ranking import BM25Ranker, DEFAULT_TOP_K, fuse_rankings
+from query_analyzer import QueryAnalyzer, validate_params
+from references import get_extractor
+from reference_graph import ReferenceGraph, EMAIL
+from clustering import ResultClusterer
+from attachments import AttachmentPipeline
+from result_analyzer import ResultAnalyzer
+from daemon import DaemonClient, repl
+import instrumentation
 
 class OutlookDeepLook:
-    def __init__(self, use_claude: bool = False, claude_api_key: str = None):
+    def __init__(self, use_claude: bool = False, claude_api_key: str = None,
+                 source: MailboxSource = None, index_path: str = None,
+                 all_folders: bool = False, provider: MailboxProvider = None, attachments: bool = False,
+                 backend: str = 'outlook', backend_options: Dict[str, Any] = None):
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.base_dir = os.path.join(os.path.expanduser("~"), "Desktop", "outlook_deeplook")
         self.results_dir = os.path.join(self.base_dir, f"search_results_{self.timestamp}")
         self.use_claude = use_claude
         self.claude_api_key = claude_api_key
+        self.source = source
+        self.index_path = index_path or os.path.join(self.base_dir, "mail_index.db")
+        self.all_folders = all_folders or provider is not None
+        self.provider = provider
+        # Mailbox backend opened when no source or provider is given, see backends.py
+        self.backend_name = backend
+        self.backend_options = backend_options or {}
+        self.backend = None
+        # Read attachment text into classification and the index; opt-in,
+        # since Outlook saves every attachment of every message read
+        self.attachments = attachments
+        # Result enrichers applied as the last pipeline stage
+        self.enrichers = []
         self._setup_environment()
 
-    def process_query(self, query: str) -> List[Dict[str, Any]]:
+    def _setup_environment(self):
+        """Initialize directories, mailbox source and local index"""
+        os.makedirs(self.results_dir, exist_ok=True)
+        
+        if self.source is None and self.provider is None:
+            try:
+                self.backend = open_backend(self.backend_name, attachments=self.attachments,
+                                            all_folders=self.all_folders, **self.backend_options)
+                self.source = self.backend.source
+                self.provider = self.backend.provider
+                print(f"✓ Opened {self.backend.name} mailbox")
+            except Exception as e:
+                print(f"✗ Connection error: {str(e)}")
+                raise
+        
+        self.attachment_pipeline = AttachmentPipeline(
+            cache_path=os.path.join(self.base_dir, "attachment_cache.db")
+        ) if self.attachments else None
+        self.index = MailIndex(self.index_path, attachments=self.attachment_pipeline)
+        self.ranker = BM25Ranker(self.index)
+        self.graph = ReferenceGraph(self.index.conn)
+        # Offline embedding index blended into keyword ranking; needs numpy,
+        # which is only imported here
+        from vector_index import VectorIndex, HAS_NUMPY
+        self.vectors = VectorIndex(
+            self.index.conn, os.path.splitext(self.index_path)[0] + ".vectors"
+        ) if HAS_NUMPY else None
+        self.query_analyzer = QueryAnalyzer(
+            api_key=self.claude_api_key,
+            use_claude=self.use_claude,
+            cache_path=os.path.join(self.base_dir, "query_cache.db")
+        )
+        self.result_analyzer = ResultAnalyzer(api_key=self.claude_api_key)
+        self.walker = FolderWalker(self.provider) if self.all_folders and self.provider is not None else None
+
+    def close(self):
+        """Stop attachment workers, close the index and release the backend"""
+        if self.attachment_pipeline:
+            self.attachment_pipeline.close()
+        self.index.close()
+        if self.backend:
+            self.backend.close()
+
+    def build_index(self) -> int:
+        """(Re)build the local mailbox index from the mailbox source"""
+        if self.walker:
+            added = self.index.sync_folders(self.walker)['added']
+        else:
+            added = self.index.build(self.source)
+        self._sync_derived()
+        return added
+
+    def sync_index(self) -> Dict[str, int]:
+        """Ingest only mailbox changes since the last build or sync"""
+        if self.walker:
+            stats = self.index.sync_folders(self.walker)
+        else:
+            stats = self.index.sync(self.source)
+        self._sync_derived()
+        return stats
+
+    def _sync_derived(self):
+        """Bring the reference graph and vector index up to date with the mail index"""
+        self.graph.sync_from_index(self.index)
+        if self.vectors is not None:
+            self.vectors.sync_from_index(self.index)
+
+    def index_registry(self, csv_file: str = "output/MERGED.csv") -> int:
+        """Link registry documents from a DocumentParser CSV into the reference graph"""
+        return self.graph.add_registry(csv_file)
+
+    def reference_chain(self, reference: str, search_params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Emails and registry documents in a reference's bounded chain, from the index.
+
+        search_params narrows the emails by project, document type and dates;
+        emails mentioning any of its keywords come first.
+        """
+        links, documents = {}, []
+        for node in self.graph.chain(reference)['nodes']:
+            link = f"{node['type']} {node['ref']}"
+            if node['kind'] == EMAIL:
+                links[node['node']] = link
+            else:
+                documents.append({'subject': node['node'], 'received': "", 'type': 'document',
+                                  'reference_link': link})
+
+        emails = self.index.get_many(list(links), search_params)
+        for result in emails:
+            result['reference_link'] = links[result['entry_id']]
+
+        # Keyword matches first, each group newest first, registry documents after them
+        keywords = [kw.lower() for kw in (search_params or {}).get('keywords') or [] if kw]
+        emails.sort(key=lambda r: r.get('received') or "", reverse=True)
+        if keywords:
+            emails.sort(key=lambda r: not any(kw in f"{r['subject'] or ''} {r['body']}".lower()
+                                              for kw in keywords))
+        return emails + documents
+
+    def process_query(self, query: str, max_results: int = None) -> List[Dict[str, Any]]:
         """Two-step semantic search process"""
+        with instrumentation.stage('query'):
+            # Step 1 and 2: analyze the query and search with its parameters,
+            # collapsing reply chains and near-identical copies into one result each
+            results = ResultClusterer().collapse(self.iter_query(query, max_results))
+            
+            # Step 3: Optional detailed analysis of results
+            if self.use_claude and results:
+                results = self._analyze_results(results, query)
+            
+        return results
+
+    def iter_query(self, query: str, max_results: int = None) -> Iterator[Dict[str, Any]]:
+        """Analyze a query and lazily yield its search results"""
         print(f"\nAnalyzing query: '{query}'")
         
+        # Queries naming a reference number are answered from the reference graph,
+        # narrowed by whatever else the query asks for
+        reference = get_extractor().first(query)
+        if reference and self.index.count():
+            rest = " ".join(query.replace(reference, " ").split())
+            search_params = self._analyze_query(rest) if rest else {}
+            with instrumentation.stage('search.graph'):
+                chain = self.reference_chain(reference, search_params)
+            return take(iter(chain), max_results)
+        
         # Step 1: Use Claude to analyze query and extract search parameters
         search_params = self._analyze_query(query)
         
-        # Step 2: Search emails using the extracted parameters
-        results = self._semantic_search(search_params)
-        
-        # Step 3: Optional detailed analysis of results
-        if self.use_claude and results:
-            results = self._analyze_results(results, query)
-            
-        return results
+        # Step 2: Stream emails matching the extracted parameters
+        return self.iter_search(search_params, max_results)
 
     def _analyze_query(self, query: str) -> Dict[str, Any]:
-        """Extract search parameters using Claude API"""
+        """Extract search parameters using Claude API, cached, with a rule-based fallback"""
         try:
-            if self.use_claude and self.claude_api_key:
-                client = anthropic.Client(api_key=self.claude_api_key)
-                
-                prompt = f"""Analyze this email search query: '{query}'
-                Using the config data, extract:
-                1. Main keywords for searching
-                2. Project codes or aliases if mentioned
-                3. Document types if specified
-                4. Any date references
-                5. Additional relevant search terms
-                
-                Format the response as a Python dictionary."""
-                
-                response = client.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=500,
-                    temperature=0,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                
-                # Parse Claude's response into search parameters
-                return self._parse_claude_response(response.content)
-            else:
-                # Fallback to basic keyword extraction
-                return {
-                    'keywords': [w for w in query.lower().split() if len(w) > 3],
-                    'project_code': None,
-                    'doc_type': None
-                }
-                
+            with instrumentation.stage('query.analyze'):
+                return self.query_analyzer.analyze(query)
         except Exception as e:
             print(f"Query analysis error: {str(e)}")
             return {'keywords': [query.lower()]}
 
+    def _parse_claude_response(self, content) -> Dict[str, Any]:
+        """Parse Claude's response into validated search parameters"""
+        parsed = self.query_analyzer.parse_response(content)
+        return validate_params(parsed[0]) if parsed else None
+
     def _semantic_search(self, search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Search emails using extracted parameters"""
+        return list(self.iter_search(search_params))
+
+    def iter_search(self, search_params: Dict[str, Any], max_results: int = None) -> Iterator[Dict[str, Any]]:
+        """Lazily search emails; stops reading the mailbox after max_results hits"""
         print("Searching with parameters:", search_params)
-        results = []
+        
+        # Only live backends can be scanned directly, so index the others first
+        if not self.index.count() and not (self.backend and self.backend.live) and not self.walker:
+            self.build_index()
         
         try:
-            messages = self.inbox.Items
-            messages.Sort("[ReceivedTime]", True)
-            
-            for message in messages:
-                try:
-                    if self._matches_criteria(message, search_params):
-                        email_data = self._process_email(message)
-                        if email_data:
-                            results.append(email_data)
-                except Exception:
-                    continue
-                    
-            return results
+            # Answer from the local index when it has been built, ranked by
+            # relevance when there are keywords to score
+            if self.index.count():
+                if search_params.get('keywords'):
+                    results = iter(self._ranked_search(search_params, max_results or DEFAULT_TOP_K))
+                else:
+                    results = instrumentation.timed_iter(
+                        'search.index', self.index.iter_search(search_params, limit=max_results))
+                return enrich(results, self.enrichers)
+            if self.walker:
+                # Folders are merged by ReceivedTime, so the walk completes
+                # before the first hit can be ordered; each folder still
+                # stops reading after max_results hits
+                return iter(self.walker.search(
+                    lambda source: self._scan_source(source, search_params, max_results), limit=max_results
+                ))
+            return self._scan_source(self.source, search_params, max_results)
             
         except Exception as e:
             print(f"Search error: {str(e)}")
-            return []
+            return iter([])
 
-    def _matches_criteria(self, message, search_params: Dict[str, Any]) -> bool:
+    def _ranked_search(self, search_params: Dict[str, Any], k: int) -> List[Dict[str, Any]]:
+        """BM25 hits, fused with nearest neighbours from the vector index when there is one"""
+        with instrumentation.stage('search.bm25'):
+            ranked = self.ranker.search(search_params, k=k)
+        if self.vectors is None:
+            return ranked
+        
+        # Same date window as the keyword ranking; project and type only boost there
+        dates = {key: search_params.get(key) for key in ('date_from', 'date_to')}
+        with instrumentation.stage('search.vectors'):
+            neighbours = self.vectors.search(" ".join(search_params['keywords']), k=k)
+            similar = self.index.get_many([entry_id for entry_id, score in neighbours if score > 0], dates)
+        scores = dict(neighbours)
+        for result in similar:
+            result['similarity'] = round(scores[result['entry_id']], 4)
+        return fuse_rankings([ranked, similar], k=k)
+
+    def _scan_source(self, source: MailboxSource, search_params: Dict[str, Any],
+                     max_results: int = None) -> Iterator[Dict[str, Any]]:
+        """Run the source -> prefilter -> classify -> enrich pipeline on one source"""
+        # Push what the store can evaluate into a DASL filter and only
+        # check the residual predicates here
+        if source.supports_dasl:
+            conditions, residual = compile_conditions(search_params)
+            messages = source.iter_messages(
+                subject_filter=lambda subject: self._matches_subject(subject, residual),
+                conditions=conditions
+            )
+        else:
+            residual = search_params
+            messages = source.iter_messages(
+                subject_filter=lambda subject: self._matches_subject(subject, residual)
+            )
+        
+        return search_pipeline(
+            instrumentation.timed_iter('source', messages),
+            predicate=lambda message: self._matches_criteria(message, residual),
+            process=self._process_email,
+            enrichers=self.enrichers,
+            limit=max_results
+        )
+
+    def _matches_subject(self, subject: str, search_params: Dict[str, Any]) -> bool:
+        """Check the criteria that only depend on the subject"""
+        subject = (subject or "").lower()
+        
+        # Check project code, given either literally or through an alias
+        project_code = search_params.get('project_code')
+        if project_code:
+            if project_code.lower() not in subject and not get_classifier().matches_project(subject, project_code):
+                return False
+                
+        # Check document type
+        if search_params.get('doc_type'):
+            if not self._identify_document_type(subject) == search_params['doc_type']:
+                return False
+                
+        return True
+
+    @instrumentation.timed('match')
+    def _matches_criteria(self, message: Dict[str, Any], search_params: Dict[str, Any]) -> bool:
         """Check if message matches search criteria"""
         try:
-            subject = message.Subject.lower()
-            body = message.Body.lower() if hasattr(message, 'Body') else ""
+            subject = (message.get('subject') or "").lower()
+            body = (message.get('body') or "").lower()
             
             # Check keywords
-            if not any(kw in subject or kw in body for kw in search_params['keywords']):
+            keywords = search_params.get('keywords')
+            if keywords and not any(kw in subject or kw in body for kw in keywords):
                 return False
                 
-            # Check project code
-            if search_params.get('project_code'):
-                if search_params['project_code'] not in subject:
-                    return False
-                    
-            # Check document type
-            if search_params.get('doc_type'):
-                if not self._identify_document_type(subject) == search_params['doc_type']:
-                    return False
-                    
-            return True
+            # Check date range
+            received = message.get('received') or ""
+            if search_params.get('date_from') and received < str(search_params['date_from']):
+                return False
+            if search_params.get('date_to') and received[:len(str(search_params['date_to']))] > str(search_params['date_to']):
+                return False
+                
+            return self._matches_subject(subject, search_params)
             
         except Exception:
             return False
 
+    @instrumentation.timed('classify')
+    def _process_email(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a mailbox message into a search result"""
+        try:
+            subject = message.get('subject') or ""
+            classifier = get_classifier()
+            attachments = message.get('attachments') or []
+            attachment_text = ""
+            if attachments and self.attachment_pipeline:
+                attachment_text = self.attachment_pipeline.message_texts([message])[0]
+            file_names = " ".join(a.get('filename') or "" for a in attachments)
+            references = get_extractor().extract(f"{subject}\n{message.get('body') or ''}\n{attachment_text}")
+            return {
+                'entry_id': message.get('entry_id'),
+                'subject': subject,
+                'sender': message.get('sender') or "",
+                'received': message.get('received') or "",
+                'body': (message.get('body') or "")[:500],
+                # The subject decides; attachments only fill in what it lacks
+                'project_code': classifier.identify_project(subject) or classifier.identify_project(attachment_text),
+                'document_type': (classifier.identify_document_type(subject)
+                                  or classifier.identify_document_type(file_names)),
+                'reference_number': references[0]['reference'] if references else None,
+                'references': list(dict.fromkeys(ref['reference'] for ref in references)),
+                'folder': message.get('folder') or "",
+                'conversation_id': message.get('conversation_id') or ""
+            }
+        except Exception as e:
+            print(f"Error processing email: {str(e)}")
+            return None
+
     def _analyze_results(self, results: List[Dict], original_query: str) -> List[Dict]:
-        """Analyze search results using Claude"""
+        """Analyze all search results with Claude, map-reduce style"""
         try:
             if not self.use_claude or not results:
                 return results
-                
-            client = anthropic.Client(api_key=self.claude_api_key)
-            
-            # Prepare analysis prompt
-            email_data = "\n".join([
-                f"Subject: {r['subject']}\nDate: {r['received']}\nBody: {r['body'][:200]}..."
-                for r in results[:5]
-            ])
             
-            prompt = f"""Analyze these email search results for the query: '{original_query}'
-            {email_data}
-            
-            Provide:
-            1. Key information found
-            2. Relevant details
-            3. Summary of findings"""
-            
-            response = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                temperature=0,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with instrumentation.stage('analysis'):
+                summary = self.result_analyzer.analyze(results, original_query)
             
             # Add analysis to results
-            if response.content:
+            if summary:
                 results.append({
                     'subject': '--- Analysis Summary ---',
-                    'body': response.content,
+                    'body': summary,
                     'type': 'analysis'
                 })
             
@@ -160,21 +362,55 @@ class OutlookDeepLook:
             print(f"Analysis error: {str(e)}")
             return results
 
-    # Keep your existing helper methods (_setup_environment, _process_email, etc.)
+    def _identify_document_type(self, text: str):
+        """Identify document type from DOCUMENT_TYPES prefixes"""
+        return get_classifier().identify_document_type(text)
 
-    def _remove_duplicates(self, results: List[Dict]) -> List[Dict]:
-        """Remove duplicate emails based on subject"""
-        seen = set()
-        unique_results = []
-        
-        for result in results:
-            if result['subject'] not in seen:
-                seen.add(result['subject'])
-                unique_results.append(result)
-                
-        return unique_results
+# Results shown per question in the interactive bot
+MAX_RESULTS = 50
+
+def answer_question(searcher: OutlookDeepLook, question: str):
+    """Print the hits for one question as they arrive, then the optional analysis"""
+    # Print hits as soon as the pipeline yields them, one per thread or near-duplicate group
+    clusterer = ResultClusterer()
+    results = []
+    hits = searcher.iter_query(question, max_results=MAX_RESULTS)
+    for idx, result in enumerate(clusterer.iter_collapsed(hits), 1):
+        if idx == 1:
+            print("\nRelevant items:")
+        results.append(result)
+        print(f"\n{idx}. Subject: {result['subject']}")
+        print(f"   Date: {result['received']}")
+        if result.get('document_type'):
+            print(f"   Type: {result['document_type']}")
+
+    if results:
+        results = clusterer.clusters()
+        similar = sum(result['cluster_size'] for result in results) - len(results)
+        print(f"\nFound {len(results)} relevant items" + (f" (+{similar} similar)" if similar else ""))
+        if searcher.use_claude:
+            for result in searcher._analyze_results(results, question):
+                if result.get('type') == 'analysis':
+                    print(f"\n{result['body']}")
+    else:
+        print("\nNo matching results found.")
 
 def main():
+    parser = argparse.ArgumentParser(description="Outlook DeepLook")
+    parser.add_argument('--backend', default='outlook', help="mailbox backend: outlook, eml, mbox, pst")
+    parser.add_argument('--path', help="export to read for the eml, mbox and pst backends")
+    parser.add_argument('--attachments', action='store_true', help="index and classify attachment text")
+    parser.add_argument('--metrics', action='store_true', help="print stage timings and counters per question")
+    parser.add_argument('--profile', choices=instrumentation.PROFILERS, help="profile each question")
+    args = parser.parse_args()
+
+    # A running daemon already holds Outlook and the indexes; just ask it
+    client = DaemonClient()
+    if client.available():
+        repl(client, analyze=bool(os.getenv('CLAUDE_API_KEY')), metrics=args.metrics, profile=args.profile)
+        return
+    
+    searcher = None
     try:
         # Get Claude API preference
         use_claude = input("Use Claude API for enhanced analysis? (y/n): ").lower() == 'y'
@@ -182,7 +418,14 @@ def main():
         if use_claude:
             claude_api_key = input("Enter Claude API key: ").strip()
         
-        searcher = OutlookDeepLook(use_claude=use_claude, claude_api_key=claude_api_key)
+        searcher = OutlookDeepLook(use_claude=use_claude, claude_api_key=claude_api_key, backend=args.backend,
+                                   backend_options={'path': args.path} if args.path else None,
+                                   attachments=args.attachments)
+        
+        if searcher.index.count():
+            searcher.sync_index()
+        elif input("Build local mailbox index for fast searches? (y/n): ").lower() == 'y':
+            searcher.build_index()
         
         print("\nOutlook DeepLook Bot")
         print("Ask questions in natural language, for example:")
@@ -195,25 +438,18 @@ def main():
             if question.lower() == 'quit':
                 break
             
-            results = searcher.ask_bot(question)
-            
-            if results:
-                print(f"\nFound {len(results)} relevant items:")
-                for idx, result in enumerate(results, 1):
-                    if result.get('type') == 'analysis':
-                        print(f"\n{result['body']}")
-                    else:
-                        print(f"\n{idx}. Subject: {result['subject']}")
-                        print(f"   Date: {result['received']}")
-                        if result.get('document_type'):
-                            print(f"   Type: {result['document_type']}")
-            else:
-                print("\nNo matching results found.")
+            # Collect this question's stage timings when asked for them
+            measuring = args.metrics or args.profile
+            with instrumentation.capture(args.profile) if measuring else contextlib.nullcontext() as metrics:
+                answer_question(searcher, question)
+            if measuring:
+                print(f"\n{metrics.report()}")
                 
     except Exception as e:
         print(f"Error: {str(e)}")
     finally:
-        pythoncom.CoUninitialize()
+        if searcher:
+            searcher.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,11 @@
-import win32com.client
-import pythoncom
 import os
 from datetime import datetime
 from typing import Dict, Any, List
-import anthropic
 from config import (PROJECT_MAPPING, DOCUMENT_TYPES, 
                    REFERENCE_PATTERNS, DEPARTMENT_MAPPING)
+from classifier import get_classifier
+from dasl import compile_filter
+from references import get_extractor
 
 class OutlookDeepLook:
     def __init__(self, use_claude: bool = False, claude_api_key: str = None):
@@ -21,6 +21,9 @@ class OutlookDeepLook:
         os.makedirs(self.results_dir, exist_ok=True)
         
         try:
+            # COM is only available on Windows, so import it when connecting
+            import pythoncom
+            import win32com.client
             pythoncom.CoInitialize()
             self.outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
             self.inbox = self.outlook.GetDefaultFolder(6)
@@ -35,18 +38,18 @@ class OutlookDeepLook:
         results = []
         
         try:
-            # Build search filter
-            filter_string = f"@SQL=\"urn:schemas:httpmail:textdescription\" LIKE '%{query}%'"
-            if project_code and project_code in PROJECT_MAPPING:
-                project_aliases = PROJECT_MAPPING[project_code]['aliases']
-                alias_filter = " OR ".join([f"'%{alias}%'" for alias in project_aliases])
-                filter_string += f" AND (@SQL=\"urn:schemas:httpmail:subject\" LIKE {alias_filter})"
+            # Build an escaped DASL filter; matching any project alias in
+            # the subject is all this search requires, so ignore the residual
+            filter_string, _ = compile_filter({
+                'keywords': [query],
+                'project_code': project_code if project_code in PROJECT_MAPPING else None
+            })
             
-            messages = self.inbox.Items.Restrict(filter_string)
+            messages = self.inbox.Items.Restrict(filter_string) if filter_string else self.inbox.Items
             messages.Sort("[ReceivedTime]", True)
             
-            for idx, message in enumerate(messages):
-                if idx >= max_results:
+            for message in messages:
+                if len(results) >= max_results:
                     break
                     
                 email_data = self._process_email(message)
@@ -72,17 +75,14 @@ class OutlookDeepLook:
                 'reference_number': None
             }
             
-            # Identify project code
-            for code, project in PROJECT_MAPPING.items():
-                if any(alias in message.Subject.upper() for alias in project['aliases']):
-                    email_data['project_code'] = code
-                    break
-                    
-            # Identify document type
-            for doc_type, patterns in DOCUMENT_TYPES.items():
-                if any(prefix in message.Subject.upper() for prefix in patterns['prefixes']):
-                    email_data['document_type'] = doc_type
-                    break
+            # Identify project code and document type in one pass each
+            classifier = get_classifier()
+            subject = email_data['subject'] or ""
+            email_data['project_code'] = classifier.identify_project(subject)
+            email_data['document_type'] = classifier.identify_document_type(subject)
+            
+            # Extract reference numbers from subject and body in one scan
+            email_data['reference_number'] = get_extractor().first(f"{subject}\n{email_data['body']}")
                     
             return email_data
             
@@ -1,13 +1,56 @@
-import pandas as pd
 import os
+import csv
+import shutil
 import logging
 import re
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from config import (PROJECT_MAPPING, DOCUMENT_TYPES, 
                    REFERENCE_PATTERNS, DEPARTMENT_MAPPING)
+from classifier import get_classifier
+from references import get_extractor
+from document_store import HAS_ARROW, write_store
+from dedup import MODES, PERSIST_MODE, make_deduper
+from manifest import ParseManifest, PartitionHasher, config_fingerprint, iter_chunks
+
+# Output columns, in the order parse_document builds them
+COLUMNS = ['File_Name', 'Document_ID', 'Created_Date', 'Last_Modified', 'Project_Code', 'Project_Name',
+           'Reference_Number']
+
+class ChunkedCsvWriter:
+    """CSV writer that buffers rows and appends them in fixed-size chunks"""
+
+    def __init__(self, path, columns=COLUMNS, chunk_size=10000):
+        self.path = path
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.rows_written = 0
+        # newline='' plus os.linesep matches what DataFrame.to_csv writes
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file, lineterminator=os.linesep)
+        self.writer.writerow(columns)
+
+    def write(self, row):
+        self.buffer.append([row.get(col, '') for col in self.columns])
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.writerows(self.buffer)
+            self.rows_written += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
 
 class DocumentParser:
-    def __init__(self):
+    def __init__(self, dedup='set', dedup_options=None):
         # Initialize logging
         logging.basicConfig(
             filename='parser_log.txt',
@@ -20,31 +63,30 @@ class DocumentParser:
         self.doc_types = DOCUMENT_TYPES
         self.ref_patterns = REFERENCE_PATTERNS
         self.dept_mapping = DEPARTMENT_MAPPING
+        self.classifier = get_classifier()
+        self.extractor = get_extractor()
         
         # Create output directory if doesn't exist
         os.makedirs('output', exist_ok=True)
         
-        # Track processed documents to avoid duplicates
-        self.processed_docs = set()
+        # Track processed documents to avoid duplicates (see dedup.MODES). The
+        # default set is exact; 'exact', 'bloom' and 'disk' trade a tiny chance
+        # of dropping a distinct row for less memory. 'disk:persist' also skips
+        # rows written by earlier runs, so each run outputs only new documents
+        self.dedup_mode = dedup
+        self.dedup_options = dedup_options or {}
+        self.processed_docs = make_deduper(dedup, **self.dedup_options)
 
     def identify_project(self, text):
         """Identify project from text using PROJECT_MAPPING"""
-        text = text.upper()  # Standardize case for matching
-        
-        # First try exact project code match
-        for code, project in self.project_mapping.items():
-            if code in text:
-                return code, project['name']
-            
-        # Then try aliases
-        for code, project in self.project_mapping.items():
-            for alias in project['aliases']:
-                if alias.upper() in text:
-                    return code, project['name']
+        # Exact project codes take precedence over aliases, both in config order
+        code = self.classifier.identify_project(text)
+        if code:
+            return code, self.project_mapping[code]['name']
                     
         return 'UNCAT', 'Uncategorized'  # For documents we can't categorize
 
-    def parse_document(self, line):
+    def parse_document(self, line, dedup=True):
         """Parse a single document line"""
         try:
             # Split by tabs and multiple spaces
@@ -65,7 +107,7 @@ class DocumentParser:
             doc_id = f"{doc_info['File_Name']}_{doc_info['Document_ID']}"
             
             # Skip if already processed
-            if doc_id in self.processed_docs:
+            if dedup and doc_id in self.processed_docs:
                 return None
                 
             # Identify project
@@ -73,8 +115,12 @@ class DocumentParser:
             doc_info['Project_Code'] = project_code
             doc_info['Project_Name'] = project_name
             
+            # Extract the first reference number on the line
+            doc_info['Reference_Number'] = self.extractor.first(line) or ''
+            
             # Add to processed set
-            self.processed_docs.add(doc_id)
+            if dedup:
+                self.processed_docs.add(doc_id)
             
             return doc_info
             
@@ -82,8 +128,23 @@ class DocumentParser:
             logging.error(f"Error parsing line: {str(e)}\nLine: {line}")
             return None
 
-    def process_file(self, input_file):
+    def process_file(self, input_file, streaming=False, chunk_size=10000, parallel=False, workers=None,
+                     incremental=False):
         """Process input file and generate outputs"""
+        try:
+            return self._process_file(input_file, streaming, chunk_size, parallel, workers, incremental)
+        finally:
+            # Commit disk-backed dedup state even when processing fails
+            self.processed_docs.flush()
+
+    def _process_file(self, input_file, streaming, chunk_size, parallel, workers, incremental):
+        if incremental:
+            return self.process_file_incremental(input_file, chunk_size=chunk_size)
+        if parallel:
+            return self.process_file_parallel(input_file, workers, chunk_size)
+        if streaming:
+            return self.process_file_streaming(input_file, chunk_size)
+        
         try:
             # Read input file
             with open(input_file, 'r', encoding='utf-8') as file:
@@ -103,6 +164,9 @@ class DocumentParser:
                             projects[doc_info['Project_Code']] = []
                         projects[doc_info['Project_Code']].append(doc_info)
 
+            # pandas is only needed by this in-memory path
+            import pandas as pd
+
             # Create individual project CSV files
             for code, docs in projects.items():
                 df = pd.DataFrame(docs)
@@ -125,16 +189,272 @@ class DocumentParser:
             df = pd.DataFrame(all_docs)
             df.to_csv("output/MERGED.csv", index=False)
             logging.info("Created: output/MERGED.csv")
+            self._write_store("output/MERGED.csv")
+
+            return True
+
+        except Exception as e:
+            logging.error(f"Error processing file: {str(e)}")
+            return False
+
+    def process_file_streaming(self, input_file, chunk_size=10000):
+        """Process input file line by line with constant memory.
+
+        Rows go straight to per-project writers that flush every chunk_size
+        rows. MERGED.csv is then assembled by copying the project files in
+        first-seen order followed by UNCATEGORIZED, so every output matches
+        the in-memory path without ever holding all rows.
+        """
+        return self._write_partitioned(self._iter_documents(input_file), chunk_size)
+
+    def process_file_parallel(self, input_file, workers=None, chunk_size=10000):
+        """Parse input file on a process pool and write the same outputs.
+
+        The file is split into byte ranges aligned on line boundaries and
+        each range is parsed without deduplication in a worker. Results are
+        consumed in file order and deduplicated here against processed_docs,
+        so first-seen semantics and every output file match the serial path.
+        Like the streaming mode, memory stays bounded: at most two ranges
+        per worker are submitted or waiting to be written at any time.
+        """
+        workers = workers or os.cpu_count() or 1
+        ranges = line_aligned_ranges(input_file, workers * 4)
+        
+        def documents(pool):
+            tasks = ((input_file, start, end, index == 0) for index, (start, end) in enumerate(ranges))
+            for docs in imap_bounded(pool, _parse_range, tasks, workers * 2):
+                for doc_info in docs:
+                    doc_id = f"{doc_info['File_Name']}_{doc_info['Document_ID']}"
+                    if self.processed_docs.add(doc_id):
+                        yield doc_info
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                return self._write_partitioned(documents(pool), chunk_size)
+        except Exception as e:
+            logging.error(f"Error processing file: {str(e)}")
+            return False
+
+    def process_file_incremental(self, input_file, manifest_path="output/manifest.db", chunk_size=10000,
+                                 chunk_lines=32):
+        """Re-parse only input chunks that changed since the last incremental run.
+
+        Lines are grouped into content-defined chunks (see manifest.iter_chunks)
+        and parsed rows are cached per chunk hash, so only new or edited chunks
+        go through parse_document. Deduplication then runs over all rows in
+        file order, as in the other modes, and only the project files whose
+        rows hash differently from the manifest are rewritten. MERGED.csv is
+        reassembled only when some project file changed.
+        """
+        manifest = ParseManifest(manifest_path, config_fingerprint(COLUMNS))
+        try:
+            digests = []
+            parsed = 0
+            for digest, lines in iter_chunks(self._iter_lines(input_file), chunk_lines):
+                if not manifest.has_chunk(digest):
+                    docs = (self.parse_document(line, dedup=False) for line in lines)
+                    manifest.put_chunk(digest, [doc_info for doc_info in docs if doc_info])
+                    parsed += len(lines)
+                digests.append(digest)
+            
+            # First pass: hash every partition without keeping its rows
+            hashers = {}
+            for name, doc_info in self._iter_partitioned(manifest.iter_docs(digests)):
+                if name not in hashers:
+                    hashers[name] = PartitionHasher(COLUMNS)
+                hashers[name].update(doc_info)
+            if 'UNCATEGORIZED' in hashers:  # UNCATEGORIZED goes last in the merged file
+                hashers['UNCATEGORIZED'] = hashers.pop('UNCATEGORIZED')
+            
+            previous = manifest.partitions()
+            changed = {name for name, hasher in hashers.items()
+                       if previous.get(name) != hasher.hexdigest() or not os.path.exists(f"output/{name}.csv")}
+            removed = [name for name in previous if name not in hashers]
+            
+            # Second pass: rewrite the changed partitions only
+            if changed:
+                writers = {name: ChunkedCsvWriter(f"output/{name}.csv", chunk_size=chunk_size) for name in changed}
+                try:
+                    for name, doc_info in self._iter_partitioned(manifest.iter_docs(digests)):
+                        if name in writers:
+                            writers[name].write(doc_info)
+                finally:
+                    for writer in writers.values():
+                        writer.close()
+                for name in changed:
+                    logging.info(f"Created: output/{name}.csv")
+            
+            for name in removed:
+                if os.path.exists(f"output/{name}.csv"):
+                    os.remove(f"output/{name}.csv")
+                logging.info(f"Removed: output/{name}.csv")
+            
+            if changed or removed or list(previous) != list(hashers) or not os.path.exists("output/MERGED.csv"):
+                self._concat_csv([f"output/{name}.csv" for name in hashers], "output/MERGED.csv")
+                logging.info("Created: output/MERGED.csv")
+                self._write_store("output/MERGED.csv")
+            
+            manifest.save_partitions(hashers)
+            manifest.prune_chunks(digests)
+            manifest.commit()
+            logging.info(f"Incremental run: parsed {parsed} lines, rewrote {len(changed)} of {len(hashers)} files")
+            return True
+        
+        except Exception as e:
+            logging.error(f"Error processing file: {str(e)}")
+            return False
+        finally:
+            manifest.close()
+
+    def _iter_lines(self, input_file):
+        """Yield stripped, non-blank lines from input file, skipping the header"""
+        with open(input_file, 'r', encoding='utf-8') as file:
+            header_skipped = False
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                if not header_skipped:  # Skip header
+                    header_skipped = True
+                    continue
+                yield line
+
+    def _iter_documents(self, input_file):
+        """Yield parsed, deduplicated documents from input file, skipping the header"""
+        for line in self._iter_lines(input_file):
+            doc_info = self.parse_document(line)
+            if doc_info:
+                yield doc_info
+
+    def _iter_partitioned(self, documents):
+        """Deduplicate cached rows in file order and yield (partition, row) pairs"""
+        # Each pass re-derives the whole output, so it starts from an empty in-memory set
+        mode = 'exact' if self.dedup_mode.startswith('disk') else self.dedup_mode
+        seen = make_deduper(mode, **({} if mode != self.dedup_mode else self.dedup_options))
+        for doc_info in documents:
+            doc_id = f"{doc_info['File_Name']}_{doc_info['Document_ID']}"
+            if not seen.add(doc_id):
+                continue
+            code = doc_info['Project_Code']
+            yield ('UNCATEGORIZED' if code == 'UNCAT' else code), doc_info
+
+    def _write_partitioned(self, documents, chunk_size=10000):
+        """Write documents to per-project CSVs and assemble MERGED.csv"""
+        writers = {}
+        try:
+            for doc_info in documents:
+                code = doc_info['Project_Code']
+                name = 'UNCATEGORIZED' if code == 'UNCAT' else code
+                if name not in writers:
+                    writers[name] = ChunkedCsvWriter(f"output/{name}.csv", chunk_size=chunk_size)
+                writers[name].write(doc_info)
+
+            for name, writer in writers.items():
+                writer.close()
+                logging.info(f"Created: {writer.path}")
+
+            # UNCATEGORIZED goes last in the merged file
+            order = [name for name in writers if name != 'UNCATEGORIZED']
+            if 'UNCATEGORIZED' in writers:
+                order.append('UNCATEGORIZED')
+            self._concat_csv([writers[name].path for name in order], "output/MERGED.csv")
+            logging.info("Created: output/MERGED.csv")
+            self._write_store("output/MERGED.csv")
 
             return True
 
         except Exception as e:
             logging.error(f"Error processing file: {str(e)}")
             return False
+        finally:
+            for writer in writers.values():
+                if not writer.file.closed:
+                    writer.file.close()
+
+    def _concat_csv(self, paths, output_file, columns=COLUMNS):
+        """Concatenate CSV files sharing a header, copying in blocks"""
+        with open(output_file, 'w', encoding='utf-8', newline='') as out:
+            csv.writer(out, lineterminator=os.linesep).writerow(columns)
+            for path in paths:
+                with open(path, 'r', encoding='utf-8', newline='') as src:
+                    src.readline()  # Skip header
+                    shutil.copyfileobj(src, out)
+
+    def _write_store(self, csv_file):
+        """Write the columnar copy of a merged CSV when pyarrow is available"""
+        if not HAS_ARROW:
+            return
+        try:
+            rows = write_store(csv_file)
+            logging.info(f"Created: {os.path.splitext(csv_file)[0]}.arrow ({rows} rows)")
+        except Exception as e:
+            # The searcher rebuilds a missing store from the CSV
+            logging.error(f"Error writing columnar store: {str(e)}")
+
+def line_aligned_ranges(path, parts):
+    """Split a file into up to `parts` byte ranges that start at line starts"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    step = max(1, size // max(1, parts))
+    bounds = [0]
+    with open(path, 'rb') as f:
+        while bounds[-1] + step < size:
+            f.seek(bounds[-1] + step)
+            f.readline()  # Move to the start of the next line
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# Parser instance owned by each worker process
+_worker_parser = None
+
+def _init_worker():
+    global _worker_parser
+    _worker_parser = DocumentParser()
+
+def imap_bounded(pool, func, tasks, in_flight):
+    """Ordered pool.map over tasks that submits only as results are consumed"""
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, task))
+    while pending:
+        yield pending.popleft().result()
+
+def _parse_range(task):
+    """Parse the lines in one byte range without deduplication"""
+    path, start, end, skip_header = task
+    docs = []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            raw = f.readline()
+            if not raw:
+                break
+            line = raw.decode('utf-8').strip()
+            if not line:
+                continue
+            if skip_header:  # The header is the first non-blank line of the file
+                skip_header = False
+                continue
+            doc_info = _worker_parser.parse_document(line, dedup=False)
+            if doc_info:
+                docs.append(doc_info)
+    return docs
 
 def main():
-    parser = DocumentParser()
-    success = parser.process_file("input.txt")
+    arg_parser = argparse.ArgumentParser(description="Parse a document registry export into project CSVs")
+    arg_parser.add_argument('input_file', nargs='?', default="input.txt")
+    arg_parser.add_argument('--dedup', choices=MODES + [PERSIST_MODE], default='set',
+                            help="Dedup backend; disk:persist skips documents seen by earlier runs")
+    args = arg_parser.parse_args()
+
+    parser = DocumentParser(dedup=args.dedup)
+    success = parser.process_file(args.input_file)
     if success:
         print("Processing complete! Check output directory for results.")
     else:
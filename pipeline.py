@@ -0,0 +1,52 @@
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, Callable, List, Optional
+
+Message = Dict[str, Any]
+
+
+def prefilter(messages: Iterable[Message], predicate: Callable[[Message], bool]) -> Iterator[Message]:
+    """Drop messages that fail the residual search predicates"""
+    for message in messages:
+        try:
+            if predicate(message):
+                yield message
+        except Exception:
+            continue
+
+
+def classify(messages: Iterable[Message], process: Callable[[Message], Optional[Message]]) -> Iterator[Message]:
+    """Turn raw messages into classified search results"""
+    for message in messages:
+        result = process(message)
+        if result:
+            yield result
+
+
+def enrich(results: Iterable[Message], enrichers: List[Callable[[Message], Message]]) -> Iterator[Message]:
+    """Apply each enricher to every result, in order"""
+    for result in results:
+        for enricher in enrichers:
+            result = enricher(result)
+        yield result
+
+
+def take(results: Iterable[Message], limit: Optional[int]) -> Iterator[Message]:
+    """Stop pulling from upstream stages once limit results were produced"""
+    return iter(results) if not limit else islice(results, limit)
+
+
+def search_pipeline(messages: Iterable[Message],
+                    predicate: Callable[[Message], bool],
+                    process: Callable[[Message], Optional[Message]],
+                    enrichers: List[Callable[[Message], Message]] = None,
+                    limit: Optional[int] = None) -> Iterator[Message]:
+    """source -> prefilter -> classify -> enrich, evaluated lazily.
+
+    Every stage is a generator, so the first hit reaches the caller as soon
+    as it is found, and closing or exhausting the result stops the source
+    from being read any further.
+    """
+    results = classify(prefilter(messages, predicate), process)
+    if enrichers:
+        results = enrich(results, enrichers)
+    return take(results, limit)
@@ -0,0 +1,254 @@
+import os
+import re
+import ast
+import copy
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from config import PROJECT_MAPPING, DOCUMENT_TYPES
+from classifier import TextClassifier
+import instrumentation
+
+MODEL = "claude-3-haiku-20240307"
+
+# Words that carry no search meaning in natural-language questions
+STOPWORDS = {
+    'about', 'above', 'after', 'all', 'also', 'and', 'any', 'are', 'documents', 'email',
+    'emails', 'find', 'from', 'have', 'into', 'me', 'mail', 'mails', 'related', 'recent',
+    'regarding', 'show', 'that', 'the', 'their', 'there', 'these', 'this', 'what', 'when',
+    'where', 'which', 'with', 'give', 'list', 'search', 'look', 'were', 'been'
+}
+
+PROMPT = """Analyze these email search queries. For each query extract:
+- keywords: main lowercase keywords for searching (list of strings)
+- project_code: one of {project_codes} if a project or alias is mentioned, else null
+- doc_type: one of {doc_types} if a document type is specified, else null
+- date_from / date_to: ISO dates (YYYY-MM-DD) for any date references, else null
+
+Project aliases: {aliases}
+
+Queries:
+{queries}
+
+Respond with only a JSON array holding one object per query, in the same order."""
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercase words without punctuation or extra spaces"""
+    return " ".join(re.findall(r'\w+', query.lower()))
+
+
+def validate_params(params: Any) -> Optional[Dict[str, Any]]:
+    """Check a parsed response against the search-params schema.
+
+    Returns the cleaned params, or None when the structure is unusable.
+    Unknown project codes or document types are dropped rather than trusted.
+    """
+    if not isinstance(params, dict):
+        return None
+
+    keywords = params.get('keywords')
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    if not isinstance(keywords, list) or not all(isinstance(kw, str) for kw in keywords):
+        return None
+
+    cleaned = {
+        'keywords': [kw.lower().strip() for kw in keywords if kw and kw.strip()],
+        'project_code': params.get('project_code') if params.get('project_code') in PROJECT_MAPPING else None,
+        'doc_type': params.get('doc_type') if params.get('doc_type') in DOCUMENT_TYPES else None
+    }
+    for key in ('date_from', 'date_to'):
+        value = params.get(key)
+        try:
+            cleaned[key] = datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d") if value else None
+        except (TypeError, ValueError):
+            cleaned[key] = None
+    return cleaned
+
+
+class QueryCache:
+    """In-process LRU in front of an on-disk SQLite cache with a TTL"""
+
+    def __init__(self, path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                return entry[0]
+
+            if self.conn is None:
+                return None
+            row = self.conn.execute(
+                "SELECT value, created FROM query_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or now - row[1] >= self.ttl:
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self.lock:
+            self._remember(key, value, now)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO query_cache (key, value, created) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), now)
+                    )
+
+    def _remember(self, key: str, value: Dict[str, Any], created: float):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+
+class RuleBasedParser:
+    """Deterministic query parser driven by config.py aliases"""
+
+    def __init__(self):
+        # Queries are natural language, so aliases must match whole words
+        self.classifier = TextClassifier(whole_words=True)
+
+    def parse(self, query: str) -> Dict[str, Any]:
+        words = re.findall(r'\w+', query.lower())
+        params = {
+            'keywords': [w for w in words if len(w) > 3 and w not in STOPWORDS and not w.isdigit()],
+            'project_code': self.classifier.identify_project(query),
+            'doc_type': self.classifier.identify_document_type(query),
+            'date_from': None,
+            'date_to': None
+        }
+
+        dates = re.findall(r'\b(\d{4}-\d{2}-\d{2})\b', query)
+        years = re.findall(r'\b((?:19|20)\d{2})\b', query)
+        if dates:
+            params['date_from'], params['date_to'] = min(dates), max(dates)
+        elif years:
+            params['date_from'], params['date_to'] = f"{min(years)}-01-01", f"{max(years)}-12-31"
+
+        if not params['keywords'] and not params['project_code'] and not params['doc_type']:
+            params['keywords'] = [query.lower().strip()]
+        return params
+
+
+class QueryAnalyzer:
+    """Turns natural-language queries into search params.
+
+    One Claude client is reused for every call, results are cached by
+    normalized query text, and cache misses are batched into one request.
+    Anything the API cannot answer, or answers with output that fails
+    validation, falls back to RuleBasedParser. Only validated Claude
+    answers are cached.
+    """
+
+    def __init__(self, api_key: str = None, client=None, use_claude: bool = True,
+                 cache_path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 1024):
+        self.api_key = api_key
+        self._client = client
+        self.use_claude = use_claude and (client is not None or bool(api_key))
+        self.cache = QueryCache(cache_path, ttl, max_entries)
+        self.fallback = RuleBasedParser()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import anthropic
+            self._client = anthropic.Client(api_key=self.api_key)
+        return self._client
+
+    def analyze(self, query: str) -> Dict[str, Any]:
+        return self.analyze_batch([query])[0]
+
+    def analyze_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Analyze several queries, sending only uncached ones in a single request"""
+        keys = [normalize_query(query) for query in queries]
+        results = [self.cache.get(key) for key in keys]
+
+        missing = {}
+        for query, key, result in zip(queries, keys, results):
+            if result is None and key not in missing:
+                missing[key] = query
+
+        if missing:
+            parsed = self._ask_claude(list(missing.values())) if self.use_claude else None
+            answered = {}
+            for i, (key, query) in enumerate(missing.items()):
+                params = validate_params(parsed[i]) if parsed and i < len(parsed) else None
+                if params is None:
+                    # Rule-based results are cheap to recompute and must not
+                    # stand in for Claude's answer in later sessions
+                    answered[key] = self.fallback.parse(query)
+                    continue
+                if not params['keywords']:
+                    params['keywords'] = self.fallback.parse(query)['keywords']
+                self.cache.put(key, params)
+                answered[key] = params
+
+            results = [result if result is not None else answered[key] for key, result in zip(keys, results)]
+
+        # Deep copies, so callers extending keywords never touch the cached params
+        return [copy.deepcopy(result) for result in results]
+
+    def _ask_claude(self, queries: List[str]) -> Optional[List[Any]]:
+        prompt = PROMPT.format(
+            project_codes=", ".join(PROJECT_MAPPING),
+            doc_types=", ".join(DOCUMENT_TYPES),
+            aliases="; ".join(f"{code}: {', '.join(project['aliases'])}"
+                              for code, project in PROJECT_MAPPING.items()),
+            queries="\n".join(f"{i + 1}. {query}" for i, query in enumerate(queries))
+        )
+        try:
+            with instrumentation.stage('api.query'):
+                response = self.client.messages.create(
+                    model=MODEL,
+                    max_tokens=300 * len(queries),
+                    temperature=0,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            instrumentation.count_usage(response)
+            return self.parse_response(response.content)
+        except Exception as e:
+            print(f"Query analysis error: {str(e)}")
+            return None
+
+    @staticmethod
+    def parse_response(content) -> Optional[List[Any]]:
+        """Extract a list of param dicts from Claude's response content"""
+        if isinstance(content, list):
+            content = "".join(getattr(block, 'text', str(block)) for block in content)
+        text = str(content)
+
+        match = re.search(r'\[.*\]|\{.*\}', text, re.DOTALL)
+        if not match:
+            return None
+        snippet = match.group()
+        for loader in (json.loads, ast.literal_eval):
+            try:
+                parsed = loader(snippet)
+                return parsed if isinstance(parsed, list) else [parsed]
+            except (ValueError, SyntaxError):
+                continue
+        return None
@@ -0,0 +1,84 @@
+import heapq
+from typing import Dict, Any, List
+from mail_index import MailIndex, fts_query
+
+# Default number of ranked results
+DEFAULT_TOP_K = 20
+
+
+class BM25Ranker:
+    """Relevance ranking over the local mailbox index.
+
+    Each hit gets a per-field BM25 score from FTS5 (subject weighted above
+    body and attachment text) plus additive boosts when its classified project code or document
+    type matches the query. Only the best k hits are kept, using a heap.
+    """
+
+    def __init__(self, index: MailIndex, subject_weight: float = 3.0, body_weight: float = 1.0,
+                 project_boost: float = 2.0, doc_type_boost: float = 1.0, attachment_weight: float = 1.0):
+        self.index = index
+        self.subject_weight = subject_weight
+        self.body_weight = body_weight
+        self.attachment_weight = attachment_weight
+        self.project_boost = project_boost
+        self.doc_type_boost = doc_type_boost
+
+    def search(self, search_params: Dict[str, Any], k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """Return the top k hits for the query keywords, best first"""
+        match = fts_query(search_params.get('keywords'))
+        if not match:
+            # Nothing to score; fall back to the boolean, newest-first search
+            return self.index.search(search_params, limit=k)
+
+        # FTS5's bm25() is lower-is-better, so negate it
+        sql = """
+            SELECT m.*, -bm25(messages_fts, ?, ?, ?) AS relevance
+            FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid
+            WHERE messages_fts MATCH ?
+        """
+        args = [self.subject_weight, self.body_weight, self.attachment_weight, match]
+        if search_params.get('date_from'):
+            sql += " AND m.received >= ?"
+            args.append(str(search_params['date_from']))
+        if search_params.get('date_to'):
+            sql += " AND substr(m.received, 1, ?) <= ?"
+            args.extend([len(str(search_params['date_to'])), str(search_params['date_to'])])
+
+        project_code = search_params.get('project_code')
+        doc_type = search_params.get('doc_type')
+
+        def scored(rows):
+            for row in rows:
+                score = row['relevance']
+                if project_code and row['project_code'] == project_code:
+                    score += self.project_boost
+                if doc_type and row['document_type'] == doc_type:
+                    score += self.doc_type_boost
+                # received breaks ties in favour of newer mail
+                yield score, row['received'] or "", row
+
+        top = heapq.nlargest(k, scored(self.index.conn.execute(sql, args)), key=lambda item: item[:2])
+
+        results = []
+        for score, _, row in top:
+            result = self.index.row_to_result(row)
+            result['score'] = round(score, 4)
+            results.append(result)
+        return results
+
+
+def fuse_rankings(rankings: List[List[Dict[str, Any]]], k: int = DEFAULT_TOP_K,
+                  constant: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked result lists by reciprocal rank fusion, keyed on entry_id.
+
+    Scores of different rankers are not comparable, so each hit scores
+    1 / (constant + rank) in every list it appears in and the sums decide.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            entry = fused.setdefault(result['entry_id'], [0.0, result])
+            entry[0] += 1.0 / (constant + rank)
+            entry[1] = {**result, **entry[1]}
+    top = heapq.nlargest(k, fused.values(), key=lambda entry: entry[0])
+    return [result for _, result in top]
@@ -0,0 +1,161 @@
+import re
+import csv
+import sqlite3
+from collections import deque
+from typing import Dict, Any, List, Optional
+from references import ReferenceExtractor, get_extractor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ref_edges (
+    kind TEXT NOT NULL,
+    node TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (kind, node, ref, type)
+);
+CREATE INDEX IF NOT EXISTS idx_ref_edges_ref ON ref_edges(ref);
+"""
+
+# Typed edges for the special_formats patterns, by pattern position in config.py
+SPECIAL_EDGE_TYPES = ['terminates', 'responds_to', 'stred_letter']
+
+# Node kinds
+EMAIL = 'email'
+DOCUMENT = 'document'
+
+# Bounds on chain(): hub references (a project-wide letter series, say) link
+# most of the mailbox within a few hops
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_NODES = 500
+
+
+def canonical_reference(reference: str) -> str:
+    """Key used to link references written in different formats.
+
+    'SHA-340PD-2017', 'STL-EME_ABS_OHA-340PD-2017' and '340PD_2017' all
+    share the '340PD-2017' core; other references are upper-cased with '_'
+    read as '-'.
+    """
+    reference = reference.upper().replace('_', '-')
+    core = re.search(r'\d+PD-\d{4}', reference)
+    return core.group() if core else reference
+
+
+def edge_type(ref: Dict[str, Any]) -> str:
+    if ref['category'] == 'special_formats' and ref['pattern'] < len(SPECIAL_EDGE_TYPES):
+        return SPECIAL_EDGE_TYPES[ref['pattern']]
+    return 'mentions'
+
+
+class ReferenceGraph:
+    """Persistent graph linking emails and registry documents by reference.
+
+    Nodes are emails (by EntryID) and registry documents (by File_Name and
+    Document_ID). Each node has one edge per canonical reference it carries,
+    typed 'mentions' or after the special_formats phrase it was found in.
+    Tables live in the mail index database, so email nodes can be pruned
+    against the messages table directly.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, extractor: ReferenceExtractor = None):
+        self.conn = conn
+        self.extractor = extractor or get_extractor()
+        self.conn.executescript(SCHEMA)
+
+    def _edges(self, text: str) -> List[tuple]:
+        return list(dict.fromkeys(
+            (canonical_reference(ref['reference']), edge_type(ref))
+            for ref in self.extractor.extract(text)
+        ))
+
+    def add_node(self, kind: str, node: str, text: str, commit: bool = True):
+        """Replace the edges of one node with those found in its text"""
+        self.conn.execute("DELETE FROM ref_edges WHERE kind = ? AND node = ?", (kind, node))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO ref_edges (kind, node, ref, type) VALUES (?, ?, ?, ?)",
+            [(kind, node, ref, type_) for ref, type_ in self._edges(text)]
+        )
+        if commit:
+            self.conn.commit()
+
+    def sync_from_index(self, index) -> int:
+        """Add edges for index messages written since the last graph sync
+        and drop email nodes whose message left the index.
+
+        Progress follows the index's write sequence rather than message
+        timestamps, so older mail from a source added later is linked too.
+        """
+        since = int(index.get_meta("graph_seq") or 0)
+        seq = since
+        updated = 0
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT entry_id, subject, body, attachments, seq FROM messages WHERE seq > ? ORDER BY seq",
+                (since,)
+            )
+            for entry_id, subject, body, attachments, row_seq in rows.fetchall():
+                self.add_node(EMAIL, entry_id, f"{subject or ''}\n{body or ''}\n{attachments or ''}", commit=False)
+                seq = max(seq, row_seq)
+                updated += 1
+            self.conn.execute(
+                "DELETE FROM ref_edges WHERE kind = ? AND node NOT IN (SELECT entry_id FROM messages)",
+                (EMAIL,)
+            )
+        index.set_meta("graph_seq", str(seq))
+        return updated
+
+    def add_registry(self, csv_file: str) -> int:
+        """Add registry documents from a DocumentParser output CSV"""
+        added = 0
+        with open(csv_file, 'r', encoding='utf-8', newline='') as f, self.conn:
+            for row in csv.DictReader(f):
+                node = f"{row.get('File_Name', '')}_{row.get('Document_ID', '')}"
+                text = " ".join(filter(None, [row.get('File_Name'), row.get('Reference_Number')]))
+                self.add_node(DOCUMENT, node, text, commit=False)
+                added += 1
+        return added
+
+    def lookup(self, reference: str) -> List[Dict[str, str]]:
+        """Every node carrying a reference, via the ref index"""
+        rows = self.conn.execute(
+            "SELECT kind, node, type FROM ref_edges WHERE ref = ?", (canonical_reference(reference),)
+        )
+        return [{'kind': kind, 'node': node, 'type': type_} for kind, node, type_ in rows]
+
+    def references_of(self, kind: str, node: str) -> List[str]:
+        rows = self.conn.execute("SELECT ref FROM ref_edges WHERE kind = ? AND node = ?", (kind, node))
+        return [row[0] for row in rows]
+
+    def chain(self, reference: str, max_depth: Optional[int] = DEFAULT_MAX_DEPTH,
+              max_nodes: Optional[int] = DEFAULT_MAX_NODES) -> Dict[str, Any]:
+        """Transitively collect the nodes and references connected to a reference.
+
+        Breadth-first over reference -> nodes -> their other references,
+        each step an indexed lookup. max_depth limits the reference hops and
+        max_nodes the nodes collected, nearest first; None walks the whole
+        closure.
+        """
+        start = canonical_reference(reference)
+        seen_refs = {start: 0}
+        seen_nodes = {}
+        queue = deque([start])
+
+        while queue:
+            ref = queue.popleft()
+            depth = seen_refs[ref]
+            for edge in self.lookup(ref):
+                key = (edge['kind'], edge['node'])
+                if key in seen_nodes:
+                    continue
+                if max_nodes is not None and len(seen_nodes) >= max_nodes:
+                    queue.clear()
+                    break
+                seen_nodes[key] = dict(edge, ref=ref, depth=depth)
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for other in self.references_of(*key):
+                    if other not in seen_refs:
+                        seen_refs[other] = depth + 1
+                        queue.append(other)
+
+        return {'references': list(seen_refs), 'nodes': list(seen_nodes.values())}
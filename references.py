@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from config import REFERENCE_PATTERNS
+
+# Alternation order: most specific groups first, so a reference is reported
+# under its most specific category when alternatives start at the same place
+CATEGORY_ORDER = ['special_formats', 'letter_references', 'department_project', 'standard']
+
+# Free-text phrases are matched case-insensitively; code patterns stay exact
+CASE_INSENSITIVE = {'special_formats'}
+
+# Categories whose pattern wraps the reference in surrounding words; the
+# reference itself is their first capture group
+WRAPPED = {'special_formats'}
+
+
+class ReferenceExtractor:
+    """Single-pass extractor for every REFERENCE_PATTERNS group.
+
+    All patterns are merged into one precompiled alternation with a named
+    group per pattern, so a subject or body is scanned once regardless of
+    how many patterns config.py defines.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]] = None):
+        self.patterns = patterns if patterns is not None else REFERENCE_PATTERNS
+        order = [c for c in CATEGORY_ORDER if c in self.patterns]
+        order += [c for c in self.patterns if c not in order]
+
+        alternatives = []
+        self.groups = {}
+        for category in order:
+            for index, pattern in enumerate(self.patterns[category]):
+                name = f"{category}_{index}"
+                body = f"(?i:{pattern})" if category in CASE_INSENSITIVE else pattern
+                alternatives.append(f"(?P<{name}>{body})")
+                self.groups[name] = (category, index, re.compile(pattern).groups > 0)
+
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self.group_index = self.pattern.groupindex if self.pattern else {}
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        """Return every reference in text, in order of appearance"""
+        if not text or self.pattern is None:
+            return []
+
+        found = []
+        for match in self.pattern.finditer(text):
+            name = match.lastgroup
+            category, index, has_groups = self.groups[name]
+            reference = match.group(name)
+            if category in WRAPPED and has_groups:
+                # The inner group directly follows the named group
+                reference = match.group(self.group_index[name] + 1)
+            found.append({
+                'reference': reference,
+                'category': category,
+                'pattern': index,
+                'match': match.group(name)
+            })
+        return found
+
+    def first(self, text: str) -> Optional[str]:
+        """Return the first reference in text, or None"""
+        refs = self.extract(text)
+        return refs[0]['reference'] if refs else None
+
+
+@lru_cache(maxsize=1)
+def get_extractor() -> ReferenceExtractor:
+    """Shared extractor built once from config.py"""
+    return ReferenceExtractor()
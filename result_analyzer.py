@@ -0,0 +1,247 @@
+import time
+import random
+import asyncio
+from typing import Dict, Any, List, Optional
+from query_analyzer import MODEL
+import instrumentation
+
+# Rough size of a token in English text, for budgeting before a request
+CHARS_PER_TOKEN = 4
+
+# HTTP statuses worth retrying: rate limited, server errors, overloaded
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+MAP_PROMPT = """You are reviewing part of the email search results for the query: '{query}'
+
+{emails}
+
+List the facts in these emails that are relevant to the query: decisions, amounts,
+dates, references and who said what. Name the email subject next to each fact.
+Skip emails with nothing relevant. Be concise."""
+
+ANSWER_PROMPT = """Analyze these email search results for the query: '{query}'
+
+{emails}
+
+Provide:
+1. Key information found
+2. Relevant details
+3. Summary of findings"""
+
+REDUCE_PROMPT = """These are notes from reviewing {count} email search results for the query: '{query}'
+
+{notes}
+
+Combine them into one answer. Provide:
+1. Key information found
+2. Relevant details
+3. Summary of findings"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_result(result: Dict[str, Any], body_chars: int) -> str:
+    lines = [f"Subject: {result.get('subject', '')}", f"Date: {result.get('received', '')}"]
+    if result.get('sender'):
+        lines.append(f"From: {result['sender']}")
+    if result.get('project_code') or result.get('document_type'):
+        lines.append(f"Project: {result.get('project_code') or '-'}  Type: {result.get('document_type') or '-'}")
+    lines.append(f"Body: {(result.get('body') or '')[:body_chars]}")
+    return "\n".join(lines)
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or \
+        type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from a Retry-After header"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket spacing request starts to `rate` per second, allowing bursts of `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResultAnalyzer:
+    """Map-reduce summary of search results with Claude.
+
+    Results are packed into batches of at most batch_tokens prompt tokens
+    and summarized concurrently (map), at most max_concurrency requests in
+    flight and requests_per_second starting. The partial notes are then
+    combined into one answer (reduce), in more than one round if they do
+    not fit a single prompt. Rate-limit, overload and connection errors are
+    retried with jittered exponential backoff, honouring Retry-After.
+
+    Each analysis may spend at most token_budget tokens, counted from the
+    API's usage figures. Map batches that would leave too little for the
+    reduce step are skipped, so the earliest (best-ranked) results are
+    always covered first. Results that fit one batch take a single request.
+
+    `client` can be any object with an async `messages.create` shaped like
+    anthropic.AsyncAnthropic's, such as a local stub. Without one, each
+    analysis opens and closes its own AsyncAnthropic client: its connection
+    pool belongs to the event loop it was created on, and analyze() starts
+    a new loop per call.
+    """
+
+    def __init__(self, api_key: str = None, client=None, model: str = MODEL,
+                 batch_tokens: int = 12000, max_tokens: int = 600, body_chars: int = 2000,
+                 max_concurrency: int = 16, requests_per_second: float = 8.0, burst: int = 8,
+                 max_retries: int = 5, backoff: float = 1.0, token_budget: int = 400000):
+        self.api_key = api_key
+        self._client = client
+        self.model = model
+        self.batch_tokens = batch_tokens
+        self.max_tokens = max_tokens
+        self.body_chars = body_chars
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.token_budget = token_budget
+        self.stats = {}
+        # Client of the analysis in progress
+        self._session = None
+
+    def batch(self, results: List[Dict[str, Any]]) -> List[List[str]]:
+        """Formatted results packed greedily into batches of at most batch_tokens"""
+        batches, current, size = [], [], 0
+        for result in results:
+            text = format_result(result, self.body_chars)
+            tokens = estimate_tokens(text)
+            if current and size + tokens > self.batch_tokens:
+                batches.append(current)
+                current, size = [], 0
+            current.append(text)
+            size += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def analyze(self, results: List[Dict[str, Any]], query: str) -> Optional[str]:
+        """Blocking wrapper around analyze_async"""
+        return asyncio.run(self.analyze_async(results, query))
+
+    async def analyze_async(self, results: List[Dict[str, Any]], query: str) -> Optional[str]:
+        """One answer covering all results, or None when nothing could be summarized"""
+        self.stats = {'requests': 0, 'retries': 0, 'failed': 0, 'skipped': 0, 'tokens': 0}
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._limiter = RateLimiter(self.requests_per_second, self.burst)
+        if not results:
+            return None
+
+        if self._client is not None:
+            self._session = self._client
+            return await self._analyze(results, query)
+        import anthropic
+        async with anthropic.AsyncAnthropic(api_key=self.api_key) as client:
+            self._session = client
+            try:
+                return await self._analyze(results, query)
+            finally:
+                self._session = None
+
+    async def _analyze(self, results: List[Dict[str, Any]], query: str) -> Optional[str]:
+        batches = self.batch(results)
+        if len(batches) == 1:
+            return await self._complete(ANSWER_PROMPT.format(query=query, emails="\n\n---\n\n".join(batches[0])))
+
+        # Keep enough budget back for at least one reduce request
+        map_budget = self.token_budget - self.batch_tokens - self.max_tokens
+        notes = await asyncio.gather(*(
+            self._complete(MAP_PROMPT.format(query=query, emails="\n\n---\n\n".join(batch)), map_budget)
+            for batch in batches
+        ))
+        notes = [note for note in notes if note]
+
+        # Reduce in rounds until the notes fit one prompt
+        while len(notes) > 1:
+            groups, current, size = [], [], 0
+            for note in notes:
+                tokens = estimate_tokens(note)
+                if current and size + tokens > self.batch_tokens:
+                    groups.append(current)
+                    current, size = [], 0
+                current.append(note)
+                size += tokens
+            groups.append(current)
+            reduced = await asyncio.gather(*(
+                self._complete(REDUCE_PROMPT.format(query=query, count=len(results), notes="\n\n".join(group)))
+                for group in groups
+            ))
+            reduced = [note for note in reduced if note]
+            if not reduced or len(reduced) >= len(notes):
+                # No progress: the budget ran out or every request failed
+                return "\n\n".join(notes)
+            notes = reduced
+        return notes[0] if notes else None
+
+    async def _complete(self, prompt: str, budget: int = None) -> Optional[str]:
+        """Text of one completion, retried on transient errors; None if skipped or failed"""
+        # Reserve the worst case up front so concurrent requests cannot overshoot
+        reserved = estimate_tokens(prompt) + self.max_tokens
+        if self.stats['tokens'] + reserved > (budget or self.token_budget):
+            self.stats['skipped'] += 1
+            return None
+        self.stats['tokens'] += reserved
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._limiter.acquire()
+                self.stats['requests'] += 1
+                try:
+                    with instrumentation.stage('api.analyze'):
+                        response = await self._session.messages.create(
+                            model=self.model,
+                            max_tokens=self.max_tokens,
+                            temperature=0,
+                            messages=[{"role": "user", "content": prompt}]
+                        )
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        print(f"Analysis error: {str(e)}")
+                        self.stats['failed'] += 1
+                        self.stats['tokens'] -= reserved
+                        return None
+                    self.stats['retries'] += 1
+                    instrumentation.count('api_retries')
+                    delay = retry_after(e) or self.backoff * 2 ** attempt
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                    continue
+
+                instrumentation.count_usage(response)
+                usage = getattr(response, 'usage', None)
+                if usage is not None:
+                    self.stats['tokens'] += usage.input_tokens + usage.output_tokens - reserved
+                return "".join(getattr(block, 'text', str(block)) for block in response.content).strip()
@@ -1,30 +1,62 @@
-import anthropic
-import pandas as pd
 import os
 from datetime import datetime
-from dotenv import load_dotenv
+from document_retriever import DocumentRetriever, postings_path
+from document_store import open_documents
+from daemon import DaemonClient
+import instrumentation
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env when python-dotenv is installed
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
 
 class DocumentSearcher:
-    def __init__(self, csv_file="output/MERGED.csv"):
-        self.client = anthropic.Client(api_key=os.getenv('CLAUDE_API_KEY'))
+    def __init__(self, csv_file="output/MERGED.csv", context_tokens=3000):
+        self._client = None
       
-        # Load the CSV data
+        # Map the columnar store (built from the CSV when missing or stale)
         print("Loading document database...")
-        self.df = pd.read_csv(csv_file)
-        print(f"Loaded {len(self.df)} documents")
+        self.csv_file = csv_file
+        self.documents = open_documents(csv_file)
+        print(f"Loaded {len(self.documents)} documents")
+        
+        # Rows are indexed on the first search so each prompt only carries the relevant ones
+        self.context_tokens = context_tokens
+        self._retriever = None
+    
+    @property
+    def client(self):
+        if self._client is None:
+            import anthropic
+            self._client = anthropic.Client(api_key=os.getenv('CLAUDE_API_KEY'))
+        return self._client
+    
+    @property
+    def retriever(self):
+        if self._retriever is None:
+            # Postings persist next to the store and follow its modification time
+            source = getattr(self.documents, 'path', self.csv_file)
+            self._retriever = DocumentRetriever(self.documents, path=postings_path(self.csv_file),
+                                                version=str(os.path.getmtime(source)))
+        return self._retriever
         
     def search_with_claude(self, query):
         """Use Claude to search and analyze documents"""
         try:
-            # Convert relevant data to context
-            context = self.df.to_string()
+            # Retrieve the best-matching rows within the token budget
+            with instrumentation.stage('documents.retrieve'):
+                context, row_count = self.retriever.build_context(
+                    query, list(self.documents.columns), token_budget=self.context_tokens
+                )
+            if not row_count:
+                return "No matching documents found."
             
             # Construct the prompt
             prompt = f"""
-            You are a helpful document search assistant. Based on the following document database:
+            You are a helpful document search assistant. Based on the following {row_count} most relevant
+            documents from the document database (CSV):
             {context}
             
             Query: {query}
@@ -39,17 +71,19 @@ class DocumentSearcher:
             """
             
             # Get Claude's response
-            message = self.client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1024,
-                temperature=0,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            with instrumentation.stage('api.documents'):
+                message = self.client.messages.create(
+                    model="claude-3-5-haiku-20241022",
+                    max_tokens=1024,
+                    temperature=0,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ]
+                )
+            instrumentation.count_usage(message)
             
             return str(message.content)  # Convert content to string
             
@@ -60,9 +94,14 @@ def main():
     # Create output directory for search results
     os.makedirs('search_results', exist_ok=True)
     
-    # Initialize searcher
-    print("\nInitializing document searcher...")
-    searcher = DocumentSearcher()
+    # Use a running daemon's warm document store when there is one
+    client = DaemonClient()
+    if client.available():
+        print("\nConnected to document search daemon")
+        search = lambda query: client.documents(query)['answer']
+    else:
+        print("\nInitializing document searcher...")
+        search = DocumentSearcher().search_with_claude
     
     while True:
         # Get user query
@@ -73,7 +112,10 @@ def main():
             break
             
         print("\nSearching documents...")
-        result = searcher.search_with_claude(query)
+        try:
+            result = search(query)
+        except RuntimeError as e:
+            result = f"Error: {str(e)}"
         
         # Display results
         print("\nSearch Results:")
@@ -0,0 +1,222 @@
+import os
+import tempfile
+from typing import Dict, Any, List, Iterator, Optional, Callable
+import instrumentation
+
+# Outlook OlTableContents.olUserItems
+OL_USER_ITEMS = 0
+
+# Outlook OlAttachmentType.olByValue: a file stored in the item
+OL_BY_VALUE = 1
+
+DEFAULT_COLUMNS = [
+    "EntryID",
+    "Subject",
+    "SenderEmailAddress",
+    "ReceivedTime",
+    "LastModificationTime",
+    "MessageClass",
+    "ConversationID"
+]
+
+
+class TableReader:
+    """Bulk metadata reader built on Outlook's Folder.GetTable.
+
+    A Table returns many rows of explicit columns per cross-process call,
+    instead of one COM round trip per property per MailItem. Anything that
+    implements GetTable/Columns/GetArray/EndOfTable works, so FakeFolder
+    below can stand in for Outlook.
+    """
+
+    def __init__(self, folder, columns: List[str] = None, chunk_size: int = 500):
+        self.folder = folder
+        self.columns = list(columns or DEFAULT_COLUMNS)
+        self.chunk_size = chunk_size
+
+    def _open_table(self, filter_string: str = None, columns: List[str] = None):
+        table = self.folder.GetTable(filter_string or "", OL_USER_ITEMS)
+        table.Columns.RemoveAll()
+        for column in columns or self.columns:
+            table.Columns.Add(column)
+        table.Sort("[ReceivedTime]", True)
+        return table
+
+    def iter_rows(self, filter_string: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream rows as dicts, fetching chunk_size rows per GetArray call"""
+        table = self._open_table(filter_string)
+        while not table.EndOfTable:
+            with instrumentation.stage('com.table'):
+                chunk = table.GetArray(self.chunk_size)
+            if not chunk:
+                break
+            instrumentation.count('com_rows', len(chunk))
+            instrumentation.count('com_property_reads', len(chunk) * len(self.columns))
+            for values in chunk:
+                yield dict(zip(self.columns, values))
+
+    def iter_entry_ids(self, filter_string: str = None) -> Iterator[str]:
+        """Stream only the EntryID column"""
+        table = self._open_table(filter_string, columns=["EntryID"])
+        while not table.EndOfTable:
+            chunk = table.GetArray(self.chunk_size)
+            if not chunk:
+                break
+            for values in chunk:
+                yield values[0]
+
+    def count(self, filter_string: str = None) -> int:
+        return self._open_table(filter_string, columns=["EntryID"]).GetRowCount()
+
+
+class BodyLoader:
+    """Loads full MailItems by EntryID, only for rows whose body is needed"""
+
+    def __init__(self, namespace, store_id: str = None):
+        self.namespace = namespace
+        self.store_id = store_id
+        self._last = (None, None)
+
+    def _item(self, entry_id: str):
+        # Body and attachments of one row are read back to back, so keep the last item
+        if self._last[0] != entry_id:
+            if self.store_id:
+                item = self.namespace.GetItemFromID(entry_id, self.store_id)
+            else:
+                item = self.namespace.GetItemFromID(entry_id)
+            instrumentation.count('com_items_loaded')
+            self._last = (entry_id, item)
+        return self._last[1]
+
+    def get_body(self, entry_id: str) -> str:
+        try:
+            with instrumentation.stage('com.body'):
+                body = self._item(entry_id).Body or ""
+        except Exception:
+            return ""
+        instrumentation.count('com_property_reads')
+        instrumentation.count('body_chars', len(body))
+        return body
+
+    def get_attachments(self, entry_id: str, max_bytes: int = None) -> List[Dict[str, Any]]:
+        """Save an item's file attachments to a temporary folder and return their bytes"""
+        attachments = []
+        try:
+            item_attachments = self._item(entry_id).Attachments
+            if not item_attachments.Count:
+                return attachments
+            with instrumentation.stage('com.attachments'), tempfile.TemporaryDirectory() as folder:
+                for index in range(1, item_attachments.Count + 1):
+                    attachment = item_attachments.Item(index)
+                    if attachment.Type != OL_BY_VALUE or (max_bytes and attachment.Size > max_bytes):
+                        continue
+                    path = os.path.join(folder, f"{index}_{os.path.basename(attachment.FileName)}")
+                    attachment.SaveAsFile(path)
+                    with open(path, 'rb') as f:
+                        attachments.append({'filename': attachment.FileName, 'data': f.read()})
+                    instrumentation.count('attachment_bytes', len(attachments[-1]['data']))
+        except Exception:
+            pass
+        return attachments
+
+
+class FakeColumns:
+    """Minimal stand-in for Outlook.Columns"""
+
+    def __init__(self):
+        self.names = []
+
+    def RemoveAll(self):
+        self.names = []
+
+    def Add(self, name: str):
+        self.names.append(name)
+
+
+class FakeTable:
+    """In-memory stand-in for an Outlook.Table over a list of row dicts"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.position = 0
+        self.Columns = FakeColumns()
+        self.calls = 0
+
+    def Sort(self, sort_property: str, descending: bool = False):
+        name = sort_property.strip("[]")
+        self.rows = sorted(self.rows, key=lambda row: str(row.get(name) or ""), reverse=descending)
+
+    @property
+    def EndOfTable(self) -> bool:
+        return self.position >= len(self.rows)
+
+    def GetArray(self, max_rows: int):
+        self.calls += 1
+        chunk = self.rows[self.position:self.position + max_rows]
+        self.position += len(chunk)
+        return tuple(tuple(row.get(name) for name in self.Columns.names) for row in chunk)
+
+    def GetRowCount(self) -> int:
+        return len(self.rows)
+
+
+class FakeFolder:
+    """Folder/namespace stand-in serving FakeTables and items from row dicts.
+
+    Filters are recorded rather than evaluated, unless a predicate is given
+    to emulate the store-side restriction.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], folder_path: str = "\\\\Fake\\Inbox",
+                 predicate: Optional[Callable[[str, Dict[str, Any]], bool]] = None):
+        self.rows = rows
+        self.FolderPath = folder_path
+        self.predicate = predicate
+        self.filters = []
+        self.items_loaded = 0
+
+    def GetTable(self, filter_string: str = "", table_contents: int = OL_USER_ITEMS) -> FakeTable:
+        self.filters.append(filter_string)
+        rows = self.rows
+        if filter_string and self.predicate:
+            rows = [row for row in rows if self.predicate(filter_string, row)]
+        return FakeTable(rows)
+
+    def GetItemFromID(self, entry_id: str, store_id: str = None):
+        self.items_loaded += 1
+        for row in self.rows:
+            if row.get("EntryID") == entry_id:
+                return _FakeItem(row)
+        raise KeyError(entry_id)
+
+
+class _FakeItem:
+    def __init__(self, row: Dict[str, Any]):
+        self.Body = row.get("Body", "")
+        self.Attachments = _FakeAttachments(row.get("Attachments") or [])
+
+
+class _FakeAttachments:
+    """Outlook.Attachments over {'filename', 'data'} or {'filename', 'path'} dicts"""
+
+    def __init__(self, attachments: List[Dict[str, Any]]):
+        self.attachments = attachments
+        self.Count = len(attachments)
+
+    def Item(self, index: int):
+        return _FakeAttachment(self.attachments[index - 1])
+
+
+class _FakeAttachment:
+    def __init__(self, attachment: Dict[str, Any]):
+        self.FileName = attachment['filename']
+        self.Type = attachment.get('type', OL_BY_VALUE)
+        self.data = attachment.get('data')
+        if self.data is None:
+            with open(attachment['path'], 'rb') as f:
+                self.data = f.read()
+        self.Size = len(self.data)
+
+    def SaveAsFile(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.data)
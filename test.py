@@ -1,10 +1,10 @@
-import win32com.client
-import pythoncom
 import os
 from datetime import datetime
+from itertools import islice
 from typing import Dict, Any, List
 from config import (PROJECT_MAPPING, DOCUMENT_TYPES, 
                    REFERENCE_PATTERNS, DEPARTMENT_MAPPING)
+from classifier import get_classifier
 
 class OutlookDeepLook:
     def __init__(self):
@@ -18,6 +18,9 @@ class OutlookDeepLook:
         os.makedirs(self.results_dir, exist_ok=True)
         
         try:
+            # COM is only available on Windows, so import it when connecting
+            import pythoncom
+            import win32com.client
             pythoncom.CoInitialize()
             self.outlook = win32com.client.Dispatch("Outlook.Application")
             self.namespace = self.outlook.GetNamespace("MAPI")
@@ -30,39 +33,10 @@ class OutlookDeepLook:
     def search_emails(self, query: str, project_code: str = None, max_results: int = 50):
         """Search emails with correct Outlook filter syntax"""
         print(f"\nSearching for: '{query}'")
-        results = []
         
         try:
-            # Get all items first
-            messages = self.inbox.Items
-            messages.Sort("[ReceivedTime]", True)
-            
-            # Filter using simple string matching
-            count = 0
-            for message in messages:
-                if count >= max_results:
-                    break
-                    
-                try:
-                    # Check if query matches subject or body
-                    if (query.lower() in message.Subject.lower() or 
-                        (hasattr(message, 'Body') and query.lower() in message.Body.lower())):
-                        
-                        # Check project code if provided
-                        if project_code:
-                            if not any(alias.upper() in message.Subject.upper() 
-                                     for alias in PROJECT_MAPPING[project_code]['aliases']):
-                                continue
-                        
-                        # Process matching email
-                        email_data = self._process_email(message, project_code)
-                        if email_data:
-                            results.append(email_data)
-                            count += 1
-                            
-                except Exception as e:
-                    print(f"Warning: Error processing message: {str(e)}")
-                    continue
+            # Matches are produced lazily, so the scan stops at max_results
+            results = list(islice(self._iter_matches(query, project_code), max_results))
                     
             print(f"Found {len(results)} matching emails")
             return results
@@ -71,6 +45,32 @@ class OutlookDeepLook:
             print(f"Search error: {str(e)}")
             return []
 
+    def _iter_matches(self, query: str, project_code: str = None):
+        """Yield processed emails matching the query, newest first"""
+        messages = self.inbox.Items
+        messages.Sort("[ReceivedTime]", True)
+        
+        # Filter using simple string matching
+        for message in messages:
+            try:
+                # Check if query matches subject or body
+                if (query.lower() in message.Subject.lower() or 
+                    (hasattr(message, 'Body') and query.lower() in message.Body.lower())):
+                    
+                    # Check project code if provided
+                    if project_code:
+                        if not get_classifier().matches_project(message.Subject, project_code):
+                            continue
+                    
+                    # Process matching email
+                    email_data = self._process_email(message, project_code)
+                    if email_data:
+                        yield email_data
+                        
+            except Exception as e:
+                print(f"Warning: Error processing message: {str(e)}")
+                continue
+
     def _process_email(self, message, project_code: str = None) -> Dict[str, Any]:
         """Process email with document pattern recognition"""
         try:
@@ -84,21 +84,15 @@ class OutlookDeepLook:
             }
             
             # Identify project code
+            classifier = get_classifier()
+            subject = email_data['subject'] or ""
             if project_code and project_code in PROJECT_MAPPING:
                 email_data['project_code'] = project_code
             else:
-                for code, project in PROJECT_MAPPING.items():
-                    if any(alias.upper() in message.Subject.upper() 
-                          for alias in project['aliases']):
-                        email_data['project_code'] = code
-                        break
+                email_data['project_code'] = classifier.identify_project(subject)
             
             # Identify document type
-            for doc_type, patterns in DOCUMENT_TYPES.items():
-                if any(prefix.upper() in message.Subject.upper() 
-                      for prefix in patterns['prefixes']):
-                    email_data['document_type'] = doc_type
-                    break
+            email_data['document_type'] = classifier.identify_document_type(subject)
                     
             return email_data
             
@@ -145,6 +139,7 @@ def test_search():
     except Exception as e:
         print(f"Test error: {str(e)}")
     finally:
+        import pythoncom
         pythoncom.CoUninitialize()
 
 if __name__ == "__main__":
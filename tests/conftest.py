@@ -0,0 +1,19 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    """Run a test in a fixed zone east of UTC, so local/UTC mix-ups show"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip("time.tzset is not available on this platform")
+    monkeypatch.setenv('TZ', 'Asia/Dubai')
+    time.tzset()
+    yield 'Asia/Dubai'
+    monkeypatch.undo()
+    time.tzset()
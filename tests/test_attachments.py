@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+import attachments
+from attachments import AttachmentPipeline, extract_text
+
+
+def docx(text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr("word/document.xml", f"<w:document><w:p><w:t>{text}</w:t></w:p></w:document>")
+        archive.writestr("word/styles.xml", "<w:styles>ignored</w:styles>")
+    return buffer.getvalue()
+
+
+def counting_extract(monkeypatch):
+    calls = []
+    extract = attachments._extract_task
+
+    def counted(task):
+        calls.append(task[0])
+        return extract(task)
+    monkeypatch.setattr(attachments, '_extract_task', counted)
+    return calls
+
+
+def test_extract_text_by_format():
+    assert extract_text("notes.txt", b"site visit") == "site visit"
+    assert extract_text("mail.html", b"<p>Payment &amp; certificate</p><p>due</p>") == "Payment & certificate\ndue"
+    assert extract_text("letter.docx", docx("Letter 340PD-2017")) == "Letter 340PD-2017"
+    assert extract_text("broken.docx", b"not a zip") == ""
+    assert extract_text("image.png", b"\x89PNG") == ""
+    assert extract_text("long.txt", b"x" * 50, max_chars=10) == "x" * 10
+
+
+def test_identical_content_is_extracted_once(tmp_path, monkeypatch):
+    calls = counting_extract(monkeypatch)
+    cache_path = str(tmp_path / "attachments.db")
+    pipeline = AttachmentPipeline(cache_path, max_workers=1)
+    texts = pipeline.extract_many([
+        {'filename': "a.txt", 'data': b"same text"},
+        {'filename': "b.txt", 'data': b"same text"},
+        {'filename': "c.txt", 'data': b"other text"},
+    ])
+    assert texts == ["same text", "same text", "other text"]
+    assert len(calls) == 2
+
+    # A later run, or a renamed copy, is answered from the cache by content hash
+    again = AttachmentPipeline(cache_path, max_workers=1)
+    assert again.extract_many([{'filename': "renamed.txt", 'data': b"same text"}]) == ["same text"]
+    assert len(calls) == 2
+
+
+def test_oversized_and_missing_attachments_are_skipped(tmp_path, monkeypatch):
+    calls = counting_extract(monkeypatch)
+    pipeline = AttachmentPipeline(max_workers=1, max_bytes=8)
+    texts = pipeline.extract_many([
+        {'filename': "big.txt", 'data': b"far too long"},
+        {'filename': "gone.txt", 'path': str(tmp_path / "missing.txt")},
+    ])
+    assert texts == ["", ""]
+    assert calls == []
+
+
+def test_message_texts_join_names_and_text():
+    pipeline = AttachmentPipeline(max_workers=1)
+    texts = pipeline.message_texts([
+        {'attachments': [{'filename': "a.txt", 'data': b"alpha"}, {'filename': "b.png", 'data': b"\x89PNG"}]},
+        {'attachments': []},
+    ])
+    assert texts == ["a.txt\nalpha\n\nb.png", ""]
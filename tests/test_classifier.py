@@ -0,0 +1,65 @@
+import random
+
+from classifier import TermMatcher, TextClassifier
+from config import PROJECT_MAPPING, DOCUMENT_TYPES
+
+
+def linear_project(text, mapping=PROJECT_MAPPING):
+    """The nested-loop scan the matcher replaced: codes first, then aliases"""
+    text = text.upper()
+    for code in mapping:
+        if code in text:
+            return code
+    for code, project in mapping.items():
+        for alias in project['aliases']:
+            if alias.upper() in text:
+                return code
+    return None
+
+
+def linear_document_type(text):
+    text = text.upper()
+    for doc_type, patterns in DOCUMENT_TYPES.items():
+        for prefix in patterns['prefixes']:
+            if prefix.upper() in text:
+                return doc_type
+    return None
+
+
+def texts(seed=0, count=500):
+    terms = list(PROJECT_MAPPING)
+    for project in PROJECT_MAPPING.values():
+        terms.extend(project['aliases'])
+    for patterns in DOCUMENT_TYPES.values():
+        terms.extend(patterns['prefixes'])
+    words = ["site", "payment", "re:", "fw", "villa", "2024", "-", "_"]
+    rng = random.Random(seed)
+    for _ in range(count):
+        parts = rng.sample(terms, rng.randint(0, 3)) + rng.sample(words, rng.randint(0, 4))
+        rng.shuffle(parts)
+        yield rng.choice([" ", "", "-"]).join(parts)
+
+
+def test_matches_the_linear_scan():
+    classifier = TextClassifier()
+    for text in texts():
+        assert classifier.identify_project(text) == linear_project(text), text
+        assert classifier.identify_document_type(text) == linear_document_type(text), text
+
+
+def test_codes_take_precedence_over_earlier_aliases():
+    mapping = {
+        'PD01': {'name': "One", 'aliases': ["HARBOUR"]},
+        'PD02': {'name': "Two", 'aliases': ["HARBOUR VIEW"]},
+    }
+    classifier = TextClassifier(project_mapping=mapping, department_mapping={}, document_types={})
+    for text in ["harbour view PD02", "PD02 harbour", "Harbour View tower", "nothing"]:
+        assert classifier.identify_project(text) == linear_project(text, mapping)
+
+
+def test_whole_words_and_prefix_ranks():
+    matcher = TermMatcher([("AB", 1), ("ABC", 2), ("ABCD", 3)], whole_words=True)
+    assert matcher.first("XABC ABCD") == 3
+    assert matcher.first("AB-CD") == 1
+    assert matcher.find_all("ABCD ABC AB") == [1, 2, 3]
+    assert TermMatcher([("ABC", 1), ("AB", 2)]).first("ABCD") == 1
@@ -0,0 +1,55 @@
+from clustering import ResultClusterer, normalize_subject
+
+
+def result(entry_id, subject, conversation_id="", body=""):
+    return {'entry_id': entry_id, 'subject': subject, 'conversation_id': conversation_id, 'body': body}
+
+
+def test_normalize_subject_strips_reply_prefixes():
+    assert normalize_subject("RE: Fw:  [EXT] Payment   Certificate") == "payment certificate"
+
+
+def test_same_conversation_merges():
+    clusters = ResultClusterer().collapse([
+        result("a", "Payment certificate", "conv-1"),
+        result("b", "RE: Payment certificate no. 4", "conv-1")
+    ])
+    assert len(clusters) == 1
+    assert clusters[0]['cluster_size'] == 2
+    assert clusters[0]['duplicates'] == ["b"]
+
+
+def test_same_subject_in_different_conversations_stays_apart():
+    clusters = ResultClusterer().collapse([
+        result("a", "Payment certificate", "conv-1", "Certificate for the north tower works."),
+        result("b", "RE: Payment certificate", "conv-2", "Invoice for landscaping at the villa plot.")
+    ])
+    assert [c['entry_id'] for c in clusters] == ["a", "b"]
+
+
+def test_subject_is_the_fallback_without_conversation_id():
+    clusters = ResultClusterer().collapse([
+        result("a", "Payment certificate", "conv-1"),
+        result("b", "FW: Payment certificate"),
+        result("c", "Site handover")
+    ])
+    assert [c['entry_id'] for c in clusters] == ["a", "c"]
+    assert clusters[0]['duplicates'] == ["b"]
+
+
+def test_near_identical_bodies_merge_across_conversations():
+    body = "Please find attached the revised schedule for your review and approval before the next site meeting."
+    clusters = ResultClusterer().collapse([
+        result("a", "Schedule", "conv-1", body),
+        result("b", "Revised schedule", "conv-2", body + " Regards")
+    ])
+    assert len(clusters) == 1
+
+
+def test_iter_collapsed_yields_only_new_clusters():
+    clusterer = ResultClusterer()
+    yielded = list(clusterer.iter_collapsed([
+        result("a", "One", "conv-1"), result("b", "Two", "conv-2"), result("c", "One", "conv-1")
+    ]))
+    assert [r['entry_id'] for r in yielded] == ["a", "b"]
+    assert clusterer.clusters()[0]['cluster_size'] == 2
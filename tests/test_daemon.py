@@ -0,0 +1,46 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from daemon import DeepLookDaemon, Worker
+
+
+class ThreadBoundIndex:
+    """Index that, like a SQLite connection, only works on its creating thread"""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.rows = 3
+
+    def count(self):
+        assert threading.get_ident() == self.thread
+        return self.rows
+
+
+def test_worker_status_is_refreshed_on_its_thread():
+    worker = Worker("mail", lambda: SimpleNamespace(index=ThreadBoundIndex()),
+                    status=lambda searcher: {'indexed': searcher.index.count()})
+    worker.ready.wait(5)
+    assert worker.status == {'indexed': 3}
+
+    def add_rows(searcher, deadline):
+        searcher.index.rows += 2
+    worker.submit(add_rows, 5).result(5)
+    worker.stop()
+    assert worker.status == {'indexed': 5}
+
+
+def test_health_reads_cached_counts():
+    daemon = DeepLookDaemon.__new__(DeepLookDaemon)
+    daemon.started = time.time()
+    daemon.mail = Worker("mail", lambda: SimpleNamespace(index=ThreadBoundIndex()),
+                         status=lambda searcher: {'indexed': searcher.index.count()})
+    daemon.documents = Worker("documents", lambda: None)
+    daemon.mail.ready.wait(5)
+    daemon.documents.ready.wait(5)
+
+    health = daemon.health()
+    assert health['status'] == 'ok'
+    assert health['indexed'] == 3 and health['documents'] == 0
+    daemon.mail.stop()
+    daemon.documents.stop()
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+from dasl import SUBJECT, BODY, RECEIVED, quote, like, format_date, compile_conditions, compile_filter
+
+
+def test_quote_doubles_single_quotes():
+    assert quote("O'Brien's") == "'O''Brien''s'"
+
+
+def test_like_escapes_wildcards():
+    assert like(SUBJECT, "50%_[draft]") == f"\"{SUBJECT}\" LIKE '%50[%][_][[]draft]%'"
+
+
+def test_keywords_search_subject_and_body():
+    conditions, residual = compile_conditions({'keywords': ["payment", "it's"]})
+    assert conditions == [
+        f"(\"{SUBJECT}\" LIKE '%payment%' OR \"{BODY}\" LIKE '%payment%'"
+        f" OR \"{SUBJECT}\" LIKE '%it''s%' OR \"{BODY}\" LIKE '%it''s%')"
+    ]
+    assert residual == {}
+
+
+def test_dates_are_converted_to_utc(local_timezone):
+    # Midnight in Dubai (UTC+4) is 8 PM UTC the day before
+    assert format_date("2024-03-01") == "02/29/2024 08:00 PM"
+    assert format_date(datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)) == "03/01/2024 12:00 PM"
+
+
+def test_date_range(local_timezone):
+    conditions, _ = compile_conditions({'date_from': "2024-03-01", 'date_to': "2024-03-31"})
+    assert conditions == [
+        f"\"{RECEIVED}\" >= '02/29/2024 08:00 PM'",
+        # A bare end date covers that whole local day
+        f"\"{RECEIVED}\" < '03/31/2024 08:00 PM'"
+    ]
+    conditions, _ = compile_conditions({'date_to': "2024-03-31 17:30:00"})
+    assert conditions == [f"\"{RECEIVED}\" <= '03/31/2024 01:30 PM'"]
+
+
+def test_project_and_type_stay_residual():
+    conditions, residual = compile_conditions({'project_code': "PD031", 'doc_type': "Letter"})
+    assert len(conditions) == 2
+    assert residual == {'project_code': "PD031", 'doc_type': "Letter"}
+
+
+def test_empty_filter():
+    assert compile_filter({}) == ("", {})
+    assert compile_filter({'keywords': ["x"]})[0].startswith("@SQL=")
@@ -0,0 +1,72 @@
+import os
+import random
+
+import pytest
+
+from dedup import MODES, make_deduper, unique
+from parser import DocumentParser
+
+
+def options(mode, tmp_path):
+    if mode == 'disk':
+        return {'path': str(tmp_path / "dedup.db")}
+    if mode == 'bloom':
+        return {'capacity': 10000, 'error_rate': 1e-9}
+    return {}
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_backends_keep_the_same_rows(mode, tmp_path):
+    rng = random.Random(0)
+    keys = [f"DOC-{rng.randrange(3000):05d}_{rng.randrange(3)}" for _ in range(5000)]
+    expected = list(dict.fromkeys(keys))
+    deduper = make_deduper(mode, **options(mode, tmp_path))
+    assert list(unique(keys, key=lambda k: k, deduper=deduper)) == expected
+    assert len(deduper) == len(expected)
+    assert all(key in deduper for key in expected)
+    deduper.close()
+
+
+def test_disk_store_starts_empty_each_run(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    first = make_deduper('disk', path=path)
+    assert first.add("a") and not first.add("a")
+    first.close()
+    second = make_deduper('disk', path=path)
+    assert second.add("a")
+    second.close()
+
+
+@pytest.mark.parametrize('mode', ['set', 'disk'])
+def test_parser_reruns_write_the_same_outputs(mode, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("input.txt", 'w', encoding='utf-8') as f:
+        f.write("File Name\tDocument ID\tDate\tDescription\n")
+        f.write("LTR-PD031-001.pdf\t00000001\t01/01/2024\tLetter PD031\n")
+        f.write("LTR-PD031-001.pdf\t00000001\t01/01/2024\tLetter PD031\n")
+        f.write("MISC-002.pdf\t00000002\t02/01/2024\tOther\n")
+
+    outputs = []
+    for _ in range(2):
+        assert DocumentParser(dedup=mode).process_file("input.txt", streaming=True)
+        with open(os.path.join("output", "MERGED.csv"), encoding='utf-8') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0].splitlines()) == 3
+
+
+def test_persistent_disk_store_dedups_across_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batches = [
+        ["LTR-PD031-001.pdf\t00000001\t01/01/2024\tLetter PD031"],
+        ["LTR-PD031-001.pdf\t00000001\t01/01/2024\tLetter PD031", "MISC-002.pdf\t00000002\t02/01/2024\tOther"],
+    ]
+    outputs = []
+    for lines in batches:
+        with open("input.txt", 'w', encoding='utf-8') as f:
+            f.write("File Name\tDocument ID\tDate\tDescription\n" + "\n".join(lines) + "\n")
+        assert DocumentParser(dedup='disk:persist').process_file("input.txt", streaming=True)
+        with open(os.path.join("output", "MERGED.csv"), encoding='utf-8') as f:
+            outputs.append(f.read().splitlines()[1:])
+    assert [row.split(",")[0] for row in outputs[0]] == ["LTR-PD031-001.pdf"]
+    assert [row.split(",")[0] for row in outputs[1]] == ["MISC-002.pdf"]
@@ -0,0 +1,60 @@
+import csv
+
+import pytest
+
+from document_retriever import DocumentRetriever, postings_path
+
+
+def rows():
+    return [
+        {'File_Name': "LTR-PD031-001.pdf", 'Document_ID': "00000001", 'Project_Code': "PD031",
+         'Project_Name': "Harbour"},
+        {'File_Name': "MIN-PD031-meeting.pdf", 'Document_ID': "00000002", 'Project_Code': "PD031",
+         'Project_Name': "Harbour"},
+        {'File_Name': "INV-PD045-payment.pdf", 'Document_ID': "00000003", 'Project_Code': "PD045",
+         'Project_Name': None},
+    ]
+
+
+def test_search_ranks_rows_sharing_tokens():
+    retriever = DocumentRetriever(rows())
+    found = [row['Document_ID'] for _, row in retriever.search("meeting minutes PD031")]
+    assert found == ["00000002", "00000001"]
+    assert retriever.search("nothing here") == []
+
+
+def test_postings_persist_until_version_changes(tmp_path):
+    path = str(tmp_path / "MERGED.postings.db")
+    DocumentRetriever(rows(), path=path, version="1").close()
+
+    changed = rows()
+    changed[2]['File_Name'] = "INV-PD045-meeting.pdf"
+
+    # Same version: the stored postings are reused, not rebuilt from the rows
+    reused = DocumentRetriever(changed, path=path, version="1")
+    assert [row['Document_ID'] for _, row in reused.search("meeting")] == ["00000002"]
+    reused.close()
+
+    rebuilt = DocumentRetriever(changed, path=path, version="2")
+    assert {row['Document_ID'] for _, row in rebuilt.search("meeting")} == {"00000002", "00000003"}
+
+
+def test_arrow_store_reads_only_weighted_columns(tmp_path):
+    pytest.importorskip("pyarrow")
+    from document_store import write_store, DocumentStore
+
+    csv_file = str(tmp_path / "MERGED.csv")
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['File_Name', 'Document_ID', 'Project_Code', 'Description'])
+        writer.writeheader()
+        for row in rows():
+            writer.writerow({'File_Name': row['File_Name'], 'Document_ID': row['Document_ID'],
+                             'Project_Code': row['Project_Code'], 'Description': "meeting"})
+    write_store(csv_file, str(tmp_path / "MERGED.arrow"))
+    store = DocumentStore(str(tmp_path / "MERGED.arrow"))
+
+    retriever = DocumentRetriever(store, path=postings_path(csv_file))
+    score, row = retriever.search("payment")[0]
+    assert row['Document_ID'] == "00000003" and row['Description'] == "meeting"
+    assert score > 0
+    store.close()
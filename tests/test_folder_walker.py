@@ -0,0 +1,85 @@
+import threading
+
+from folder_walker import FolderWalker, InMemoryProvider
+from mail_index import MailIndex
+
+
+def folder(name, count):
+    # Newest first, as Outlook folder tables are read
+    return [{'entry_id': f"{name}-{i}", 'subject': f"{name} {i}", 'received': f"2024-01-{28 - i:02d} 09:00:00"}
+            for i in range(count)]
+
+
+def test_search_stops_each_folder_at_the_limit():
+    walker = FolderWalker(InMemoryProvider({'Inbox': folder("inbox", 20), 'Sent': folder("sent", 20)}))
+    read = []
+
+    def scan(source):
+        for message in source.iter_messages():
+            read.append(message['entry_id'])
+            yield message
+
+    hits = walker.search(scan, limit=3)
+    assert [hit['received'][:10] for hit in hits] == ["2024-01-28", "2024-01-28", "2024-01-27"]
+    assert len(read) == 6
+
+
+def test_search_without_limit_merges_everything_newest_first():
+    walker = FolderWalker(InMemoryProvider({'Inbox': folder("inbox", 5), 'Sent': folder("sent", 3)}))
+    hits = walker.search(lambda source: source.iter_messages())
+    assert len(hits) == 8
+    assert [hit['received'] for hit in hits] == sorted((hit['received'] for hit in hits), reverse=True)
+
+
+class CountingProvider(InMemoryProvider):
+    """Records thread setup and teardown, and every message read"""
+
+    def __init__(self, folders):
+        super().__init__(folders)
+        self.inits = []
+        self.closes = []
+        self.read = 0
+
+    def thread_init(self):
+        self.inits.append(threading.get_ident())
+
+    def thread_close(self):
+        self.closes.append(threading.get_ident())
+
+    def open_source(self, folder):
+        source = super().open_source(folder)
+        messages = source.iter_messages
+
+        def counted(*args, **kwargs):
+            for message in messages(*args, **kwargs):
+                # Only the incremental read, not count() or EntryID sweeps
+                self.read += 'since' in kwargs
+                yield message
+        source.iter_messages = counted
+        return source
+
+
+def test_threads_set_up_the_provider_once():
+    provider = CountingProvider({f"Folder {i}": folder(f"f{i}", 2) for i in range(30)})
+    results = FolderWalker(provider, max_workers=3).map_folders(lambda source: len(list(source.iter_messages())))
+    assert len(results) == 30
+    assert len(provider.inits) <= 3
+    assert sorted(provider.inits) == sorted(provider.closes)
+
+
+def test_sync_folders_streams_batches_to_the_writer(tmp_path):
+    provider = CountingProvider({f"Folder {i}": folder(f"f{i}", 25) for i in range(4)})
+    index = MailIndex(str(tmp_path / "index.db"))
+    unwritten = []
+    add_messages = index.add_messages
+
+    def add(messages, **kwargs):
+        written = index.count()
+        unwritten.append(provider.read - written)
+        return add_messages(messages, **kwargs)
+    index.add_messages = add
+
+    assert index.sync_folders(FolderWalker(provider, max_workers=2), batch_size=5, max_batches=2)['added'] == 100
+    assert index.count() == 100
+    assert max(unwritten) <= 2 * 5 + 2 * 5 + 5 + 2
+    assert index.get_meta("watermark:memory:Folder 0") == "2024-01-28 09:00:00"
@@ -0,0 +1,98 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def totals_off():
+    instrumentation.enable(False)
+    instrumentation.TOTALS.reset()
+    yield
+    instrumentation.enable(False)
+    instrumentation.TOTALS.reset()
+
+
+def test_hooks_are_no_ops_when_disabled():
+    assert instrumentation.stage('query') is instrumentation.stage('other')
+    with instrumentation.stage('query'):
+        instrumentation.count('items_scanned')
+    items = [1, 2]
+    assert list(instrumentation.timed_iter('source', items)) == items
+
+    @instrumentation.timed('match')
+    def match(value):
+        return value * 2
+    assert match(3) == 6
+    assert instrumentation.TOTALS.to_dict() == {'stages': {}, 'counters': {}}
+
+
+def test_enabled_totals_collect_stages_and_counters():
+    instrumentation.enable()
+    with instrumentation.stage('query'):
+        instrumentation.count('items_scanned', 3)
+    list(instrumentation.timed_iter('source', range(2)))
+    instrumentation.count_usage(SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=4)))
+
+    data = instrumentation.TOTALS.to_dict()
+    assert data['stages']['query']['calls'] == 1
+    # Two items plus the final, empty pull
+    assert data['stages']['source']['calls'] == 3
+    assert data['counters'] == {'items_scanned': 3, 'api_requests': 1, 'api_input_tokens': 10,
+                                'api_output_tokens': 4}
+
+
+def test_captures_see_only_their_own_thread():
+    seen = {}
+
+    def other():
+        with instrumentation.capture() as metrics:
+            instrumentation.count('other')
+            started.wait(5)
+        seen['other'] = metrics.to_dict()['counters']
+
+    started = threading.Event()
+    thread = threading.Thread(target=other)
+    with instrumentation.capture() as metrics:
+        thread.start()
+        instrumentation.count('mine')
+        started.set()
+        thread.join()
+
+    assert metrics.to_dict()['counters'] == {'mine': 1}
+    assert seen['other'] == {'other': 1}
+    assert 'total' in metrics.to_dict()['stages']
+    # Nothing leaks into the process-wide totals while they are off
+    assert instrumentation.TOTALS.to_dict()['counters'] == {}
+
+
+def test_nested_captures_both_collect():
+    with instrumentation.capture() as outer:
+        with instrumentation.capture() as inner:
+            instrumentation.count('rows', 2)
+        instrumentation.count('rows')
+    assert inner.to_dict()['counters'] == {'rows': 2}
+    assert outer.to_dict()['counters'] == {'rows': 3}
+
+
+def test_unknown_profiler_is_reported_not_raised():
+    with instrumentation.capture(profile='nope') as metrics:
+        pass
+    assert "Unknown profiler" in metrics.profile
+
+
+def test_prometheus_output():
+    instrumentation.enable()
+    with instrumentation.stage('search.index'):
+        pass
+    instrumentation.count('com_rows', 500)
+
+    text = instrumentation.export('prometheus')
+    assert '# TYPE deeplook_stage_seconds_total counter' in text
+    assert 'deeplook_stage_calls_total{stage="search.index"} 1' in text
+    assert 'deeplook_com_rows_total 500' in text
+    assert text.endswith("\n")
+    with pytest.raises(ValueError):
+        instrumentation.export('xml')
@@ -0,0 +1,77 @@
+import re
+from datetime import datetime, timezone
+
+from mail_index import MailIndex
+from mailbox_source import OutlookSource
+from table_reader import FakeFolder
+
+
+def row(entry_id, modified, subject="Payment certificate"):
+    return {
+        'EntryID': entry_id,
+        'Subject': subject,
+        'SenderEmailAddress': "site@example.com",
+        'ReceivedTime': modified,
+        'LastModificationTime': modified,
+        'MessageClass': "IPM.Note",
+        'ConversationID': entry_id,
+        'Body': f"Body of {entry_id}"
+    }
+
+
+def modified_after(filter_string, values):
+    """Evaluate the DAV:getlastmodified condition the way the store does, in UTC"""
+    match = re.search(r'"DAV:getlastmodified" > \'([^\']+)\'', filter_string)
+    if not match:
+        return True
+    watermark = datetime.strptime(match.group(1), "%m/%d/%Y %I:%M %p")
+    modified = datetime.strptime(values['LastModificationTime'], "%Y-%m-%d %H:%M:%S")
+    return modified.astimezone(timezone.utc).replace(tzinfo=None) > watermark
+
+
+def test_watermark_filter_is_utc(local_timezone):
+    folder = FakeFolder([])
+    list(OutlookSource(folder, folder).iter_messages(since="2024-03-01 12:30:00"))
+    # 12:29 in Dubai (UTC+4) is 08:29 UTC
+    assert "\"DAV:getlastmodified\" > '03/01/2024 08:29 AM'" in folder.filters[-1]
+
+
+def test_sync_picks_up_only_changes(tmp_path, local_timezone):
+    rows = [row("a", "2024-03-01 09:00:00"), row("b", "2024-03-01 10:00:00")]
+    folder = FakeFolder(rows, predicate=modified_after)
+    source = OutlookSource(folder, folder)
+    index = MailIndex(str(tmp_path / "index.db"))
+    assert index.build(source) == 2
+
+    # An edit an hour after the watermark, well inside the UTC offset
+    rows.append(row("c", "2024-03-01 11:00:00"))
+    rows[0].update(row("a", "2024-03-01 11:30:00", subject="Payment certificate (revised)"))
+    index.sync(source)
+    assert index.get("c") is not None
+    assert index.get("a")['subject'] == "Payment certificate (revised)"
+    assert index.count() == 3
+
+    # Nothing changed since: only the one-minute overlap is re-read
+    assert index.sync(source)['added'] <= 1
+    index.close()
+
+
+def eml_with_attachment(folder):
+    from email.message import EmailMessage
+    msg = EmailMessage()
+    msg['Subject'] = "Drawing transmittal"
+    msg['Message-ID'] = "<drawing@example.com>"
+    msg['Date'] = "Fri, 01 Mar 2024 09:00:00 +0000"
+    msg.set_content("See attached")
+    msg.add_attachment(b"%PDF-1.4 drawing", maintype='application', subtype='pdf', filename="drawing.pdf")
+    (folder / "drawing.eml").write_bytes(bytes(msg))
+
+
+def test_eml_attachments_are_opt_in(tmp_path):
+    from backends import open_backend
+    eml_with_attachment(tmp_path)
+
+    skipped = next(open_backend('eml', path=str(tmp_path)).source.iter_messages())
+    assert skipped['attachments'] == []
+    loaded = next(open_backend('eml', path=str(tmp_path), attachments=True).source.iter_messages())
+    assert loaded['attachments'] == [{'filename': "drawing.pdf", 'data': b"%PDF-1.4 drawing"}]
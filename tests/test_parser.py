@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from parser import DocumentParser, imap_bounded
+
+
+class CountingPool(ThreadPoolExecutor):
+    """Executor recording how many submitted tasks were not yet consumed"""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.outstanding = 0
+        self.most_outstanding = 0
+
+    def submit(self, func, *args):
+        self.outstanding += 1
+        self.most_outstanding = max(self.most_outstanding, self.outstanding)
+        return super().submit(func, *args)
+
+
+def test_imap_bounded_keeps_order_and_bound():
+    with CountingPool() as pool:
+        results = []
+        for value in imap_bounded(pool, lambda x: x * x, range(50), 3):
+            pool.outstanding -= 1
+            results.append(value)
+    assert results == [x * x for x in range(50)]
+    assert pool.most_outstanding == 3
+
+
+def test_parallel_matches_streaming(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("input.txt", 'w', encoding='utf-8') as f:
+        f.write("File Name\tDocument ID\tDate\tDescription\n")
+        for i in range(200):
+            f.write(f"LTR-PD031-{i % 150:03d}.pdf\t{i % 150:08d}\t01/01/2024\tLetter PD031\n")
+
+    outputs = []
+    for mode in ({'streaming': True}, {'parallel': True, 'workers': 2}):
+        assert DocumentParser().process_file("input.txt", **mode)
+        with open(os.path.join("output", "MERGED.csv"), encoding='utf-8') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0].splitlines()) == 151
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from query_analyzer import QueryAnalyzer, QueryCache, normalize_query
+
+
+class StubClient:
+    """Synchronous messages.create returning a fixed text, or raising"""
+
+    def __init__(self, text=None, error=None):
+        self.text = text
+        self.error = error
+        self.calls = 0
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(content=[SimpleNamespace(text=self.text)], usage=None)
+
+
+CLAUDE_ANSWER = '[{"keywords": ["payment"], "project_code": null, "doc_type": "Letter", "date_from": null, "date_to": null}]'
+
+
+def test_claude_answers_are_cached(tmp_path):
+    client = StubClient(CLAUDE_ANSWER)
+    analyzer = QueryAnalyzer(client=client, cache_path=str(tmp_path / "cache.db"))
+    first = analyzer.analyze("Letters about payment")
+    second = analyzer.analyze("letters about PAYMENT?")
+    assert first == second
+    assert first['doc_type'] == "Letter"
+    assert client.calls == 1
+
+    # The answer survives a restart through the SQLite cache
+    restarted = QueryAnalyzer(client=StubClient(error=RuntimeError("offline")), cache_path=str(tmp_path / "cache.db"))
+    assert restarted.analyze("Letters about payment") == first
+
+
+def test_callers_cannot_change_cached_params(tmp_path):
+    analyzer = QueryAnalyzer(client=StubClient(CLAUDE_ANSWER), cache_path=str(tmp_path / "cache.db"))
+    analyzer.analyze("Letters about payment")['keywords'].append("invoice")
+    assert analyzer.analyze("Letters about payment")['keywords'] == ["payment"]
+
+
+def test_fallback_is_not_cached(tmp_path):
+    cache_path = str(tmp_path / "cache.db")
+    offline = QueryAnalyzer(client=StubClient(error=RuntimeError("overloaded")), cache_path=cache_path)
+    params = offline.analyze("Letters about payment")
+    assert params['keywords'] == ["letters", "payment"]
+    assert offline.cache.get(normalize_query("Letters about payment")) is None
+
+    # A later session with a working API still asks Claude
+    client = StubClient(CLAUDE_ANSWER)
+    assert QueryAnalyzer(client=client, cache_path=cache_path).analyze("Letters about payment")['keywords'] == ["payment"]
+    assert client.calls == 1
+
+
+def test_rule_based_mode_never_touches_the_cache(tmp_path):
+    analyzer = QueryAnalyzer(use_claude=False, cache_path=str(tmp_path / "cache.db"))
+    assert analyzer.analyze("payment 2023")['date_from'] == "2023-01-01"
+    assert analyzer.cache.get(normalize_query("payment 2023")) is None
+
+
+def test_results_do_not_depend_on_the_cache_keeping_them():
+    # ttl=0 expires every entry at once, and the LRU holds a single query
+    analyzer = QueryAnalyzer(client=StubClient('[{"keywords": ["a"]}, {"keywords": ["b"]}]'), ttl=0, max_entries=1)
+    results = analyzer.analyze_batch(["first query", "second query", "first query"])
+    assert [r['keywords'] for r in results] == [["a"], ["b"], ["a"]]
+
+
+def test_invalid_answers_fall_back_per_query():
+    analyzer = QueryAnalyzer(client=StubClient('[{"keywords": 5}, {"keywords": ["ok"]}]'))
+    first, second = analyzer.analyze_batch(["payment certificate", "anything"])
+    assert first['keywords'] == ["payment", "certificate"]
+    assert second['keywords'] == ["ok"]
+
+
+def test_cache_ttl(tmp_path):
+    cache = QueryCache(str(tmp_path / "cache.db"), ttl=0)
+    cache.put("k", {'keywords': ["x"]})
+    assert cache.get("k") is None
@@ -0,0 +1,58 @@
+import pytest
+
+from config import PROJECT_MAPPING
+from mail_index import MailIndex
+from ranking import BM25Ranker, fuse_rankings
+
+PROJECT = next(iter(PROJECT_MAPPING))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = MailIndex(str(tmp_path / "index.db"))
+    index.add_messages([
+        {'entry_id': "body", 'subject': "Site visit", 'body': "payment certificate attached",
+         'received': "2024-03-01 09:00:00"},
+        {'entry_id': "subject", 'subject': "Payment certificate", 'body': "site visit notes",
+         'received': "2024-01-01 09:00:00"},
+        {'entry_id': "old", 'subject': "Weekly drawing register", 'body': "no changes",
+         'received': "2023-01-01 09:00:00"},
+        {'entry_id': "new", 'subject': "Weekly drawing register", 'body': "no changes",
+         'received': "2024-02-01 09:00:00"},
+        {'entry_id': "project", 'subject': f"{PROJECT} drawing register", 'body': "weekly",
+         'received': "2022-01-01 09:00:00"},
+    ])
+    yield index
+    index.close()
+
+
+def test_subject_matches_outrank_body_matches(index):
+    hits = BM25Ranker(index).search({'keywords': ["payment certificate"]})
+    assert [hit['entry_id'] for hit in hits] == ["subject", "body"]
+    assert hits[0]['score'] > hits[1]['score']
+
+
+def test_equal_scores_prefer_newer_mail(index):
+    hits = BM25Ranker(index, project_boost=0).search({'keywords': ["weekly"]}, k=2)
+    assert [hit['entry_id'] for hit in hits] == ["new", "old"]
+
+
+def test_project_boost_is_added(index):
+    ranker = BM25Ranker(index)
+    plain = {hit['entry_id']: hit['score'] for hit in ranker.search({'keywords': ["drawing"]})}
+    boosted = {hit['entry_id']: hit['score'] for hit in ranker.search({'keywords': ["drawing"], 'project_code': PROJECT})}
+    assert boosted['project'] == pytest.approx(plain['project'] + ranker.project_boost, abs=1e-3)
+    assert boosted['new'] == plain['new']
+
+
+def test_without_keywords_falls_back_to_newest_first(index):
+    hits = BM25Ranker(index).search({'keywords': [], 'date_from': "2024-01-01"}, k=2)
+    assert [hit['entry_id'] for hit in hits] == ["body", "new"]
+
+
+def test_fusion_sums_reciprocal_ranks():
+    a = [{'entry_id': "x"}, {'entry_id': "y"}, {'entry_id': "z"}]
+    b = [{'entry_id': "y"}, {'entry_id': "z", 'score': 1.0}]
+    fused = fuse_rankings([a, b], k=2)
+    assert [result['entry_id'] for result in fused] == ["y", "z"]
+    assert fused[1]['score'] == 1.0
@@ -0,0 +1,82 @@
+import sqlite3
+from types import SimpleNamespace
+
+from mail_index import MailIndex
+from mailbox_source import InMemorySource
+from outlook_deeplook import OutlookDeepLook
+from reference_graph import ReferenceGraph, EMAIL
+
+
+def linked_graph(length):
+    """Emails e0..e{length-1}, each citing its own reference and the next one"""
+    graph = ReferenceGraph(sqlite3.connect(":memory:"))
+    for i in range(length):
+        graph.add_node(EMAIL, f"e{i}", f"{100 + i}PD-2020 and {101 + i}PD-2020")
+    return graph
+
+
+def test_chain_depth_is_bounded_by_default():
+    nodes = linked_graph(10).chain("100PD-2020")['nodes']
+    assert {node['node'] for node in nodes} == {"e0", "e1", "e2"}
+
+
+def test_chain_node_cap_keeps_nearest():
+    graph = linked_graph(10)
+    nodes = graph.chain("100PD-2020", max_depth=None, max_nodes=4)['nodes']
+    assert [node['node'] for node in nodes] == ["e0", "e1", "e2", "e3"]
+    assert len(graph.chain("100PD-2020", max_depth=None, max_nodes=None)['nodes']) == 10
+
+
+def test_reference_chain_applies_other_filters(tmp_path):
+    index = MailIndex(str(tmp_path / "index.db"))
+    index.add_messages([
+        {'entry_id': "old", 'subject': "Invoice 340PD-2017", 'received': "2019-05-01 10:00:00"},
+        {'entry_id': "new", 'subject': "Meeting on 340PD-2017", 'received': "2024-02-01 10:00:00"},
+        {'entry_id': "paid", 'subject': "Invoice paid 340PD-2017", 'received': "2024-01-01 10:00:00"},
+    ])
+    graph = ReferenceGraph(index.conn)
+    graph.sync_from_index(index)
+    searcher = SimpleNamespace(graph=graph, index=index)
+
+    everything = OutlookDeepLook.reference_chain(searcher, "340PD-2017")
+    assert [r['entry_id'] for r in everything] == ["new", "paid", "old"]
+
+    params = {'keywords': ["invoice"], 'date_from': "2023-01-01"}
+    narrowed = OutlookDeepLook.reference_chain(searcher, "340PD-2017", params)
+    assert [r['entry_id'] for r in narrowed] == ["paid", "new"]
+    assert narrowed[0]['reference_link'] == "mentions 340PD-2017"
+
+
+class ArchiveSource(InMemorySource):
+    name = "archive"
+
+
+def test_sources_added_later_are_linked(tmp_path):
+    index = MailIndex(str(tmp_path / "index.db"))
+    graph = ReferenceGraph(index.conn)
+    index.sync(InMemorySource([{'entry_id': "inbox", 'subject': "Reply on 340PD-2017",
+                                'received': "2024-06-01 10:00:00"}]))
+    graph.sync_from_index(index)
+
+    # An archive added afterwards holds older mail than anything synced so far
+    index.sync(ArchiveSource([{'entry_id': "archived", 'subject': "Letter 340PD-2017",
+                               'received': "2019-03-01 10:00:00"}]))
+    assert graph.sync_from_index(index) == 1
+    assert {node['node'] for node in graph.lookup("340PD-2017")} == {"inbox", "archived"}
+
+
+def test_existing_index_gains_write_sequence(tmp_path):
+    path = str(tmp_path / "index.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE messages (rowid INTEGER PRIMARY KEY, entry_id TEXT UNIQUE NOT NULL, subject TEXT,"
+                 " sender TEXT, received TEXT, body TEXT, project_code TEXT, document_type TEXT, folder TEXT)")
+    conn.execute("INSERT INTO messages (entry_id, subject, received) VALUES ('old', 'Letter 340PD-2017', '2019')")
+    conn.commit()
+    conn.close()
+
+    index = MailIndex(path)
+    graph = ReferenceGraph(index.conn)
+    assert graph.sync_from_index(index) == 1
+    index.add_messages([{'entry_id': "new", 'subject': "Reply on 340PD-2017", 'received': "2018"}])
+    assert graph.sync_from_index(index) == 1
+    assert {node['node'] for node in graph.lookup("340PD-2017")} == {"old", "new"}
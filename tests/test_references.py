@@ -0,0 +1,44 @@
+from reference_graph import canonical_reference, edge_type
+from references import ReferenceExtractor, get_extractor
+
+
+def found(text):
+    return [(ref['reference'], ref['category']) for ref in get_extractor().extract(text)]
+
+
+def test_references_in_order_of_appearance():
+    assert found("LTR-DEPT-001-2024 and 12PD_2020") == [
+        ("LTR-DEPT-001-2024", 'letter_references'), ("12PD_2020", 'standard')
+    ]
+    assert found("ST/AS/0426-2013") == [("ST/AS/0426-2013", 'standard')]
+    assert found("nothing to see") == []
+    assert get_extractor().first("") is None
+
+
+def test_most_specific_category_wins():
+    assert found("Re: SHA-340PD-2017 drawings") == [("SHA-340PD-2017", 'standard')]
+    assert found("LOA-DHA-ASTECO-ABS-04PD-2024") == [("LOA-DHA-ASTECO-ABS-04PD-2024", 'letter_references')]
+
+
+def test_special_formats_report_the_inner_reference():
+    refs = get_extractor().extract("Terminated Letter Ref. No. STL-EME_ABS_OHA-340PD-2017")
+    assert [(ref['reference'], ref['pattern']) for ref in refs] == [("340PD-2017", 0)]
+    assert refs[0]['match'].startswith("Terminated")
+    assert edge_type(refs[0]) == 'terminates'
+    assert found("STRED Letter No-21PD-2023") == [("21PD-2023", 'special_formats')]
+
+
+def test_code_patterns_stay_case_sensitive():
+    assert found("sha-340pd-2017") == []
+
+
+def test_canonical_reference_links_formats():
+    for reference in ("SHA-340PD-2017", "STL-EME_ABS_OHA-340PD-2017", "340pd_2017"):
+        assert canonical_reference(reference) == "340PD-2017"
+    assert canonical_reference("ltr_dept_001_2024") == "LTR-DEPT-001-2024"
+
+
+def test_custom_and_empty_patterns():
+    extractor = ReferenceExtractor({'standard': [r'INV-\d+']})
+    assert extractor.first("paid INV-42 and INV-43") == "INV-42"
+    assert ReferenceExtractor({}).extract("INV-42") == []
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+from benchmarks.bench_analyzer import StubMessages, StubRateLimitError, make_results
+from result_analyzer import ResultAnalyzer, MAP_PROMPT, REDUCE_PROMPT, is_retryable
+
+
+class ScriptedMessages(StubMessages):
+    """The benchmark stub without latency, failing the first `failures` calls"""
+
+    def __init__(self, failures=0, error=None):
+        super().__init__(latency=0, error_rate=0, retry_after=0.01, seed=0)
+        self.failures = failures
+        self.error = error
+        self.prompts = []
+
+    async def create(self, model, max_tokens, messages, **options):
+        self.prompts.append(messages[0]['content'])
+        if len(self.prompts) <= self.failures:
+            raise self.error or StubRateLimitError(self.retry_after)
+        return await super().create(model, max_tokens, messages, **options)
+
+
+def analyzer(messages, **options):
+    options = {'requests_per_second': 1000, 'burst': 1000, 'backoff': 0.01, **options}
+    return ResultAnalyzer(client=SimpleNamespace(messages=messages), **options)
+
+
+def kind(prompt):
+    if prompt.startswith(MAP_PROMPT.split("{")[0]):
+        return 'map'
+    if prompt.startswith(REDUCE_PROMPT.split("{")[0]):
+        return 'reduce'
+    return 'answer'
+
+
+def test_results_fitting_one_batch_take_one_request():
+    messages = ScriptedMessages()
+    assert analyzer(messages).analyze(make_results(3), "payments") == "Notes on 3 emails"
+    assert [kind(prompt) for prompt in messages.prompts] == ['answer']
+
+
+def test_large_result_sets_are_mapped_then_reduced():
+    messages = ScriptedMessages()
+    result_analyzer = analyzer(messages, batch_tokens=2000)
+    batches = result_analyzer.batch(make_results(20))
+    assert len(batches) > 1 and sum(len(batch) for batch in batches) == 20
+
+    assert result_analyzer.analyze(make_results(20), "payments")
+    kinds = [kind(prompt) for prompt in messages.prompts]
+    assert kinds.count('map') == len(batches)
+    assert kinds[-1] == 'reduce'
+    # Every result reaches exactly one map prompt
+    assert sum(prompt.count("Subject:") for prompt in messages.prompts) == 20
+
+
+def test_rate_limits_are_retried():
+    messages = ScriptedMessages(failures=2)
+    result_analyzer = analyzer(messages)
+    assert result_analyzer.analyze(make_results(2), "payments") == "Notes on 2 emails"
+    assert result_analyzer.stats['retries'] == 2
+    assert result_analyzer.stats['requests'] == 3
+
+
+def test_retries_give_up_after_max_retries():
+    result_analyzer = analyzer(ScriptedMessages(failures=10), max_retries=2)
+    assert result_analyzer.analyze(make_results(2), "payments") is None
+    assert result_analyzer.stats['requests'] == 3
+    assert result_analyzer.stats['failed'] == 1
+    assert result_analyzer.stats['tokens'] == 0
+
+
+def test_other_errors_are_not_retried():
+    error = ValueError("bad request")
+    assert not is_retryable(error)
+    result_analyzer = analyzer(ScriptedMessages(failures=1, error=error))
+    assert result_analyzer.analyze(make_results(2), "payments") is None
+    assert result_analyzer.stats['requests'] == 1
+
+
+def test_token_budget_skips_the_lowest_ranked_batches():
+    messages = ScriptedMessages()
+    result_analyzer = analyzer(messages, batch_tokens=2000, max_tokens=200, token_budget=9000)
+    assert result_analyzer.analyze(make_results(40), "payments")
+    stats = result_analyzer.stats
+    assert stats['skipped'] > 0
+    assert stats['tokens'] <= 9000
+    # The batches that were sent are the first, best-ranked ones
+    mapped = [prompt for prompt in messages.prompts if kind(prompt) == 'map']
+    assert "certificate 0 " in mapped[0]
+    assert all("certificate 39 " not in prompt for prompt in mapped)
@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mail_index import MailIndex
+from mailbox_source import InMemorySource
+from reference_graph import ReferenceGraph
+from vector_index import VectorIndex
+
+
+def messages(modified, count=20, prefix=""):
+    return [{'entry_id': f"m{i}", 'subject': f"{prefix}Payment certificate {100 + i} for villa {i % 3}",
+             'sender': "site@example.com", 'received': "2024-01-01 09:00:00", 'modified': modified,
+             'body': f"Certificate number {i} LTR-ABS-{i:03d}-2024", 'folder': "Inbox"} for i in range(count)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = MailIndex(str(tmp_path / "index.db"))
+    yield index
+    index.close()
+
+
+def test_resync_rewrites_rows_in_place(index, tmp_path):
+    vectors = VectorIndex(index.conn, str(tmp_path / "index.vectors"))
+    index.build(InMemorySource(messages("2024-01-01 09:00:00")))
+    assert vectors.sync_from_index(index) == 20
+    assert len(vectors) == 20
+
+    # mbox and eml re-stamp every message with the file mtime on each sync
+    for stamp in ("2024-01-02 09:00:00", "2024-01-03 09:00:00"):
+        index.sync(InMemorySource(messages(stamp, prefix="RE: ")))
+        vectors.sync_from_index(index)
+    assert len(vectors) == 20
+    assert vectors.search("RE payment certificate 107", k=1)[0][0] == "m7"
+
+
+class ArchiveSource(InMemorySource):
+    name = "archive"
+
+
+def test_sources_added_later_are_embedded(index, tmp_path):
+    vectors = VectorIndex(index.conn, str(tmp_path / "index.vectors"))
+    index.sync(InMemorySource(messages("2024-06-01 09:00:00", count=5)))
+    vectors.sync_from_index(index)
+
+    # An older archive synced afterwards, and a row rewritten with an older stamp
+    archive = [dict(message, entry_id=f"a{i}", subject=f"Archived drawing {500 + i}")
+               for i, message in enumerate(messages("2019-01-01 09:00:00", count=3))]
+    index.sync(ArchiveSource(archive))
+    index.add_messages([dict(messages("2018-01-01 09:00:00", count=1)[0], subject="Revised drawing 999")],
+                       source_key="memory")
+    assert vectors.sync_from_index(index) == 4
+    assert len(vectors) == 8
+    assert vectors.search("archived drawing 501", k=1)[0][0] == "a1"
+    assert vectors.search("revised drawing 999", k=1)[0][0] == "m0"
+
+
+def test_messages_at_the_watermark_are_not_skipped(index, tmp_path):
+    vectors = VectorIndex(index.conn, str(tmp_path / "index.vectors"))
+    graph = ReferenceGraph(index.conn)
+    index.build(InMemorySource(messages("2024-01-01 09:00:00", count=5)))
+    vectors.sync_from_index(index)
+    graph.sync_from_index(index)
+
+    # Arrives later but carries the same modification time as the watermark
+    late = messages("2024-01-01 09:00:00", count=6)[5:]
+    index.add_messages(late, source_key="memory")
+    vectors.sync_from_index(index)
+    graph.sync_from_index(index)
+    assert "m5" in [entry_id for entry_id, _ in vectors.search("payment certificate 105", k=6)]
+    assert any(node['node'] == "m5" for node in graph.lookup("LTR-ABS-005-2024"))
+
+
+def test_sync_compacts_dead_rows(index, tmp_path):
+    vectors = VectorIndex(index.conn, str(tmp_path / "index.vectors"))
+    index.build(InMemorySource(messages("2024-01-01 09:00:00")))
+    vectors.sync_from_index(index)
+    index.conn.execute("DELETE FROM messages WHERE entry_id IN ('m0', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6')")
+    index.conn.commit()
+    vectors.sync_from_index(index)
+    assert len(vectors) == 13
+    found = dict(vectors.search("payment certificate 112", k=13))
+    assert set(found) == {f"m{i}" for i in range(7, 20)}
+    assert max(found, key=found.get) == "m12"
@@ -0,0 +1,336 @@
+import os
+import re
+import math
+import zlib
+import sqlite3
+from collections import Counter
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; semantic search is skipped without it
+    np = None
+
+HAS_NUMPY = np is not None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vector_rows (
+    row INTEGER PRIMARY KEY,
+    entry_id TEXT NOT NULL,
+    current INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_vector_rows_entry ON vector_rows(entry_id);
+"""
+
+DEFAULT_DIM = 256
+SUBJECT_WEIGHT = 2.0
+
+# Rows converted to float32 at a time during a scan; small enough to stay in cache
+BLOCK_ROWS = 4096
+
+# Dead rows (deleted messages) allowed before sync compacts the files
+COMPACT_RATIO = 0.25
+
+# Exhaustive search is ~200ms per million rows on one core, so larger
+# indexes are partitioned automatically on sync
+IVF_MIN_ROWS = 100000
+DEFAULT_NPROBE = 16
+
+
+class HashingVectorizer:
+    """Stateless text embedding by feature hashing.
+
+    Words and word bigrams are hashed with CRC32 into `dim` signed buckets
+    with sublinear term frequency, then L2-normalized. No vocabulary or
+    model is stored, so vectors are stable across runs and fully offline.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        if dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+
+    def features(self, text: str, weight: float = 1.0) -> Counter:
+        words = re.findall(r'[a-z0-9]{2,}', (text or "").lower())
+        counts = Counter(words)
+        counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        return Counter({feature: weight * (1 + math.log(n)) for feature, n in counts.items()})
+
+    def transform(self, texts: Iterable) -> 'np.ndarray':
+        """Embed texts, or (subject, body) pairs with the subject weighted up"""
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        mask = self.dim - 1
+        for i, text in enumerate(texts):
+            if isinstance(text, tuple):
+                features = self.features(text[0], SUBJECT_WEIGHT) + self.features(text[1])
+            else:
+                features = self.features(text)
+            row = matrix[i]
+            for feature, value in features.items():
+                h = zlib.crc32(feature.encode('utf-8'))
+                row[h & mask] += value if h & 0x80000000 else -value
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+def quantize(vectors: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """Per-row int8 quantization; returns the codes and 1/||code|| for cosine scoring"""
+    scale = np.abs(vectors).max(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    codes = np.rint(vectors / scale * 127).astype(np.int8)
+    norms = np.linalg.norm(codes.astype(np.float32), axis=1)
+    norms[norms == 0] = 1.0
+    return codes, (1.0 / norms).astype(np.float32)
+
+
+class VectorIndex:
+    """int8 embedding matrix of indexed messages with top-k cosine search.
+
+    Codes live in a flat file (memory-mapped for search) next to a float32
+    file of inverse norms; row -> EntryID mapping lives in the mail index
+    database. Re-indexed messages are rewritten in their existing row and
+    new ones appended. Deleted messages only flip their row to not current;
+    sync compacts the files once more than COMPACT_RATIO of rows are dead.
+
+    Search scans the matrix in float32 blocks, or, once train_ivf() has
+    partitioned it, only the rows of the nprobe lists nearest to the query.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, path: str, dim: int = DEFAULT_DIM,
+                 vectorizer: HashingVectorizer = None):
+        self.conn = conn
+        self.path = path
+        self.dim = dim
+        self.vectorizer = vectorizer or HashingVectorizer(dim)
+        self.conn.executescript(SCHEMA)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._codes = None
+        self._live = None
+        self._lists = None
+        self.centroids = np.load(self._file("centroids.npy")) if os.path.exists(self._file("centroids.npy")) else None
+
+    def _file(self, suffix: str) -> str:
+        return f"{self.path}.{suffix}"
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.path) // self.dim if os.path.exists(self.path) else 0
+
+    def _load(self):
+        """Map the matrix and rebuild the live mask and IVF lists when rows were added"""
+        rows = len(self)
+        if self._codes is not None and len(self._codes) == rows:
+            return
+        if rows == 0:
+            self._codes = np.zeros((0, self.dim), dtype=np.int8)
+            self._inv_norms = np.zeros(0, dtype=np.float32)
+        else:
+            self._codes = np.memmap(self.path, dtype=np.int8, mode='r', shape=(rows, self.dim))
+            self._inv_norms = np.memmap(self._file("norms"), dtype=np.float32, mode='r', shape=(rows,))
+        self._live = np.zeros(rows, dtype=bool)
+        live_rows = [row for (row,) in self.conn.execute("SELECT row FROM vector_rows WHERE current = 1")]
+        self._live[np.array(live_rows, dtype=np.int64)] = True
+        self._lists = None
+        if self.centroids is not None and rows:
+            assignments = np.fromfile(self._file("lists"), dtype=np.int32)[:rows]
+            order = np.argsort(assignments, kind='stable')
+            offsets = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+
+    def append(self, entry_ids: List[str], texts: List) -> int:
+        """Embed messages, rewriting the current row of known EntryIDs in place and appending the rest"""
+        if not entry_ids:
+            return 0
+        codes, inv_norms = quantize(self.vectorizer.transform(texts))
+        lists = self._assign(codes.astype(np.float32) * inv_norms[:, None]) if self.centroids is not None else None
+        existing = {}
+        for chunk in range(0, len(entry_ids), 500):
+            batch = entry_ids[chunk:chunk + 500]
+            existing.update(self.conn.execute(
+                f"SELECT entry_id, row FROM vector_rows WHERE current = 1 AND entry_id IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall())
+
+        # Release the maps before writing to the files under them
+        self._codes = self._inv_norms = None
+        start = len(self)
+        new = [i for i, entry_id in enumerate(entry_ids) if entry_id not in existing]
+        if len(new) < len(entry_ids):
+            self._rewrite_rows([(existing[entry_id], i) for i, entry_id in enumerate(entry_ids) if entry_id in existing],
+                               codes, inv_norms, lists)
+        if new:
+            with open(self.path, 'ab') as f:
+                f.write(codes[new].tobytes())
+            with open(self._file("norms"), 'ab') as f:
+                f.write(inv_norms[new].tobytes())
+            if lists is not None:
+                with open(self._file("lists"), 'ab') as f:
+                    f.write(lists[new].tobytes())
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO vector_rows (row, entry_id) VALUES (?, ?)",
+                    ((start + n, entry_ids[i]) for n, i in enumerate(new))
+                )
+        return len(entry_ids)
+
+    def _rewrite_rows(self, targets: List[Tuple[int, int]], codes: 'np.ndarray', inv_norms: 'np.ndarray',
+                      lists: Optional['np.ndarray']):
+        """Overwrite matrix rows with (row, batch index) pairs of a freshly embedded batch"""
+        files = [(self.path, codes, self.dim), (self._file("norms"), inv_norms, 4)]
+        if lists is not None:
+            files.append((self._file("lists"), lists, 4))
+        for path, values, width in files:
+            with open(path, 'r+b') as f:
+                for row, i in sorted(targets):
+                    f.seek(row * width)
+                    f.write(values[i].tobytes())
+
+    def compact(self):
+        """Rewrite the files with only current rows, renumbering them in order"""
+        self._load()
+        keep = np.flatnonzero(self._live)
+        files = [(self.path, self._codes), (self._file("norms"), self._inv_norms)]
+        if self._lists is not None:
+            files.append((self._file("lists"), np.fromfile(self._file("lists"), dtype=np.int32)[:len(self._live)]))
+        for path, values in files:
+            with open(path + ".tmp", 'wb') as f:
+                for block in range(0, len(keep), BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(values[keep[block:block + BLOCK_ROWS]]).tobytes())
+        # Drop the maps so the files can be replaced (Windows refuses while mapped)
+        self._codes = self._inv_norms = self._live = self._lists = None
+        for path, _ in files:
+            os.replace(path + ".tmp", path)
+        with self.conn:
+            self.conn.execute("DELETE FROM vector_rows WHERE current = 0")
+            self.conn.executemany("UPDATE vector_rows SET row = ? WHERE row = ?",
+                                  ((new, int(old)) for new, old in enumerate(keep)))
+
+    def remove(self, entry_ids: Iterable[str]):
+        with self.conn:
+            self.conn.executemany("UPDATE vector_rows SET current = 0 WHERE entry_id = ?",
+                                  ((entry_id,) for entry_id in entry_ids))
+        self._codes = None
+
+    def sync_from_index(self, index, batch_size: int = 2000) -> int:
+        """Embed index messages written since the last vector sync and drop removed ones.
+
+        Progress follows the index's write sequence, so every upserted row
+        is (re-)embedded whatever its source and modification time. Trains
+        IVF partitions the first time the index grows past IVF_MIN_ROWS.
+        """
+        since = int(index.get_meta("vector_seq") or 0)
+        seq = since
+        added = 0
+        cursor = self.conn.execute(
+            "SELECT entry_id, subject, body, attachments, seq FROM messages WHERE seq > ? ORDER BY seq",
+            (since,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            added += self.append(
+                [row[0] for row in rows],
+                [(row[1] or "", f"{row[2] or ''}\n{row[3] or ''}") for row in rows]
+            )
+            seq = max(seq, rows[-1][4])
+        with self.conn:
+            self.conn.execute(
+                "UPDATE vector_rows SET current = 0 WHERE current = 1 AND entry_id NOT IN (SELECT entry_id FROM messages)"
+            )
+        index.set_meta("vector_seq", str(seq))
+        self._codes = None
+        current = self.conn.execute("SELECT COUNT(*) FROM vector_rows WHERE current = 1").fetchone()[0]
+        if len(self) - current > COMPACT_RATIO * len(self):
+            self.compact()
+        if self.centroids is None and len(self) >= IVF_MIN_ROWS:
+            self.train_ivf()
+        return added
+
+    def _assign(self, vectors: 'np.ndarray') -> 'np.ndarray':
+        """Nearest centroid of each vector"""
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train_ivf(self, nlist: int = None, iterations: int = 10, sample: int = 100000, seed: int = 0):
+        """Partition the matrix into nlist lists with spherical k-means on a sample"""
+        self.centroids = None
+        self._codes = None
+        self._load()
+        rows = len(self._codes)
+        nlist = nlist or max(1, int(math.sqrt(rows)))
+        if rows < nlist:
+            return
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(rows, size=min(sample, rows), replace=False))
+        data = self._codes[picked].astype(np.float32) * self._inv_norms[picked][:, None]
+
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            empty = ~np.bincount(assignments, minlength=nlist).astype(bool)
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        self.centroids = centroids.astype(np.float32)
+
+        with open(self._file("lists") + ".tmp", 'wb') as f:
+            for start in range(0, rows, BLOCK_ROWS):
+                block = self._codes[start:start + BLOCK_ROWS].astype(np.float32)
+                f.write(self._assign(block * self._inv_norms[start:start + BLOCK_ROWS][:, None]).tobytes())
+        os.replace(self._file("lists") + ".tmp", self._file("lists"))
+        np.save(self._file("centroids.npy"), self.centroids)
+        self._codes = None
+
+    def _scan(self, rows: Optional['np.ndarray'], queries: 'np.ndarray', k: int) -> List[List[Tuple[int, float]]]:
+        """Top k live rows per query among the given rows (all rows when None)"""
+        best = [[] for _ in queries]
+        total = len(self._codes) if rows is None else len(rows)
+        for start in range(0, total, BLOCK_ROWS):
+            if rows is None:
+                ids = np.arange(start, min(start + BLOCK_ROWS, total))
+                block = self._codes[start:start + BLOCK_ROWS]
+            else:
+                ids = rows[start:start + BLOCK_ROWS]
+                block = self._codes[ids]
+            scores = (block.astype(np.float32) @ queries.T) * self._inv_norms[ids][:, None]
+            scores[~self._live[ids]] = -np.inf
+            top = min(k, len(ids))
+            candidates = np.argpartition(-scores, top - 1, axis=0)[:top]
+            for q in range(len(queries)):
+                best[q].extend((int(ids[c]), float(scores[c, q])) for c in candidates[:, q] if scores[c, q] > -np.inf)
+        return [sorted(found, key=lambda item: -item[1])[:k] for found in best]
+
+    def search_batch(self, queries: List[str], k: int = 20,
+                     nprobe: int = DEFAULT_NPROBE) -> List[List[Tuple[str, float]]]:
+        """Top k (EntryID, cosine) pairs for each query, best first"""
+        self._load()
+        if not len(self._codes) or not queries:
+            return [[] for _ in queries]
+        vectors = self.vectorizer.transform(queries)
+
+        if self._lists is None:
+            results = self._scan(None, vectors, k)
+        else:
+            order, offsets = self._lists
+            probes = np.argsort(-(vectors @ self.centroids.T), axis=1)[:, :nprobe]
+            results = []
+            for vector, probe in zip(vectors, probes):
+                rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+                results.extend(self._scan(np.sort(rows), vector[None, :], k))
+
+        return [self._resolve(found) for found in results]
+
+    def search(self, query: str, k: int = 20, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[str, float]]:
+        return self.search_batch([query], k, nprobe)[0]
+
+    def _resolve(self, found: List[Tuple[int, float]]) -> List[Tuple[str, float]]:
+        if not found:
+            return []
+        rows = dict(self.conn.execute(
+            f"SELECT row, entry_id FROM vector_rows WHERE row IN ({','.join('?' * len(found))})",
+            [row for row, _ in found]
+        ).fetchall())
+        return [(rows[row], score) for row, score in found if row in rows]